@@ -2,9 +2,84 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import plotly.graph_objects as go
-import plotly.express as px
 from analytics_dashboard import render_analytics_dashboard
+from charts import (
+    trade_setup_figure,
+    allocation_pie,
+    return_distribution_figure,
+    trade_levels_figure,
+    margin_breakdown_figure,
+    cumulative_swap_figure,
+    pnl_profile_figure,
+    exposure_figure,
+    currency_exposure_figure,
+    client_pnl_figure,
+    client_profile_figure,
+    booking_pie,
+    stop_out_figure,
+)
+from risk_engine import (
+    LOT_MULTIPLIER,
+    contract_size_for,
+    INSTRUMENTS,
+    DEFAULT_QUOTES,
+    calculate_trade_setup,
+    analyze_risk_reward,
+    calculate_margin,
+    DEFAULT_VOLUME_TIERS,
+    account_margin,
+    shock_scenarios,
+    simulate_stop_outs,
+    calculate_swap,
+    settlement_days_for,
+    triple_swap_weekday_for,
+    settle_swaps,
+    project_revenue,
+    calculate_pip_value,
+    calculate_trade_costs,
+    calculate_net_exposure,
+    book_exposure,
+    ExposureBook,
+    optimize_hedges,
+    monitor_positions,
+    LiveMonitor,
+    iter_ticks,
+    is_toxic_flow,
+    analyze_booking,
+    toxicity_features,
+    monte_carlo_var,
+    historical_var,
+    count_instruments,
+    CovarianceCache,
+    load_return_history,
+    align_positions,
+    parametric_var,
+    load_positions,
+    summarize_portfolio,
+)
+from risk_engine.cache import memoize, cache_stats
+
+# Cached calculators - memoize returns the same wrapper (and warm cache) on every rerun.
+# Not cached: calculate_swap (its default open date is today, outside the key) and the
+# file readers project_revenue / toxicity_features / historical_var (keying them hashes
+# the whole file).
+CACHE_TTL_SECONDS = 3600
+calculate_trade_setup = memoize(calculate_trade_setup, ttl=CACHE_TTL_SECONDS)
+analyze_risk_reward = memoize(analyze_risk_reward, ttl=CACHE_TTL_SECONDS)
+calculate_margin = memoize(calculate_margin, ttl=CACHE_TTL_SECONDS)
+calculate_pip_value = memoize(calculate_pip_value, ttl=CACHE_TTL_SECONDS)
+calculate_trade_costs = memoize(calculate_trade_costs, ttl=CACHE_TTL_SECONDS)
+calculate_net_exposure = memoize(calculate_net_exposure, ttl=CACHE_TTL_SECONDS)
+settle_swaps = memoize(settle_swaps, max_entries=16, ttl=CACHE_TTL_SECONDS)
+book_exposure = memoize(book_exposure, max_entries=16, ttl=CACHE_TTL_SECONDS)
+optimize_hedges = memoize(optimize_hedges, max_entries=16, ttl=CACHE_TTL_SECONDS)
+account_margin = memoize(account_margin, max_entries=16, ttl=CACHE_TTL_SECONDS)
+simulate_stop_outs = memoize(simulate_stop_outs, max_entries=8, ttl=CACHE_TTL_SECONDS)
+monitor_positions = memoize(monitor_positions, max_entries=16, ttl=CACHE_TTL_SECONDS)
+analyze_booking = memoize(analyze_booking, ttl=CACHE_TTL_SECONDS)
+monte_carlo_var = memoize(monte_carlo_var, max_entries=64, ttl=CACHE_TTL_SECONDS)
+parametric_var = memoize(parametric_var, ttl=CACHE_TTL_SECONDS)
+summarize_portfolio = memoize(summarize_portfolio, max_entries=16, ttl=CACHE_TTL_SECONDS)
 
 # Page configuration
 st.set_page_config(
@@ -48,27 +123,33 @@ else:  # Product Metrics
     )
 
 # Helper functions
-def calculate_position_size(account_balance, risk_percentage, entry_price, stop_loss):
-    """Calculate position size based on risk parameters"""
-    risk_amount = account_balance * (risk_percentage / 100)
-    price_risk = abs(entry_price - stop_loss)
-    if price_risk == 0:
-        return 0
-    position_size = risk_amount / price_risk
-    return position_size
-
-def calculate_var(returns, confidence_level=0.95):
-    """Calculate Value at Risk"""
-    if len(returns) == 0:
-        return 0
-    return np.percentile(returns, (1 - confidence_level) * 100)
-
-def calculate_sharpe_ratio(returns, risk_free_rate=0.02):
-    """Calculate Sharpe Ratio"""
-    if len(returns) == 0 or np.std(returns) == 0:
-        return 0
-    excess_returns = returns - (risk_free_rate / 252)
-    return np.sqrt(252) * np.mean(excess_returns) / np.std(excess_returns)
+@st.cache_resource
+def get_covariance_cache():
+    """Covariance matrices shared across sessions and reruns"""
+    return CovarianceCache()
+
+
+def load_table_upload(uploaded_file):
+    """Read an uploaded .csv/.parquet table into a DataFrame"""
+    if uploaded_file.name.endswith(".parquet"):
+        return pd.read_parquet(uploaded_file)
+    return pd.read_csv(uploaded_file)
+
+
+def show_live_summary(slot, live, tick_time, margin_call_level):
+    """Draw a LiveMonitor's book totals into a placeholder"""
+    summary = live.summary(margin_call_level)
+    with slot.container():
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Feed Time", str(pd.Timestamp(tick_time)))
+        with col2:
+            st.metric("Ticks Applied", f"{summary['ticks']:,}")
+        with col3:
+            st.metric("Aggregate Client P&L", f"${summary['total_pnl']:,.2f}")
+        with col4:
+            st.metric(f"Accounts at Risk (ML < {margin_call_level:.0f}%)", f"{summary['accounts_at_risk']:,}")
+
 
 # ========== TRADER MODELS ==========
 if section == "Trader Models":
@@ -118,13 +199,11 @@ if section == "Trader Models":
             )
 
         if st.button("Calculate Position Size", type="primary"):
-            position_size = calculate_position_size(account_balance, risk_percentage, entry_price, stop_loss)
-            risk_amount = account_balance * (risk_percentage / 100)
-            position_value = position_size * entry_price
-
-            price_risk = abs(entry_price - stop_loss)
-            potential_profit = abs(target_price - entry_price)
-            risk_reward_ratio = potential_profit / price_risk if price_risk > 0 else 0
+            setup = calculate_trade_setup(account_balance, risk_percentage, entry_price, stop_loss, target_price)
+            position_size = setup['position_size']
+            position_value = setup['position_value']
+            risk_amount = setup['risk_amount']
+            risk_reward_ratio = setup['risk_reward_ratio']
 
             st.success("### Calculation Results")
 
@@ -140,26 +219,7 @@ if section == "Trader Models":
                 st.metric("Risk/Reward Ratio", f"1:{risk_reward_ratio:.2f}")
 
             # Visualization
-            fig = go.Figure()
-
-            fig.add_trace(go.Scatter(
-                x=['Stop Loss', 'Entry', 'Target'],
-                y=[stop_loss, entry_price, target_price],
-                mode='markers+lines+text',
-                marker=dict(size=[15, 20, 15], color=['red', 'blue', 'green']),
-                text=[f'${stop_loss}', f'${entry_price}', f'${target_price}'],
-                textposition='top center',
-                line=dict(color='gray', dash='dash')
-            ))
-
-            fig.update_layout(
-                title="Trade Setup Visualization",
-                xaxis_title="Trade Levels",
-                yaxis_title="Price ($)",
-                showlegend=False,
-                height=400
-            )
-
+            fig = trade_setup_figure(stop_loss, entry_price, target_price)
             st.plotly_chart(fig, use_container_width=True)
 
     # Tool 2: Portfolio Risk Assessment
@@ -167,55 +227,165 @@ if section == "Trader Models":
         st.header("Portfolio Risk Assessment")
         st.markdown("Analyze overall portfolio risk and diversification")
 
-        st.subheader("Enter Portfolio Positions")
-
-        num_positions = st.number_input("Number of Positions", min_value=1, max_value=20, value=3)
+        input_method = st.radio(
+            "Input Method",
+            options=["Manual Entry", "Upload Positions File"],
+            horizontal=True,
+            key="portfolio_input_method"
+        )
 
         positions_data = []
+        positions_file = None
+
+        if input_method == "Manual Entry":
+            st.subheader("Enter Portfolio Positions")
+
+            num_positions = st.number_input("Number of Positions", min_value=1, max_value=20, value=3)
+
+            for i in range(num_positions):
+                with st.expander(f"Position {i+1}", expanded=(i<3)):
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        symbol = st.text_input(f"Symbol", value=f"STOCK{i+1}", key=f"symbol_{i}")
+                    with col2:
+                        shares = st.number_input(f"Shares", min_value=0.0, value=100.0, key=f"shares_{i}")
+                    with col3:
+                        price = st.number_input(f"Price ($)", min_value=0.01, value=100.0, key=f"price_{i}")
+
+                    positions_data.append({
+                        "Symbol": symbol,
+                        "Shares": shares,
+                        "Price": price,
+                        "Value": shares * price
+                    })
+        else:
+            st.subheader("Upload Portfolio Positions")
+            positions_file = st.file_uploader(
+                "Positions File",
+                type=["csv", "parquet"],
+                key="portfolio_positions_file",
+                help="Columns: Symbol, Shares, Price (or Symbol, Value)"
+            )
 
-        for i in range(num_positions):
-            with st.expander(f"Position {i+1}", expanded=(i<3)):
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    symbol = st.text_input(f"Symbol", value=f"STOCK{i+1}", key=f"symbol_{i}")
-                with col2:
-                    shares = st.number_input(f"Shares", min_value=0.0, value=100.0, key=f"shares_{i}")
-                with col3:
-                    price = st.number_input(f"Price ($)", min_value=0.01, value=100.0, key=f"price_{i}")
+        st.subheader("Risk Model (Optional)")
 
-                positions_data.append({
-                    "Symbol": symbol,
-                    "Shares": shares,
-                    "Price": price,
-                    "Value": shares * price
-                })
+        col1, col2 = st.columns(2)
+
+        with col1:
+            risk_returns_file = st.file_uploader(
+                "Return History (one column per symbol)",
+                type=["parquet", "csv"],
+                key="portfolio_returns_file",
+                help="Daily returns as decimals; column names must match the position symbols"
+            )
+
+        with col2:
+            returns_as_of = st.date_input(
+                "Returns As Of",
+                value=datetime.now().date(),
+                key="portfolio_returns_as_of",
+                help="Covariances are reused for the same date and symbols; change it when the history changes"
+            )
+            portfolio_confidence = st.selectbox(
+                "VaR Confidence Level",
+                options=[90, 95, 99],
+                index=1,
+                key="portfolio_confidence"
+            )
 
         if st.button("Analyze Portfolio", type="primary"):
-            df = pd.DataFrame(positions_data)
-            total_value = df['Value'].sum()
-            df['Weight (%)'] = (df['Value'] / total_value * 100).round(2)
+            if input_method == "Manual Entry":
+                df = pd.DataFrame(positions_data)
+            elif positions_file is None:
+                st.error("Upload a positions file to analyze the portfolio")
+                st.stop()
+            else:
+                try:
+                    df = load_positions(positions_file)
+                except ValueError as exc:
+                    st.error(f"⚠️ {exc}")
+                    st.stop()
+
+            summary = summarize_portfolio(df)
+            df = summary['positions']
+            by_symbol = summary['by_symbol']
+            total_value = summary['total_value']
 
             st.success("### Portfolio Summary")
 
-            col1, col2, col3 = st.columns(3)
+            col1, col2, col3, col4 = st.columns(4)
             with col1:
                 st.metric("Total Portfolio Value", f"${total_value:,.2f}")
             with col2:
-                st.metric("Number of Positions", len(df))
+                st.metric("Number of Positions", summary['num_positions'])
             with col3:
-                concentration = df['Weight (%)'].max()
-                st.metric("Largest Position", f"{concentration:.1f}%")
-
-            st.dataframe(df, use_container_width=True)
+                st.metric("Largest Position", f"{summary['largest_weight']:.1f}%")
+            with col4:
+                st.metric("Top 10 Concentration", f"{summary['top_n_weight']:.1f}%")
 
-            # Pie chart
-            fig = px.pie(df, values='Value', names='Symbol', title='Portfolio Allocation')
+            if input_method == "Manual Entry":
+                st.dataframe(df, use_container_width=True)
+            else:
+                st.caption(f"{summary['num_positions']:,} positions across {summary['num_symbols']:,} symbols (HHI {summary['hhi']:.4f})")
+                st.dataframe(by_symbol, use_container_width=True, hide_index=True)
+
+            # Pie chart (largest 20 symbols, remainder grouped)
+            pie_df = by_symbol.head(20)[['Symbol', 'Value']].astype({'Symbol': str})
+            if len(by_symbol) > 20:
+                pie_df = pd.concat([pie_df, pd.DataFrame({'Symbol': ['Other'], 'Value': [by_symbol['Value'].iloc[20:].sum()]})])
+            fig = allocation_pie(pie_df['Symbol'], pie_df['Value'])
             st.plotly_chart(fig, use_container_width=True)
 
+            # Parametric VaR against a covariance matrix shared by every portfolio on the same history
+            # keyed by as-of date and held symbols, so a hit never parses the upload
+            if risk_returns_file is not None:
+                universe = sorted(set(by_symbol['Symbol'].astype(str)))
+                try:
+                    universe, covariance = get_covariance_cache().get(
+                        universe, returns_as_of,
+                        loader=lambda: load_return_history(risk_returns_file, universe)
+                    )
+                except KeyError as exc:
+                    st.error(f"⚠️ {exc.args[0]}")
+                    st.stop()
+                except ValueError as exc:
+                    st.error(f"⚠️ {exc}")
+                    st.stop()
+
+                positions = align_positions(by_symbol['Symbol'].astype(str), by_symbol['Value'], universe)
+
+                risk = parametric_var(positions, covariance, portfolio_confidence / 100)
+                held = positions != 0
+
+                st.subheader("Parametric Portfolio VaR")
+
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric(f"1-Day VaR ({portfolio_confidence}%)", f"${risk['var_amount'][0]:,.2f}")
+                with col2:
+                    st.metric("VaR as % of Portfolio", f"{risk['var_amount'][0] / total_value * 100:.2f}%" if total_value > 0 else "0.00%")
+                with col3:
+                    st.metric("Portfolio Volatility", f"${risk['portfolio_sigma'][0]:,.2f}/day")
+
+                risk_df = pd.DataFrame({
+                    "Symbol": np.array(universe)[held],
+                    "Value": positions[held],
+                    "Marginal VaR": risk['marginal_var'][0, held],
+                    "Component VaR": risk['component_var'][0, held],
+                    "Contribution (%)": risk['contribution_pct'][0, held].round(2)
+                })
+                st.dataframe(risk_df, use_container_width=True, hide_index=True)
+
     # Tool 3: Value at Risk (VaR)
     elif tool == "Value at Risk (VaR)":
         st.header("Value at Risk (VaR) Calculator")
-        st.markdown("Estimate potential portfolio losses using historical simulation")
+        st.markdown("Estimate potential portfolio losses using Monte Carlo or historical simulation")
+
+        var_method = st.radio(
+            "Simulation Method",
+            options=["Monte Carlo", "Historical Simulation"],
+            horizontal=True
+        )
 
         col1, col2 = st.columns(2)
 
@@ -227,13 +397,20 @@ if section == "Trader Models":
                 step=10000.0
             )
 
-            daily_volatility = st.slider(
-                "Daily Volatility (%)",
-                min_value=0.1,
-                max_value=10.0,
-                value=2.0,
-                step=0.1
-            )
+            if var_method == "Monte Carlo":
+                daily_volatility = st.slider(
+                    "Daily Volatility (%)",
+                    min_value=0.1,
+                    max_value=10.0,
+                    value=2.0,
+                    step=0.1
+                )
+            else:
+                returns_file = st.file_uploader(
+                    "Return History (dates x instruments)",
+                    type=["npy", "parquet", "csv"],
+                    help="Daily returns as decimals, one column per instrument"
+                )
 
         with col2:
             confidence_level = st.selectbox(
@@ -242,59 +419,103 @@ if section == "Trader Models":
                 index=1
             )
 
-            time_horizon = st.number_input(
-                "Time Horizon (days)",
-                min_value=1,
-                max_value=30,
-                value=1
+            if var_method == "Monte Carlo":
+                time_horizon = st.number_input(
+                    "Time Horizon (days)",
+                    min_value=1,
+                    max_value=30,
+                    value=1
+                )
+
+                num_paths = st.selectbox(
+                    "Simulation Paths",
+                    options=[10000, 100000, 1000000],
+                    index=1
+                )
+            else:
+                time_horizon = 1
+                weights_text = st.text_input(
+                    "Instrument Weights",
+                    value="",
+                    help="Comma-separated weights in column order (blank = equal weight)"
+                )
+
+            compact_chart = st.checkbox(
+                "Compact chart (pre-binned on server)",
+                value=False,
+                help="Send histogram bin counts instead of every simulated return"
             )
 
         if st.button("Calculate VaR", type="primary"):
-            # Simulate returns
-            np.random.seed(42)
-            num_simulations = 10000
-            daily_returns = np.random.normal(0, daily_volatility/100, num_simulations)
-
-            # Calculate VaR
-            var_percentage = np.percentile(daily_returns, 100 - confidence_level)
-            var_amount = portfolio_value * abs(var_percentage) * np.sqrt(time_horizon)
+            if var_method == "Monte Carlo":
+                # Simulate multi-day paths and calculate VaR/ES at every confidence level in one pass
+                var_result = monte_carlo_var(portfolio_value, daily_volatility, time_horizon,
+                                             num_paths=num_paths, sample_size=10000)
+                path_returns = var_result['sample'][:, 0]
+            else:
+                if returns_file is None:
+                    st.error("Upload a return history file to run historical simulation")
+                    st.stop()
+
+                # The upload is streamed in row blocks (a .npy is viewed in place, never copied)
+                try:
+                    num_instruments = count_instruments(returns_file)
+                    if num_instruments == 0:
+                        raise ValueError("The return history has no numeric instrument columns")
+                    if weights_text.strip():
+                        weights = np.array([float(w) for w in weights_text.split(",")])
+                    else:
+                        weights = np.full(num_instruments, 1 / num_instruments)
+                except (ValueError, IndexError) as exc:
+                    st.error(f"⚠️ {exc}")
+                    st.stop()
+
+                if len(weights) != num_instruments:
+                    st.error(f"Enter {num_instruments} weights, one per instrument column")
+                    st.stop()
+
+                try:
+                    var_result = historical_var(returns_file, weights, portfolio_value)
+                except ValueError as exc:
+                    st.error(f"⚠️ {exc}")
+                    st.stop()
+                path_returns = var_result['portfolio_returns'][:, 0]
+
+            level_idx = [round(c * 100) for c in var_result['confidence_levels']].index(confidence_level)
+            var_percentage = var_result['var_return'][level_idx, 0]
+            var_amount = var_result['var_amount'][level_idx, 0]
+            es_amount = var_result['es_amount'][level_idx, 0]
 
             st.success("### VaR Results")
 
-            col1, col2, col3 = st.columns(3)
+            col1, col2, col3, col4 = st.columns(4)
 
             with col1:
                 st.metric("Value at Risk", f"${var_amount:,.2f}")
             with col2:
-                st.metric("VaR as % of Portfolio", f"{(var_amount/portfolio_value*100):.2f}%")
+                st.metric("VaR as % of Portfolio", f"{(var_amount/portfolio_value*100):.2f}%" if portfolio_value > 0 else "0.00%")
             with col3:
+                st.metric("Expected Shortfall", f"${es_amount:,.2f}")
+            with col4:
                 st.metric("Confidence Level", f"{confidence_level}%")
 
             st.info(f"With {confidence_level}% confidence, portfolio will not lose more than ${var_amount:,.2f} over {time_horizon} day(s)")
 
-            # Distribution chart
-            fig = go.Figure()
-            fig.add_trace(go.Histogram(
-                x=daily_returns * 100,
-                nbinsx=50,
-                name='Return Distribution'
-            ))
-
-            fig.add_vline(
-                x=var_percentage * 100,
-                line_dash="dash",
-                line_color="red",
-                annotation_text=f"VaR at {confidence_level}%"
-            )
+            # VaR/ES at every confidence level from the same simulation
+            levels_df = pd.DataFrame({
+                "Confidence Level": [f"{c * 100:.0f}%" for c in var_result['confidence_levels']],
+                "VaR": [f"${v:,.2f}" for v in var_result['var_amount'][:, 0]],
+                "Expected Shortfall": [f"${v:,.2f}" for v in var_result['es_amount'][:, 0]]
+            })
+            st.dataframe(levels_df, use_container_width=True, hide_index=True)
 
-            fig.update_layout(
-                title="Simulated Return Distribution",
-                xaxis_title="Daily Return (%)",
-                yaxis_title="Frequency",
-                showlegend=True,
-                height=400
+            # Distribution chart
+            fig = return_distribution_figure(
+                path_returns * 100, var_percentage * 100, confidence_level,
+                "Simulated Return Distribution" if var_method == "Monte Carlo" else "Historical Return Distribution",
+                f"{time_horizon}-Day Return (%)",
+                prebin=compact_chart
             )
-
             st.plotly_chart(fig, use_container_width=True)
 
     # Tool 4: Risk/Reward Analysis
@@ -319,18 +540,16 @@ if section == "Trader Models":
             commission = st.number_input("Commission per Trade ($)", value=5.0, step=0.1)
 
         if st.button("Analyze Trade", type="primary"):
-            risk = abs(entry - stop)
-            reward1 = abs(target1 - entry)
-            reward2 = abs(target2 - entry)
-
-            rr_ratio1 = reward1 / risk if risk > 0 else 0
-            rr_ratio2 = reward2 / risk if risk > 0 else 0
-
-            max_loss = (risk * shares) + (2 * commission)
-            max_gain1 = (reward1 * shares) - (2 * commission)
-            max_gain2 = (reward2 * shares) - (2 * commission)
-
-            expected_value = (win_rate/100 * max_gain1) - ((100-win_rate)/100 * max_loss)
+            analysis = analyze_risk_reward(entry, stop, target1, target2, win_rate, shares, commission)
+            risk = analysis['risk']
+            reward1 = analysis['reward1']
+            reward2 = analysis['reward2']
+            rr_ratio1 = analysis['rr_ratio1']
+            rr_ratio2 = analysis['rr_ratio2']
+            max_loss = analysis['max_loss']
+            max_gain1 = analysis['max_gain1']
+            max_gain2 = analysis['max_gain2']
+            expected_value = analysis['expected_value']
 
             st.success("### Analysis Results")
 
@@ -356,26 +575,7 @@ if section == "Trader Models":
             st.dataframe(scenarios, use_container_width=True)
 
             # Visualization
-            fig = go.Figure()
-
-            prices = [stop, entry, target1, target2]
-            colors = ['red', 'gray', 'lightgreen', 'green']
-
-            fig.add_trace(go.Bar(
-                x=['Stop Loss', 'Entry', 'Target 1', 'Target 2'],
-                y=prices,
-                marker_color=colors,
-                text=[f'${p:.2f}' for p in prices],
-                textposition='outside'
-            ))
-
-            fig.update_layout(
-                title="Trade Levels",
-                yaxis_title="Price ($)",
-                showlegend=False,
-                height=400
-            )
-
+            fig = trade_levels_figure(stop, entry, target1, target2)
             st.plotly_chart(fig, use_container_width=True)
 
 # ========== BROKER MODELS ==========
@@ -423,7 +623,7 @@ else:  # section == "Broker Models"
 
             currency_pair = st.selectbox(
                 "Currency Pair",
-                options=["EUR/USD", "GBP/USD", "USD/JPY", "AUD/USD", "USD/CHF", "NZD/USD", "USD/CAD"]
+                options=INSTRUMENTS.symbols_for("FX")
             )
 
             position_size = st.number_input(
@@ -450,29 +650,18 @@ else:  # section == "Broker Models"
 
         if st.button("Calculate Margin Requirements", type="primary"):
             # Lot size conversion
-            lot_multiplier = {"Standard (100k)": 100000, "Mini (10k)": 10000, "Micro (1k)": 1000}
-            contract_size = lot_multiplier[lot_size]
-
-            # Calculate position value
-            position_value = position_size * contract_size * current_price
-
-            # Calculate required margin
-            required_margin = position_value / leverage
-
-            # Calculate free margin
-            used_margin = required_margin
-            free_margin = account_equity - used_margin
-
-            # Calculate margin level
-            margin_level = (account_equity / used_margin * 100) if used_margin > 0 else 0
-
-            # Calculate max position size
-            max_position_value = account_equity * leverage
-            max_lots = max_position_value / (contract_size * current_price)
-
-            # Calculate margin call and stop out thresholds
-            margin_call_equity = (margin_call_level / 100) * used_margin
-            stop_out_equity = (stop_out_level / 100) * used_margin
+            contract_size = LOT_MULTIPLIER[lot_size]
+
+            margin = calculate_margin(account_equity, leverage, position_size, contract_size, current_price,
+                                      margin_call_level, stop_out_level, currency_pair=currency_pair)
+            position_value = margin['position_value']
+            required_margin = margin['required_margin']
+            used_margin = margin['used_margin']
+            free_margin = margin['free_margin']
+            margin_level = margin['margin_level']
+            max_lots = margin['max_lots']
+            margin_call_equity = margin['margin_call_equity']
+            stop_out_equity = margin['stop_out_equity']
 
             st.success("### Margin Analysis Results")
 
@@ -532,26 +721,144 @@ else:  # section == "Broker Models"
             st.dataframe(pd.DataFrame(summary_data), use_container_width=True, hide_index=True)
 
             # Visualization
-            fig = go.Figure()
-
-            fig.add_trace(go.Bar(
-                x=['Account Equity', 'Used Margin', 'Free Margin', 'Margin Call Level', 'Stop Out Level'],
-                y=[account_equity, used_margin, free_margin, margin_call_equity, stop_out_equity],
-                marker_color=['blue', 'orange', 'green', 'yellow', 'red'],
-                text=[f'${account_equity:,.0f}', f'${used_margin:,.0f}', f'${free_margin:,.0f}',
-                      f'${margin_call_equity:,.0f}', f'${stop_out_equity:,.0f}'],
-                textposition='outside'
-            ))
-
-            fig.update_layout(
-                title="Margin Breakdown",
-                yaxis_title="Amount ($)",
-                showlegend=False,
-                height=400
+            fig = margin_breakdown_figure(account_equity, used_margin, free_margin, margin_call_equity, stop_out_equity)
+            st.plotly_chart(fig, use_container_width=True)
+
+        st.markdown("---")
+        st.subheader("Account Margin from Positions")
+        st.markdown("Equity, used/free margin and margin level for every account, with hedged netting, per-instrument rates and volume tiers")
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            margin_positions_file = st.file_uploader(
+                "Open Positions File",
+                type=["csv", "parquet"],
+                key="margin_positions_file",
+                help="Columns: Client ID, Instrument, Direction, Lots, Entry, Current (plus Equity if no accounts file)"
+            )
+            margin_accounts_file = st.file_uploader(
+                "Accounts File (optional)",
+                type=["csv", "parquet"],
+                key="margin_accounts_file",
+                help="Columns: Client ID, Balance, optional Leverage"
             )
 
+        with col2:
+            hedged_margin_ratio = st.slider(
+                "Hedged Margin Ratio",
+                min_value=0.0,
+                max_value=1.0,
+                value=0.5,
+                step=0.05,
+                help="Share of both hedged legs charged: 0 nets fully, 0.5 charges the larger leg, 1 charges gross"
+            )
+            use_volume_tiers = st.checkbox(
+                "Volume-Tiered Margin",
+                value=False,
+                help="Notional per account and instrument above $1M at 2x the rate, above $5M at 4x"
+            )
+
+        if margin_positions_file is not None and st.button("Calculate Account Margin", key="account_margin"):
+            try:
+                book_margin = account_margin(
+                    load_table_upload(margin_positions_file),
+                    load_table_upload(margin_accounts_file) if margin_accounts_file is not None else None,
+                    hedged_margin_ratio,
+                    DEFAULT_VOLUME_TIERS if use_volume_tiers else None,
+                    margin_call_level,
+                    stop_out_level
+                )
+            except (KeyError, ValueError) as exc:
+                st.error(f"⚠️ {exc}")
+                st.stop()
+
+            col1, col2, col3, col4 = st.columns(4)
+
+            with col1:
+                st.metric("Accounts", f"{book_margin['num_accounts']:,}")
+            with col2:
+                st.metric("Total Used Margin", f"${book_margin['total_used_margin']:,.2f}")
+            with col3:
+                st.metric("Margin Call", f"{book_margin['accounts_margin_call']:,}")
+            with col4:
+                st.metric("Stop Out", f"{book_margin['accounts_stop_out']:,}")
+
+            accounts_table = book_margin['accounts'].sort_values('Margin Level', ignore_index=True)
+            st.dataframe(
+                accounts_table,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "Balance": st.column_config.NumberColumn(format="dollar"),
+                    "Floating P&L": st.column_config.NumberColumn(format="dollar"),
+                    "Equity": st.column_config.NumberColumn(format="dollar"),
+                    "Used Margin": st.column_config.NumberColumn(format="dollar"),
+                    "Free Margin": st.column_config.NumberColumn(format="dollar"),
+                    "Margin Level": st.column_config.NumberColumn(format="%.1f%%")
+                }
+            )
+
+        st.markdown("---")
+        st.subheader("Stop-Out Stress Test")
+        st.markdown("Gap each instrument in the uploaded book by a grid of price shocks and count margin calls, stop-outs and the broker's loss on negative balances")
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            max_shock = st.slider("Largest Shock (%)", min_value=1.0, max_value=20.0, value=10.0, step=0.5)
+
+        with col2:
+            shock_step = st.select_slider("Shock Step (%)", options=[0.1, 0.25, 0.5, 1.0], value=0.5)
+
+        if margin_positions_file is not None and st.button("Run Stress Test", key="stop_out_stress"):
+            steps = np.arange(1.0, max_shock + shock_step / 2, shock_step)
+            shocks = np.concatenate([-steps[::-1], steps]) / 100
+
+            try:
+                stress_positions = load_table_upload(margin_positions_file)
+                stress = simulate_stop_outs(
+                    stress_positions,
+                    load_table_upload(margin_accounts_file) if margin_accounts_file is not None else None,
+                    shock_scenarios(pd.unique(stress_positions['Instrument']), shocks),
+                    hedged_margin_ratio,
+                    DEFAULT_VOLUME_TIERS if use_volume_tiers else None,
+                    margin_call_level,
+                    stop_out_level
+                )
+            except (KeyError, ValueError) as exc:
+                st.error(f"⚠️ {exc}")
+                st.stop()
+
+            worst = stress['worst_scenario']
+            col1, col2, col3, col4 = st.columns(4)
+
+            with col1:
+                st.metric("Scenarios x Accounts", f"{stress['num_scenarios']:,} x {stress['num_accounts']:,}")
+            with col2:
+                st.metric("Worst Broker Loss", f"${stress['max_broker_loss']:,.2f}")
+            with col3:
+                st.metric("Worst Scenario", f"{worst['Instrument']} {worst['Shock'] * 100:+.1f}%")
+            with col4:
+                st.metric("Stop-Outs in Worst Scenario", f"{worst['Stop Out']:,}")
+
+            results = stress['scenarios']
+            fig = stop_out_figure(results['Instrument'], results['Shock'] * 100, results['Broker Loss'])
             st.plotly_chart(fig, use_container_width=True)
 
+            # Worst case per instrument
+            worst_by_instrument = results.loc[results.groupby('Instrument', sort=False)['Broker Loss'].idxmax()]
+            st.dataframe(
+                worst_by_instrument.sort_values('Broker Loss', ascending=False),
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "Shock": st.column_config.NumberColumn(format="percent"),
+                    "Client Equity Lost": st.column_config.NumberColumn(format="dollar"),
+                    "Broker Loss": st.column_config.NumberColumn(format="dollar")
+                }
+            )
+
     # Tool 2: Swap/Rollover Rates Calculator
     elif tool == "Swap/Rollover Rates":
         st.header("Swap/Rollover Rates Calculator")
@@ -564,7 +871,7 @@ else:  # section == "Broker Models"
 
             currency_pair = st.selectbox(
                 "Currency Pair",
-                options=["EUR/USD", "GBP/USD", "USD/JPY", "AUD/USD", "USD/CHF", "NZD/USD", "USD/CAD", "EUR/GBP"],
+                options=INSTRUMENTS.symbols_for(),
                 key="swap_pair"
             )
 
@@ -582,30 +889,45 @@ else:  # section == "Broker Models"
                 key="swap_lots"
             )
 
+            swap_spec = INSTRUMENTS.spec(currency_pair)
             lot_size = st.selectbox(
                 "Lot Type",
                 options=["Standard (100k)", "Mini (10k)", "Micro (1k)"],
                 index=0,
-                key="swap_lot_type"
+                key="swap_lot_type",
+                disabled=swap_spec['Asset Class'] != "FX",
+                help="Non-FX instruments trade their registry contract size"
             )
 
+            # USD-based pairs price their quote-currency pip back to USD with their own rate
+            swap_price = None
+            if swap_spec['Base'] == "USD":
+                swap_price = st.number_input(
+                    "Current Price",
+                    min_value=0.0001,
+                    value=float(DEFAULT_QUOTES.get(currency_pair, 1.0)),
+                    step=0.0001,
+                    format="%.4f",
+                    key="swap_price"
+                )
+
         with col2:
             st.subheader("Swap Rates")
 
             long_swap_rate = st.number_input(
                 "Long Swap Rate (pips)",
-                min_value=-50.0,
-                max_value=50.0,
-                value=-2.5,
+                min_value=-500.0,
+                max_value=500.0,
+                value=float(INSTRUMENTS.long_swap[INSTRUMENTS.id(currency_pair)]),
                 step=0.1,
                 help="Swap charged for long positions (negative = cost, positive = credit)"
             )
 
             short_swap_rate = st.number_input(
                 "Short Swap Rate (pips)",
-                min_value=-50.0,
-                max_value=50.0,
-                value=0.8,
+                min_value=-500.0,
+                max_value=500.0,
+                value=float(INSTRUMENTS.short_swap[INSTRUMENTS.id(currency_pair)]),
                 step=0.1,
                 help="Swap charged for short positions (negative = cost, positive = credit)"
             )
@@ -625,39 +947,47 @@ else:  # section == "Broker Models"
                 value=30
             )
 
+            open_date = st.date_input("Position Open Date", value=datetime.now().date())
+
+            holiday_text = st.text_input(
+                "Settlement Holidays",
+                value="",
+                help="Comma-separated YYYY-MM-DD dates with no settlement; rollovers around them carry the extra days"
+            )
+
         if st.button("Calculate Swap Charges", type="primary"):
             # Lot size conversion
-            lot_multiplier = {"Standard (100k)": 100000, "Mini (10k)": 10000, "Micro (1k)": 1000}
-            contract_size = lot_multiplier[lot_size]
+            contract_size = contract_size_for(currency_pair, lot_size)
 
             # Determine applicable swap rate
             base_swap_rate = long_swap_rate if position_type == "Long (Buy)" else short_swap_rate
 
-            # Apply broker markup
-            swap_with_markup = base_swap_rate * (1 + broker_markup/100)
-
-            # Calculate pip value (simplified - assumes USD account)
-            # For most pairs, 1 pip = $10 per standard lot
-            pip_value = 10 * (contract_size / 100000) * position_size
-
-            # Calculate daily swap charge
-            daily_swap = swap_with_markup * pip_value
-
-            # Calculate for holding period
-            # Wednesday has triple swap (3-day rollover)
-            wednesdays = days_held // 7
-            regular_days = days_held - wednesdays
-            total_swap_days = regular_days + (wednesdays * 3)
-
-            total_swap_charge = daily_swap * total_swap_days
-
-            # Annual projection
-            annual_swap = daily_swap * (365 + (52 * 2))  # 365 days + 52 triple-swap Wednesdays
-
-            # Broker revenue from markup
-            base_daily_swap = base_swap_rate * pip_value
-            broker_revenue_daily = daily_swap - base_daily_swap
-            broker_revenue_total = broker_revenue_daily * total_swap_days
+            holidays = tuple(h.strip() for h in holiday_text.split(',') if h.strip())
+            settlement_days = settlement_days_for(currency_pair)
+            triple_swap_weekday = triple_swap_weekday_for(currency_pair)
+
+            try:
+                swap_pip_value = calculate_pip_value(currency_pair, "USD", position_size, contract_size, swap_price)
+            except KeyError as exc:
+                st.error(f"⚠️ {exc.args[0]}")
+                st.stop()
+
+            try:
+                swap = calculate_swap(position_size, contract_size, base_swap_rate, broker_markup, days_held,
+                                      open_date=open_date, settlement_days=settlement_days, holidays=holidays,
+                                      triple_swap_weekday=triple_swap_weekday, pip_value=swap_pip_value)
+            except ValueError as exc:
+                st.error(f"Invalid settlement holidays: {exc}")
+                st.stop()
+            swap_with_markup = swap['swap_with_markup']
+            pip_value = swap['pip_value']
+            daily_swap = swap['daily_swap']
+            triple_swap_days = swap['triple_swap_days']
+            total_swap_days = swap['total_swap_days']
+            total_swap_charge = swap['total_swap_charge']
+            annual_swap = swap['annual_swap']
+            broker_revenue_daily = swap['broker_revenue_daily']
+            broker_revenue_total = swap['broker_revenue_total']
 
             st.success("### Swap Calculation Results")
 
@@ -702,8 +1032,14 @@ else:  # section == "Broker Models"
 
             st.dataframe(pd.DataFrame(swap_data), use_container_width=True, hide_index=True)
 
-            # Triple swap Wednesday info
-            st.info(f"ℹ️ Calculation includes {wednesdays} triple-swap Wednesdays (3-day rollover)")
+            # Triple swap info (Wednesday for T+2 pairs, Thursday for T+1, fixed weekday for CFDs)
+            weekday_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+            if triple_swap_weekday is not None:
+                triple_weekday = weekday_names[triple_swap_weekday]
+            else:
+                triple_weekday = "Thursday" if settlement_days == 1 else "Wednesday"
+            st.info(f"ℹ️ Calculation includes {triple_swap_days} triple-swap rollovers "
+                    f"(3+ day rollover, usually {triple_weekday} for {currency_pair})")
 
             if daily_swap < 0:
                 st.warning(f"⚠️ This position costs ${abs(daily_swap):,.2f} per day in swap charges")
@@ -711,36 +1047,52 @@ else:  # section == "Broker Models"
                 st.success(f"✅ This position earns ${daily_swap:,.2f} per day in swap credits")
 
             # Visualization - Cumulative swap over time
-            days_range = list(range(1, min(days_held + 1, 91)))  # Max 90 days for visualization
-            cumulative_swaps = []
-
-            for day in days_range:
-                wed = day // 7
-                reg = day - wed
-                swap_days = reg + (wed * 3)
-                cumulative_swaps.append(daily_swap * swap_days)
-
-            fig = go.Figure()
-
-            fig.add_trace(go.Scatter(
-                x=days_range,
-                y=cumulative_swaps,
-                mode='lines',
-                fill='tozeroy',
-                name='Cumulative Swap',
-                line=dict(color='red' if daily_swap < 0 else 'green', width=2)
-            ))
-
-            fig.update_layout(
-                title="Cumulative Swap Charges Over Time",
-                xaxis_title="Days Held",
-                yaxis_title="Cumulative Swap ($)",
-                showlegend=True,
-                height=400
-            )
+            chart_days = min(days_held, 90)  # Max 90 days for visualization
+            days_range = np.arange(1, chart_days + 1)
+            cumulative_swaps = daily_swap * swap['cumulative_swap_days'][:chart_days]
 
+            fig = cumulative_swap_figure(days_range, cumulative_swaps, daily_swap)
             st.plotly_chart(fig, use_container_width=True)
 
+        # Nightly settlement of the whole book
+        st.markdown("---")
+        st.subheader("Nightly Book Settlement")
+        st.markdown("Settle the 5pm NY rollover for every open position in one pass. "
+                    "Upload a CSV/Parquet file with Instrument and Lots columns "
+                    "(optional Direction and Contract Size).")
+
+        book_file = st.file_uploader("Open Positions File", type=["csv", "parquet"], key="swap_book_file")
+
+        default_rates = pd.DataFrame({
+            "Instrument": INSTRUMENTS.symbols,
+            "Long Swap": INSTRUMENTS.long_swap,
+            "Short Swap": INSTRUMENTS.short_swap,
+            "Markup (%)": 10.0
+        })
+        swap_rates = st.data_editor(default_rates, num_rows="dynamic", hide_index=True, key="swap_rate_table")
+        settlement_date = st.date_input("Trade Date", value=datetime.now().date(), key="swap_settlement_date")
+
+        if book_file is not None and st.button("Settle Swaps", key="settle_swaps"):
+            book = load_table_upload(book_file)
+            holidays = tuple(h.strip() for h in holiday_text.split(',') if h.strip())
+            try:
+                settlement = settle_swaps(book, swap_rates.set_index("Instrument"), settlement_date, holidays)
+            except (KeyError, ValueError) as exc:
+                st.error(f"Could not settle book: {exc}")
+                st.stop()
+
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Positions Settled", f"{settlement['num_positions']:,}")
+            with col2:
+                st.metric("Net Swap to Clients", f"${settlement['total_swap_charge']:,.2f}")
+            with col3:
+                st.metric("Client Debits", f"${settlement['client_debits']:,.2f}")
+            with col4:
+                st.metric("Broker Markup Revenue", f"${settlement['broker_revenue']:,.2f}")
+
+            st.dataframe(settlement['by_instrument'], use_container_width=True, hide_index=True)
+
     # Tool 3: Pip Value & Commission Calculator
     elif tool == "Pip Value & Commission":
         st.header("Pip Value & Commission Calculator")
@@ -753,13 +1105,13 @@ else:  # section == "Broker Models"
 
             currency_pair = st.selectbox(
                 "Currency Pair",
-                options=["EUR/USD", "GBP/USD", "USD/JPY", "AUD/USD", "USD/CHF", "NZD/USD", "USD/CAD", "EUR/GBP", "EUR/JPY", "GBP/JPY"],
+                options=INSTRUMENTS.symbols_for(),
                 key="pip_pair"
             )
 
             account_currency = st.selectbox(
                 "Account Currency",
-                options=["USD", "EUR", "GBP"]
+                options=["USD", "EUR", "GBP", "JPY", "CHF", "AUD", "CAD"]
             )
 
             position_size = st.number_input(
@@ -775,7 +1127,9 @@ else:  # section == "Broker Models"
                 "Lot Type",
                 options=["Standard (100k)", "Mini (10k)", "Micro (1k)"],
                 index=0,
-                key="pip_lot_type"
+                key="pip_lot_type",
+                disabled=INSTRUMENTS.spec(currency_pair)['Asset Class'] != "FX",
+                help="Non-FX instruments trade their registry contract size"
             )
 
             current_price = st.number_input(
@@ -787,6 +1141,14 @@ else:  # section == "Broker Models"
                 key="pip_price"
             )
 
+            with st.expander("Quote Snapshot (for cross-currency conversion)"):
+                quote_table = st.data_editor(
+                    pd.DataFrame({"Pair": list(DEFAULT_QUOTES), "Price": list(DEFAULT_QUOTES.values())}),
+                    num_rows="dynamic",
+                    hide_index=True,
+                    key="pip_quotes"
+                )
+
         with col2:
             st.subheader("Broker Costs & Revenue")
 
@@ -827,43 +1189,29 @@ else:  # section == "Broker Models"
 
         if st.button("Calculate Pip Value & Costs", type="primary"):
             # Lot size conversion
-            lot_multiplier = {"Standard (100k)": 100000, "Mini (10k)": 10000, "Micro (1k)": 1000}
-            contract_size = lot_multiplier[lot_size]
+            contract_size = contract_size_for(currency_pair, lot_size)
 
             # Calculate pip value
-            # For pairs with USD as quote currency (EUR/USD, GBP/USD, etc.)
-            # 1 pip = 0.0001 for most pairs, 0.01 for JPY pairs
-            is_jpy_pair = "JPY" in currency_pair
-            pip_size = 0.01 if is_jpy_pair else 0.0001
-
-            # Pip value = (pip size / current price) * contract size * position size
-            # Simplified: For USD account and USD quote currency
-            pip_value = (pip_size / current_price) * contract_size * position_size
-
-            # For standard calculation: most pairs = $10 per pip per standard lot
-            if not is_jpy_pair and account_currency == "USD":
-                pip_value = 10 * (contract_size / 100000) * position_size
-            elif is_jpy_pair and account_currency == "USD":
-                pip_value = (0.01 / current_price) * contract_size * position_size
-
-            # Calculate spread cost
-            spread_cost = spread_pips * pip_value
-
-            # Calculate total commission
-            total_commission = commission_per_lot * position_size
-
-            # Total trading cost
-            total_cost = spread_cost + total_commission
-
-            # P&L calculation
-            pnl = pip_movement * pip_value
-            net_pnl = pnl - total_cost if pip_movement > 0 else pnl - total_cost
-
-            # Broker revenue projection
-            monthly_spread_revenue = spread_pips * pip_value * monthly_volume
-            monthly_commission_revenue = commission_per_lot * monthly_volume
-            monthly_total_revenue = monthly_spread_revenue + monthly_commission_revenue
-            annual_revenue = monthly_total_revenue * 12
+            quote_rows = quote_table.dropna()
+            quotes = dict(zip(quote_rows["Pair"].astype(str), quote_rows["Price"].astype(float)))
+            try:
+                pip_value = calculate_pip_value(currency_pair, account_currency, position_size, contract_size,
+                                                current_price, quotes)
+            except KeyError as exc:
+                st.error(f"Add a quote to the snapshot: {exc}")
+                st.stop()
+
+            costs = calculate_trade_costs(pip_value, position_size, spread_pips, commission_per_lot,
+                                          pip_movement, monthly_volume)
+            spread_cost = costs['spread_cost']
+            total_commission = costs['total_commission']
+            total_cost = costs['total_cost']
+            pnl = costs['pnl']
+            net_pnl = costs['net_pnl']
+            monthly_spread_revenue = costs['monthly_spread_revenue']
+            monthly_commission_revenue = costs['monthly_commission_revenue']
+            monthly_total_revenue = costs['monthly_total_revenue']
+            annual_revenue = costs['annual_revenue']
 
             st.success("### Calculation Results")
 
@@ -931,38 +1279,51 @@ else:  # section == "Broker Models"
             st.dataframe(pd.DataFrame(cost_data), use_container_width=True, hide_index=True)
 
             # Breakeven calculation
-            breakeven_pips = total_cost / pip_value
+            breakeven_pips = costs['breakeven_pips']
             st.info(f"ℹ️ Position must move {breakeven_pips:.1f} pips in your favor to break even after costs")
 
             # Visualization - P&L at different pip movements
-            pip_range = list(range(-200, 201, 10))
-            pnl_values = [(p * pip_value) - total_cost for p in pip_range]
-
-            fig = go.Figure()
-
-            fig.add_trace(go.Scatter(
-                x=pip_range,
-                y=pnl_values,
-                mode='lines',
-                fill='tozeroy',
-                name='Net P&L',
-                line=dict(color='blue', width=2),
-                fillcolor='rgba(0,100,255,0.2)'
-            ))
-
-            fig.add_hline(y=0, line_dash="dash", line_color="black", annotation_text="Breakeven")
-            fig.add_vline(x=breakeven_pips, line_dash="dot", line_color="red", annotation_text=f"BE: {breakeven_pips:.1f} pips")
-
-            fig.update_layout(
-                title="P&L Profile Across Pip Movements",
-                xaxis_title="Pip Movement",
-                yaxis_title="Net P&L ($)",
-                showlegend=True,
-                height=400
-            )
-
+            fig = pnl_profile_figure(pip_value, total_cost, breakeven_pips)
             st.plotly_chart(fig, use_container_width=True)
 
+        # Revenue projection from executed trades
+        st.markdown("---")
+        st.subheader("Revenue Projection from Trade Records")
+        st.markdown("Aggregate spread and commission revenue over a month of executed trades. "
+                    "Upload a CSV/Parquet file with Time, Instrument and Lots columns "
+                    "(optional Client Group, Spread (pips) and Commission per Lot).")
+
+        trades_file = st.file_uploader("Trade Records File", type=["csv", "parquet"], key="revenue_trades_file")
+
+        if trades_file is not None and st.button("Project Revenue", key="project_revenue"):
+            quote_rows = quote_table.dropna()
+            quotes = dict(zip(quote_rows["Pair"].astype(str), quote_rows["Price"].astype(float)))
+            try:
+                # The upload is streamed in chunks rather than loaded as one DataFrame
+                revenue = project_revenue(trades_file, spread_pips, commission_per_lot,
+                                          account_currency=account_currency, quotes=quotes)
+            except (KeyError, ValueError) as exc:
+                st.error(f"Could not project revenue: {exc}")
+                st.stop()
+
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Trades", f"{revenue['num_trades']:,}")
+            with col2:
+                st.metric("Spread Revenue", f"${revenue['spread_revenue']:,.2f}")
+            with col3:
+                st.metric("Commission Revenue", f"${revenue['commission_revenue']:,.2f}")
+            with col4:
+                st.metric("Total Revenue", f"${revenue['total_revenue']:,.2f}")
+
+            tab1, tab2, tab3 = st.tabs(["By Instrument", "By Client Group", "By Day"])
+            with tab1:
+                st.dataframe(revenue['by_instrument'], use_container_width=True, hide_index=True)
+            with tab2:
+                st.dataframe(revenue['by_client_group'], use_container_width=True, hide_index=True)
+            with tab3:
+                st.line_chart(revenue['by_day'].set_index('Day')[['Spread Revenue', 'Commission Revenue']])
+
     # Tool 4: Net Exposure & Hedging Calculator
     elif tool == "Net Exposure & Hedging":
         st.header("Net Exposure & Hedging Calculator")
@@ -973,7 +1334,7 @@ else:  # section == "Broker Models"
         # Currency pair selection
         currency_pair = st.selectbox(
             "Currency Pair",
-            options=["EUR/USD", "GBP/USD", "USD/JPY", "AUD/USD", "USD/CHF", "NZD/USD", "USD/CAD", "EUR/GBP", "GBP/JPY", "EUR/JPY"],
+            options=INSTRUMENTS.symbols_for(),
             key="exposure_pair"
         )
 
@@ -1037,25 +1398,16 @@ else:  # section == "Broker Models"
         if st.button("Calculate Net Exposure", type="primary"):
             df = pd.DataFrame(client_positions)
 
-            # Calculate net exposure
-            total_long = df[df['Direction'] == 'Long']['Lots'].sum()
-            total_short = df[df['Direction'] == 'Short']['Lots'].sum()
-            net_exposure = total_long - total_short
-
-            # Determine hedge requirement
-            if abs(net_exposure) > exposure_limit:
-                hedge_required = abs(net_exposure) - exposure_limit
-                hedge_direction = "Sell" if net_exposure > 0 else "Buy"
-            else:
-                hedge_required = 0
-                hedge_direction = "None"
-
-            # Calculate costs
-            hedge_cost = hedge_required * lp_spread * pip_value_per_lot
-            exposure_kept = min(abs(net_exposure), exposure_limit)
-
-            # Risk calculation (if market moves 100 pips)
-            risk_per_100_pips = exposure_kept * 100 * pip_value_per_lot
+            # Calculate net exposure and hedge requirement
+            exposure = calculate_net_exposure(df['Signed Lots'], exposure_limit, lp_spread, pip_value_per_lot)
+            total_long = exposure['total_long']
+            total_short = exposure['total_short']
+            net_exposure = exposure['net_exposure']
+            hedge_required = exposure['hedge_required']
+            hedge_direction = exposure['hedge_direction']
+            hedge_cost = exposure['hedge_cost']
+            exposure_kept = exposure['exposure_kept']
+            risk_per_100_pips = exposure['risk_per_100_pips']
 
             st.success("### Net Exposure Analysis")
 
@@ -1068,7 +1420,7 @@ else:  # section == "Broker Models"
             with col3:
                 st.metric("Net Exposure", f"{net_exposure:+.2f} lots", delta=f"{'Long' if net_exposure > 0 else 'Short' if net_exposure < 0 else 'Neutral'}")
             with col4:
-                exposure_pct = (abs(net_exposure) / exposure_limit * 100) if exposure_limit > 0 else 0
+                exposure_pct = exposure['exposure_pct']
                 st.metric("Exposure vs Limit", f"{exposure_pct:.1f}%")
 
             # Hedging recommendation
@@ -1104,214 +1456,401 @@ else:  # section == "Broker Models"
             st.dataframe(display_df, use_container_width=True, hide_index=True)
 
             # Visualization - Long vs Short
-            fig = go.Figure()
-
-            fig.add_trace(go.Bar(
-                x=['Long Positions', 'Short Positions', 'Net Exposure', 'Exposure Limit'],
-                y=[total_long, total_short, abs(net_exposure), exposure_limit],
-                marker_color=['green', 'red', 'blue', 'orange'],
-                text=[f'{total_long:.2f}', f'{total_short:.2f}', f'{abs(net_exposure):.2f}', f'{exposure_limit:.2f}'],
-                textposition='outside'
-            ))
-
-            fig.update_layout(
-                title="Position Exposure Analysis",
-                yaxis_title="Lots",
-                showlegend=False,
-                height=400
-            )
+            fig = exposure_figure(total_long, total_short, net_exposure, exposure_limit)
+            st.plotly_chart(fig, use_container_width=True)
 
+        # Book-wide exposure across every client and instrument
+        st.markdown("---")
+        st.subheader("Book-wide Exposure")
+        st.markdown("Net every client position across all instruments and split it into currency legs. "
+                    "Upload a CSV/Parquet file with Instrument and Signed Lots columns "
+                    "(or Lots with a Long/Short Direction).")
+
+        book_file = st.file_uploader("Client Positions File", type=["csv", "parquet"], key="exposure_book_file")
+        currency_limit = st.number_input(
+            "Currency Exposure Limit (USD)",
+            min_value=0.0,
+            value=5000000.0,
+            step=100000.0,
+            help="Maximum net exposure per currency leg; the hedge optimizer brings every leg within it"
+        )
+
+        if book_file is not None and st.button("Aggregate Book Exposure", key="aggregate_book_exposure"):
+            try:
+                book = book_exposure(load_table_upload(book_file), exposure_limits=exposure_limit)
+            except (KeyError, ValueError) as exc:
+                st.error(f"Could not aggregate book: {exc}")
+                st.stop()
+
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Positions", f"{book['num_positions']:,}")
+            with col2:
+                st.metric("Gross Lots", f"{book['gross_lots']:,.2f}")
+            with col3:
+                st.metric("Net Notional (USD)", f"${book['gross_net_notional']:,.0f}")
+            with col4:
+                st.metric("Instruments Over Limit", book['instruments_over_limit'])
+
+            if book['unpriced_instruments']:
+                st.warning(f"⚠️ No price for {', '.join(book['unpriced_instruments'])} - left out of currency legs")
+
+            st.dataframe(book['by_instrument'], use_container_width=True, hide_index=True)
+
+            by_currency = book['by_currency']
+            fig = currency_exposure_figure(by_currency['Currency'], by_currency['Net Value (USD)'])
             st.plotly_chart(fig, use_container_width=True)
 
-    # Tool 5: Client Position Monitor Dashboard
-    elif tool == "Client Position Monitor":
-        st.header("Client Position Monitor Dashboard")
-        st.markdown("Real-time monitoring of all open client positions with risk flagging")
+            # Cheapest hedge set across all pairs, netting through crosses
+            st.subheader("Optimized Hedges")
+            try:
+                hedging = optimize_hedges(by_currency, currency_limit, spreads=lp_spread)
+            except ValueError as exc:
+                st.error(f"Could not optimize hedges: {exc}")
+                st.stop()
 
-        st.subheader("Enter Client Positions")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Optimized Hedge Cost", f"${hedging['total_cost']:,.2f}")
+            with col2:
+                st.metric("Pair-by-Pair Hedge Cost", f"${hedging['pairwise_cost']:,.2f}")
+            with col3:
+                st.metric("Hedge Trades", len(hedging['hedges']))
 
-        num_positions = st.number_input("Number of Open Positions", min_value=1, max_value=30, value=8)
+            if hedging['unhedgeable']:
+                st.warning(f"⚠️ No hedge instrument for {', '.join(hedging['unhedgeable'])}")
 
-        positions = []
+            st.dataframe(hedging['hedges'], use_container_width=True, hide_index=True)
 
-        for i in range(num_positions):
-            with st.expander(f"Position {i+1}", expanded=(i<3)):
-                col1, col2, col3, col4 = st.columns(4)
+        # Live exposure book updated per trade event
+        st.markdown("---")
+        st.subheader("Live Trade Events")
+        st.markdown("Apply opens, partial fills and closes to a running exposure book; "
+                    "limit crossings are flagged as they happen.")
 
-                with col1:
-                    client_id = st.text_input("Client ID", value=f"C{i+1:04d}", key=f"mon_client_{i}")
-                    pair = st.selectbox("Pair", options=["EUR/USD", "GBP/USD", "USD/JPY", "AUD/USD", "USD/CHF"], key=f"mon_pair_{i}")
+        if "exposure_book" not in st.session_state:
+            st.session_state.exposure_book = ExposureBook(exposure_limits=exposure_limit)
+        live_book = st.session_state.exposure_book
+        # Follow the limit input on every rerun, not just when the book is created
+        if not (live_book.limits == exposure_limit).all():
+            live_book.set_limits(exposure_limit)
 
-                with col2:
-                    direction = st.selectbox("Direction", options=["Long", "Short"], key=f"mon_dir_{i}")
-                    lots = st.number_input("Lots", min_value=0.01, value=1.0, step=0.01, key=f"mon_lots_{i}")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            event_type = st.selectbox("Event", options=["Open / Fill", "Close"], key="event_type")
+            event_position = st.text_input("Position ID", value="T0001", key="event_position")
+        with col2:
+            event_pair = st.selectbox("Instrument", options=INSTRUMENTS.symbols_for(), key="event_pair")
+            event_direction = st.selectbox("Direction", options=["Long", "Short"], key="event_direction")
+        with col3:
+            event_lots = st.number_input("Lots", min_value=0.0, value=1.0, step=0.01, key="event_lots",
+                                         help="For closes, 0 closes the whole position")
+        with col4:
+            event_price = st.number_input("Fill Price", min_value=0.0001, value=1.1000, step=0.0001,
+                                          format="%.4f", key="event_price")
 
-                with col3:
-                    entry_price = st.number_input("Entry Price", min_value=0.0001, value=1.1000, step=0.0001, format="%.4f", key=f"mon_entry_{i}")
-                    current_price = st.number_input("Current Price", min_value=0.0001, value=1.1050, step=0.0001, format="%.4f", key=f"mon_curr_{i}")
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Apply Event", key="apply_event"):
+                if event_type == "Close":
+                    if event_position in live_book.positions:
+                        live_book.close(event_position, event_lots or None, event_price)
+                    else:
+                        st.error(f"No open position {event_position}")
+                else:
+                    signed = event_lots if event_direction == "Long" else -event_lots
+                    try:
+                        live_book.fill(event_position, event_pair, signed, event_price)
+                    except ValueError as exc:
+                        st.error(f"⚠️ {exc}")
+        with col2:
+            if st.button("Reset Book", key="reset_exposure_book"):
+                st.session_state.exposure_book = live_book = ExposureBook(exposure_limits=exposure_limit)
 
-                with col4:
-                    equity = st.number_input("Client Equity ($)", min_value=0.0, value=10000.0, step=100.0, key=f"mon_equity_{i}")
-                    duration_hours = st.number_input("Duration (hours)", min_value=0, value=24, key=f"mon_dur_{i}")
+        for alert in list(live_book.alerts)[-5:]:
+            if alert['breached']:
+                st.error(f"🚨 {alert['instrument']} net {alert['net_lots']:+.2f} lots crossed limit "
+                         f"{alert['limit']:.2f} - hedge {alert['hedge_required']:.2f} lots via {alert['hedge_direction']}")
+            else:
+                st.success(f"✅ {alert['instrument']} back within limit ({alert['net_lots']:+.2f} lots)")
 
-                # Calculate P&L
-                pip_movement = (current_price - entry_price) * 10000 if "JPY" not in pair else (current_price - entry_price) * 100
-                if direction == "Short":
-                    pip_movement = -pip_movement
+        st.dataframe(live_book.snapshot(), use_container_width=True, hide_index=True)
 
-                pip_value = 10 if "JPY" not in pair else (10 / current_price * 100)
-                pnl = pip_movement * pip_value * lots
+    # Tool 5: Client Position Monitor Dashboard
+    elif tool == "Client Position Monitor":
+        st.header("Client Position Monitor Dashboard")
+        st.markdown("Real-time monitoring of all open client positions with risk flagging")
 
-                # Calculate margin level (simplified)
-                margin_used = (lots * 100000 * entry_price) / 100  # Assuming 100:1 leverage
-                margin_level = (equity / margin_used * 100) if margin_used > 0 else 0
+        input_method = st.radio(
+            "Input Method",
+            options=["Manual Entry", "Upload Positions File"],
+            horizontal=True,
+            key="monitor_input_method"
+        )
 
-                positions.append({
-                    "Client ID": client_id,
-                    "Pair": pair,
-                    "Direction": direction,
-                    "Lots": lots,
-                    "Entry": entry_price,
-                    "Current": current_price,
-                    "Pips": pip_movement,
-                    "P&L": pnl,
-                    "Equity": equity,
-                    "Margin Level": margin_level,
-                    "Duration (hrs)": duration_hours
-                })
+        positions = []
+        positions_file = None
+
+        if input_method == "Manual Entry":
+            st.subheader("Enter Client Positions")
+
+            num_positions = st.number_input("Number of Open Positions", min_value=1, max_value=30, value=8)
+
+            for i in range(num_positions):
+                with st.expander(f"Position {i+1}", expanded=(i<3)):
+                    col1, col2, col3, col4 = st.columns(4)
+
+                    with col1:
+                        client_id = st.text_input("Client ID", value=f"C{i+1:04d}", key=f"mon_client_{i}")
+                        pair = st.selectbox("Pair", options=INSTRUMENTS.symbols_for(), key=f"mon_pair_{i}")
+
+                    with col2:
+                        direction = st.selectbox("Direction", options=["Long", "Short"], key=f"mon_dir_{i}")
+                        lots = st.number_input("Lots", min_value=0.01, value=1.0, step=0.01, key=f"mon_lots_{i}")
+
+                    with col3:
+                        entry_price = st.number_input("Entry Price", min_value=0.0001, value=1.1000, step=0.0001, format="%.4f", key=f"mon_entry_{i}")
+                        current_price = st.number_input("Current Price", min_value=0.0001, value=1.1050, step=0.0001, format="%.4f", key=f"mon_curr_{i}")
+
+                    with col4:
+                        equity = st.number_input("Client Equity ($)", min_value=0.0, value=10000.0, step=100.0, key=f"mon_equity_{i}")
+                        duration_hours = st.number_input("Duration (hours)", min_value=0, value=24, key=f"mon_dur_{i}")
+
+                    positions.append({
+                        "Client ID": client_id,
+                        "Instrument": pair,
+                        "Direction": direction,
+                        "Lots": lots,
+                        "Entry": entry_price,
+                        "Current": current_price,
+                        "Equity": equity,
+                        "Duration (hrs)": duration_hours
+                    })
+        else:
+            st.subheader("Upload Open Positions")
+            positions_file = st.file_uploader(
+                "Open Positions File",
+                type=["csv", "parquet"],
+                key="monitor_positions_file",
+                help="Columns: Client ID, Instrument, Direction, Lots, Entry, Current, Equity"
+            )
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            margin_call_level = st.number_input("Margin Call Alert Level (%)", min_value=0.0, value=150.0, step=10.0)
+
+        with col2:
+            large_position_lots = st.number_input("Large Position Threshold (lots)", min_value=0.0, value=5.0, step=0.5)
+
+        monitor_df = None
+        if input_method == "Manual Entry":
+            monitor_df = pd.DataFrame(positions)
+        elif positions_file is not None:
+            monitor_df = load_table_upload(positions_file)
 
         if st.button("Analyze Positions", type="primary"):
-            df = pd.DataFrame(positions)
+            if monitor_df is None:
+                st.error("Upload a positions file to analyze the book")
+                st.stop()
 
-            # Calculate aggregate metrics
-            total_pnl = df['P&L'].sum()
-            winning_positions = len(df[df['P&L'] > 0])
-            losing_positions = len(df[df['P&L'] < 0])
-            positions_at_risk = len(df[df['Margin Level'] < 150])
+            try:
+                monitor = monitor_positions(monitor_df, margin_call_level, large_position_lots)
+            except (KeyError, ValueError) as exc:
+                st.error(f"⚠️ {exc}")
+                st.stop()
 
             st.success("### Position Summary")
 
             col1, col2, col3, col4 = st.columns(4)
 
             with col1:
-                st.metric("Total Open Positions", len(df))
+                st.metric("Total Open Positions", f"{monitor['num_positions']:,}")
             with col2:
-                st.metric("Aggregate Client P&L", f"${total_pnl:,.2f}")
+                st.metric("Aggregate Client P&L", f"${monitor['total_pnl']:,.2f}")
             with col3:
-                st.metric("Winning Positions", winning_positions)
+                st.metric("Winning Positions", f"{monitor['winning_positions']:,}")
             with col4:
-                st.metric("At Risk (ML < 150%)", positions_at_risk)
+                st.metric(f"At Risk (ML < {margin_call_level:.0f}%)", f"{monitor['positions_at_risk']:,}")
 
             # Risk flagging
             st.subheader("Risk Alerts")
 
-            # Flag positions near margin call
-            margin_call_positions = df[df['Margin Level'] < 150]
-            if len(margin_call_positions) > 0:
-                st.warning(f"⚠️ {len(margin_call_positions)} position(s) approaching margin call threshold")
-                for idx, row in margin_call_positions.iterrows():
-                    st.error(f"🚨 {row['Client ID']} - {row['Pair']} - Margin Level: {row['Margin Level']:.1f}%")
+            alerts = monitor['alerts']
+            if monitor['positions_at_risk'] > 0:
+                st.warning(f"⚠️ {monitor['positions_at_risk']:,} position(s) approaching margin call threshold")
             else:
                 st.success("✅ All positions have healthy margin levels")
+            if monitor['large_positions'] > 0:
+                st.info(f"ℹ️ {monitor['large_positions']:,} large position(s) detected (>{large_position_lots:g} lots)")
+
+            position_columns = {
+                "Lots": st.column_config.NumberColumn(format="%.2f"),
+                "Pips": st.column_config.NumberColumn(format="%+.1f"),
+                "Pip Value": st.column_config.NumberColumn(format="$%.2f"),
+                "P&L": st.column_config.NumberColumn(format="dollar"),
+                "Equity": st.column_config.NumberColumn(format="dollar"),
+                "Margin Used": st.column_config.NumberColumn(format="dollar"),
+                "Margin Level": st.column_config.NumberColumn(format="%.1f%%")
+            }
 
-            # Flag large positions
-            large_positions = df[df['Lots'] > 5]
-            if len(large_positions) > 0:
-                st.info(f"ℹ️ {len(large_positions)} large position(s) detected (>5 lots)")
+            if len(alerts) > 0:
+                st.dataframe(alerts, use_container_width=True, hide_index=True, column_config=position_columns)
 
             # Full position table
             st.subheader("All Open Positions")
+            st.dataframe(monitor['positions'], use_container_width=True, hide_index=True,
+                         column_config=position_columns)
 
-            # Format display dataframe
-            display_df = df.copy()
-            display_df['P&L'] = display_df['P&L'].apply(lambda x: f"${x:,.2f}")
-            display_df['Equity'] = display_df['Equity'].apply(lambda x: f"${x:,.0f}")
-            display_df['Margin Level'] = display_df['Margin Level'].apply(lambda x: f"{x:.1f}%")
-            display_df['Pips'] = display_df['Pips'].apply(lambda x: f"{x:+.1f}")
-
-            st.dataframe(display_df, use_container_width=True, hide_index=True)
-
-            # Visualization - P&L by client
-            fig = go.Figure()
-
-            colors = ['green' if pnl > 0 else 'red' for pnl in df['P&L']]
-
-            fig.add_trace(go.Bar(
-                x=df['Client ID'],
-                y=df['P&L'],
-                marker_color=colors,
-                text=[f'${pnl:,.0f}' for pnl in df['P&L']],
-                textposition='outside'
-            ))
-
-            fig.update_layout(
-                title="Client P&L Overview",
-                xaxis_title="Client ID",
-                yaxis_title="P&L ($)",
-                showlegend=False,
-                height=400
-            )
-
+            # Visualization - P&L by client (largest absolute P&L first)
+            by_client = monitor['by_client'].head(30)
+            fig = client_pnl_figure(by_client['Client ID'], by_client['P&L'])
             st.plotly_chart(fig, use_container_width=True)
 
             # Pair concentration
             st.subheader("Position Concentration by Pair")
-            pair_summary = df.groupby('Pair')['Lots'].sum().reset_index()
-            pair_summary.columns = ['Currency Pair', 'Total Lots']
+            by_instrument = monitor['by_instrument']
 
-            fig2 = px.pie(pair_summary, values='Total Lots', names='Currency Pair', title='Position Distribution by Pair')
+            fig2 = allocation_pie(by_instrument['Instrument'], by_instrument['Lots'].to_numpy(),
+                                  'Position Distribution by Pair', 'Currency Pair', 'Total Lots')
             st.plotly_chart(fig2, use_container_width=True)
 
+        st.markdown("---")
+        st.subheader("Live Mark-to-Market")
+        st.markdown("Replay a price feed against the positions above; each tick revalues only the positions in its instrument and the accounts holding them")
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            tick_file = st.file_uploader("Price Feed (Time, Instrument, Price)", type=["csv", "parquet"], key="monitor_tick_file")
+
+        with col2:
+            refresh_ticks = st.number_input("Ticks per Screen Refresh", min_value=1, value=1000, step=100)
+
+        # The replayed monitor lives in session state, keyed on the feed and the positions
+        replay_key = None
+        if tick_file is not None and monitor_df is not None:
+            positions_key = (positions_file.file_id if input_method != "Manual Entry"
+                             else tuple(monitor_df.itertuples(index=False)))
+            replay_key = (tick_file.file_id, tick_file.name, tick_file.size, positions_key)
+        replayed = st.session_state.get("live_monitor")
+        if replayed is not None and replayed[0] != replay_key:
+            replayed = st.session_state.live_monitor = None
+
+        summary_slot = st.empty()
+        changes_slot = st.empty()
+
+        if tick_file is not None and st.button("Replay Price Feed", key="replay_price_feed"):
+            if monitor_df is None:
+                st.error("Upload a positions file to mark to market")
+                st.stop()
+
+            try:
+                live = LiveMonitor(monitor_df)
+                tick_time = None
+                # The feed is streamed from the upload in chunks
+                tick_file.seek(0)
+                for tick_time, changed in live.replay(iter_ticks(tick_file), refresh_ticks):
+                    show_live_summary(summary_slot, live, tick_time, margin_call_level)
+                    # Only the positions revalued since the last refresh are redrawn
+                    changes_slot.dataframe(live.rows(changed), use_container_width=True, hide_index=True)
+            except (KeyError, ValueError) as exc:
+                st.error(f"⚠️ {exc}")
+                st.stop()
+            replayed = st.session_state.live_monitor = (replay_key, live, tick_time)
+        elif replayed is not None:
+            show_live_summary(summary_slot, replayed[1], replayed[2], margin_call_level)
+
+        if replayed is not None:
+            st.subheader("Accounts at Latest Prices")
+            st.dataframe(replayed[1].accounts(), use_container_width=True, hide_index=True)
+
     # Tool 6: A-Book vs B-Book Decision Tool
     else:  # A-Book vs B-Book
         st.header("A-Book vs B-Book Decision Tool")
         st.markdown("Analyze client profitability and determine optimal booking strategy")
 
-        st.subheader("Enter Client Trading History")
-
-        num_clients = st.number_input("Number of Clients to Analyze", min_value=1, max_value=20, value=6)
+        input_method = st.radio(
+            "Client Data",
+            options=["Manual Entry", "Trade & Quote Tapes"],
+            horizontal=True,
+            key="booking_input_method",
+            help="Tapes derive win rate, trade size, hold time and toxicity (markouts, latency arbitrage) from raw fills"
+        )
 
         clients = []
+        trades_file = None
+        quotes_file = None
+
+        if input_method == "Manual Entry":
+            st.subheader("Enter Client Trading History")
+
+            num_clients = st.number_input("Number of Clients to Analyze", min_value=1, max_value=20, value=6)
+
+            clients = []
+
+            for i in range(num_clients):
+                with st.expander(f"Client {i+1}", expanded=(i<3)):
+                    col1, col2, col3 = st.columns(3)
+
+                    with col1:
+                        client_id = st.text_input("Client ID", value=f"CLIENT{i+1:03d}", key=f"ab_client_{i}")
+                        total_trades = st.number_input("Total Trades (30 days)", min_value=1, value=50, key=f"ab_trades_{i}")
+                        winning_trades = st.number_input("Winning Trades", min_value=0, value=25, key=f"ab_wins_{i}")
+
+                    with col2:
+                        avg_trade_size = st.number_input("Avg Trade Size (lots)", min_value=0.01, value=1.0, step=0.01, key=f"ab_size_{i}")
+                        total_volume = st.number_input("Total Volume (lots)", min_value=0.0, value=50.0, step=1.0, key=f"ab_vol_{i}")
+                        avg_hold_time = st.number_input("Avg Hold Time (hours)", min_value=0.1, value=24.0, step=0.1, key=f"ab_hold_{i}")
+
+                    with col3:
+                        gross_pnl = st.number_input("Client Gross P&L ($)", value=1000.0, step=100.0, key=f"ab_pnl_{i}")
+                        commission_paid = st.number_input("Commission Paid ($)", min_value=0.0, value=350.0, step=10.0, key=f"ab_comm_{i}")
+
+                    # Calculate metrics
+                    win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
+                    losing_trades = total_trades - winning_trades
+                    profit_factor = abs(gross_pnl / (commission_paid + 1)) if commission_paid > 0 else 0
+
+                    # Determine if toxic flow
+                    is_toxic = is_toxic_flow(win_rate, avg_trade_size, avg_hold_time)
+                    is_profitable_to_broker = gross_pnl < 0  # Client is losing
+
+                    clients.append({
+                        "Client ID": client_id,
+                        "Total Trades": total_trades,
+                        "Win Rate": win_rate,
+                        "Avg Trade Size": avg_trade_size,
+                        "Total Volume": total_volume,
+                        "Avg Hold Time": avg_hold_time,
+                        "Client P&L": gross_pnl,
+                        "Commission Revenue": commission_paid,
+                        "Toxic Flow": is_toxic,
+                        "Profitable to Broker": is_profitable_to_broker
+                    })
+        else:
+            st.subheader("Upload Trade and Quote Tapes")
 
-        for i in range(num_clients):
-            with st.expander(f"Client {i+1}", expanded=(i<3)):
-                col1, col2, col3 = st.columns(3)
-
-                with col1:
-                    client_id = st.text_input("Client ID", value=f"CLIENT{i+1:03d}", key=f"ab_client_{i}")
-                    total_trades = st.number_input("Total Trades (30 days)", min_value=1, value=50, key=f"ab_trades_{i}")
-                    winning_trades = st.number_input("Winning Trades", min_value=0, value=25, key=f"ab_wins_{i}")
-
-                with col2:
-                    avg_trade_size = st.number_input("Avg Trade Size (lots)", min_value=0.01, value=1.0, step=0.01, key=f"ab_size_{i}")
-                    total_volume = st.number_input("Total Volume (lots)", min_value=0.0, value=50.0, step=1.0, key=f"ab_vol_{i}")
-                    avg_hold_time = st.number_input("Avg Hold Time (hours)", min_value=0.1, value=24.0, step=0.1, key=f"ab_hold_{i}")
-
-                with col3:
-                    gross_pnl = st.number_input("Client Gross P&L ($)", value=1000.0, step=100.0, key=f"ab_pnl_{i}")
-                    commission_paid = st.number_input("Commission Paid ($)", min_value=0.0, value=350.0, step=10.0, key=f"ab_comm_{i}")
-
-                # Calculate metrics
-                win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
-                losing_trades = total_trades - winning_trades
-                profit_factor = abs(gross_pnl / (commission_paid + 1)) if commission_paid > 0 else 0
+            col1, col2 = st.columns(2)
 
-                # Determine if toxic flow
-                is_toxic = win_rate > 60 or avg_trade_size > 5 or avg_hold_time < 2
-                is_profitable_to_broker = gross_pnl < 0  # Client is losing
+            with col1:
+                trades_file = st.file_uploader(
+                    "Trade Tape",
+                    type=["csv", "parquet"],
+                    key="booking_trades_file",
+                    help="Columns: Time, Client ID, Instrument, Direction, Lots, Price; optional Close Time, P&L, Commission"
+                )
+                tape_commission = st.number_input("Commission per Lot ($, if no Commission column)", min_value=0.0, value=7.0, step=0.5)
 
-                clients.append({
-                    "Client ID": client_id,
-                    "Total Trades": total_trades,
-                    "Win Rate": win_rate,
-                    "Avg Trade Size": avg_trade_size,
-                    "Total Volume": total_volume,
-                    "Avg Hold Time": avg_hold_time,
-                    "Client P&L": gross_pnl,
-                    "Commission Revenue": commission_paid,
-                    "Toxic Flow": is_toxic,
-                    "Profitable to Broker": is_profitable_to_broker
-                })
+            with col2:
+                quotes_file = st.file_uploader(
+                    "Quote Tape",
+                    type=["csv", "parquet"],
+                    key="booking_quotes_file",
+                    help="Columns: Time, Instrument, Bid, Ask"
+                )
+                toxic_markout_pips = st.number_input("Toxic 60s Markout (pips)", min_value=0.0, value=0.5, step=0.1)
+                latency_arb_share = st.slider("Toxic Latency-Arb Share of Fills", min_value=0.0, max_value=1.0, value=0.2, step=0.05)
 
         col1, col2 = st.columns(2)
 
@@ -1332,43 +1871,25 @@ else:  # section == "Broker Models"
             )
 
         if st.button("Analyze Clients & Generate Recommendations", type="primary"):
-            df = pd.DataFrame(clients)
-
-            # Calculate net broker revenue for each scenario
-            df['A-Book Revenue'] = df['Commission Revenue'] - (df['Total Volume'] * lp_commission_cost)
-            df['B-Book Revenue'] = df['Commission Revenue'] - df['Client P&L']  # Broker takes opposite side
-
-            # Determine recommendation
-            recommendations = []
-            for idx, row in df.iterrows():
-                if row['Toxic Flow']:
-                    # Toxic flow should be A-Booked to avoid risk
-                    recommendation = "A-Book"
-                    reason = "Toxic flow - hedge with LP"
-                elif row['Win Rate'] < 45:
-                    # Losing clients can be B-Booked
-                    if risk_tolerance in ["Moderate", "Aggressive"]:
-                        recommendation = "B-Book"
-                        reason = "Profitable client pattern"
-                    else:
-                        recommendation = "A-Book"
-                        reason = "Conservative policy"
-                elif row['Avg Trade Size'] > 5:
-                    # Large positions should be hedged
-                    recommendation = "A-Book"
-                    reason = "Large position size risk"
-                else:
-                    # Default based on profitability
-                    if row['B-Book Revenue'] > row['A-Book Revenue'] and not row['Toxic Flow']:
-                        recommendation = "B-Book" if risk_tolerance != "Conservative" else "Hybrid"
-                        reason = "More profitable to internalize"
-                    else:
-                        recommendation = "A-Book"
-                        reason = "Better A-Book economics"
-
-                recommendations.append(recommendation)
-
-            df['Recommendation'] = recommendations
+            if input_method == "Manual Entry":
+                client_table = pd.DataFrame(clients)
+            elif trades_file is None or quotes_file is None:
+                st.error("Upload both a trade tape and a quote tape to analyze clients")
+                st.stop()
+            else:
+                try:
+                    # Both tapes are streamed in chunks rather than loaded as DataFrames
+                    client_table = toxicity_features(
+                        trades_file, quotes_file,
+                        commission_per_lot=tape_commission, toxic_markout_pips=toxic_markout_pips,
+                        latency_arb_share=latency_arb_share
+                    )
+                except (KeyError, ValueError) as exc:
+                    st.error(f"⚠️ {exc}")
+                    st.stop()
+
+            # Calculate broker revenue per scenario and determine recommendation
+            df = analyze_booking(client_table, lp_commission_cost, risk_tolerance)
 
             # Summary metrics
             total_abook = len(df[df['Recommendation'] == 'A-Book'])
@@ -1407,7 +1928,7 @@ else:  # section == "Broker Models"
 
             display_df = df[[
                 'Client ID', 'Win Rate', 'Avg Trade Size', 'Total Volume',
-                'Client P&L', 'Commission Revenue', 'Toxic Flow', 'Recommendation'
+                'Client P&L', 'Commission Revenue', 'Toxic Flow', 'Recommendation', 'Reason'
             ]].copy()
 
             display_df['Win Rate'] = display_df['Win Rate'].apply(lambda x: f"{x:.1f}%")
@@ -1426,47 +1947,64 @@ else:  # section == "Broker Models"
 
             st.dataframe(display_df, use_container_width=True, hide_index=True)
 
+            if input_method != "Manual Entry":
+                st.subheader("Toxicity Features from Tapes")
+                feature_columns = ['Client ID', 'Avg Hold Time'] + [
+                    column for column in df.columns if column.startswith(('Markout', 'Hold ', 'Latency'))
+                ]
+                st.dataframe(df[feature_columns], use_container_width=True, hide_index=True)
+
             # Visualization - Client categorization
             st.subheader("Client Categorization")
 
-            fig = go.Figure()
-
-            fig.add_trace(go.Scatter(
-                x=df['Win Rate'],
-                y=df['Avg Trade Size'],
-                mode='markers+text',
-                marker=dict(
-                    size=df['Total Volume'] / 5,
-                    color=[{'A-Book': 'blue', 'B-Book': 'green', 'Hybrid': 'orange'}[r] for r in df['Recommendation']],
-                    showscale=False
-                ),
-                text=df['Client ID'],
-                textposition='top center'
-            ))
-
-            fig.update_layout(
-                title="Client Risk Profile (Size = Volume)",
-                xaxis_title="Win Rate (%)",
-                yaxis_title="Avg Trade Size (lots)",
-                height=500
+            fig = client_profile_figure(
+                df['Win Rate'], df['Avg Trade Size'], df['Total Volume'],
+                df['Client ID'], df['Recommendation']
             )
-
-            # Add risk zones
-            fig.add_hline(y=5, line_dash="dash", line_color="red", annotation_text="Large Size Threshold")
-            fig.add_vline(x=60, line_dash="dash", line_color="red", annotation_text="High Win Rate (Toxic)")
-
             st.plotly_chart(fig, use_container_width=True)
 
             # Booking strategy pie chart
-            booking_summary = df['Recommendation'].value_counts().reset_index()
-            booking_summary.columns = ['Strategy', 'Count']
+            booking_summary = df['Recommendation'].value_counts()
 
-            fig2 = px.pie(booking_summary, values='Count', names='Strategy',
-                         title='Recommended Booking Distribution',
-                         color='Strategy',
-                         color_discrete_map={'A-Book': 'lightblue', 'B-Book': 'lightgreen', 'Hybrid': 'lightyellow'})
+            fig2 = booking_pie(booking_summary.index, booking_summary.to_numpy())
             st.plotly_chart(fig2, use_container_width=True)
 
+        st.markdown("---")
+        st.subheader("Nightly Routing Review")
+        st.markdown("Re-score the whole client base from a client table (Client ID, Win Rate, Avg Trade Size, Avg Hold Time, Total Volume, Client P&L, Commission Revenue)")
+
+        client_file = st.file_uploader("Client Table", type=["csv", "parquet"], key="booking_client_file")
+
+        if client_file is not None and st.button("Re-score Client Base", key="rescore_clients"):
+            try:
+                scored = analyze_booking(load_table_upload(client_file), lp_commission_cost, risk_tolerance)
+            except KeyError as exc:
+                st.error(f"⚠️ Client table is missing column {exc}")
+                st.stop()
+
+            counts = scored['Recommendation'].value_counts()
+
+            col1, col2, col3, col4 = st.columns(4)
+
+            with col1:
+                st.metric("Clients Scored", f"{len(scored):,}")
+            with col2:
+                st.metric("A-Book Clients", f"{counts.get('A-Book', 0):,}")
+            with col3:
+                st.metric("B-Book Clients", f"{counts.get('B-Book', 0):,}")
+            with col4:
+                st.metric("Hybrid Clients", f"{counts.get('Hybrid', 0):,}")
+
+            by_reason = scored.groupby(['Recommendation', 'Reason']).size().reset_index(name='Clients')
+            st.dataframe(by_reason, use_container_width=True, hide_index=True)
+
+            st.download_button(
+                "Download Routing Table",
+                scored[['Client ID', 'Recommendation', 'Reason']].to_csv(index=False),
+                file_name="routing_review.csv",
+                mime="text/csv"
+            )
+
 
 # ========== PRODUCT METRICS ==========
 if section == "Product Metrics":
@@ -1474,6 +2012,12 @@ if section == "Product Metrics":
 
 # Footer
 st.sidebar.markdown("---")
+with st.sidebar.expander("Calculation Cache"):
+    stats = cache_stats()
+    if stats:
+        stats_df = pd.DataFrame.from_dict(stats, orient='index')[['hits', 'misses', 'entries']]
+        stats_df.index = [name.rsplit('.', 1)[-1] for name in stats_df.index]
+        st.dataframe(stats_df, use_container_width=True)
 st.sidebar.info(
     """
     **Risk Warning**: Trading involves substantial risk of loss.
@@ -0,0 +1,359 @@
+"""
+Plotly figure builders for the calculator tools
+
+Each builder takes plain values and returns a finished go.Figure, memoized on its
+inputs so identical views are not rebuilt on every rerun. All builders share one
+figure cache bounded by bytes (estimated from each figure's trace and layout data),
+so a large histogram weighs more than a small gauge. Returned figures are shared
+between sessions and must not be modified by callers.
+"""
+import numpy as np
+import plotly.graph_objects as go
+import plotly.express as px
+
+from risk_engine.cache import ResultCache, memoize, register_cache
+
+
+FIGURE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _payload_bytes(value):
+    """Approximate in-memory size of plotly JSON-style data"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(_payload_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        if value and isinstance(value[0], (dict, list, tuple, str)):
+            return sum(_payload_bytes(item) for item in value)
+        return 8 * len(value)
+    if isinstance(value, str):
+        return len(value)
+    return 8
+
+
+def figure_bytes(fig):
+    """Estimated size of a figure from its trace and layout data, without serializing it"""
+    return (sum(_payload_bytes(trace.to_plotly_json()) for trace in fig.data)
+            + _payload_bytes(fig.layout.to_plotly_json()))
+
+
+FIGURE_CACHE = register_cache(
+    'charts.figures',
+    ResultCache(max_entries=4096, max_bytes=FIGURE_CACHE_MAX_BYTES, sizeof=figure_bytes)
+)
+
+
+@memoize(cache=FIGURE_CACHE)
+def trade_setup_figure(stop_loss, entry_price, target_price):
+    """Stop/entry/target levels for the position sizing tool"""
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=['Stop Loss', 'Entry', 'Target'],
+        y=[stop_loss, entry_price, target_price],
+        mode='markers+lines+text',
+        marker=dict(size=[15, 20, 15], color=['red', 'blue', 'green']),
+        text=[f'${stop_loss}', f'${entry_price}', f'${target_price}'],
+        textposition='top center',
+        line=dict(color='gray', dash='dash')
+    ))
+
+    fig.update_layout(
+        title="Trade Setup Visualization",
+        xaxis_title="Trade Levels",
+        yaxis_title="Price ($)",
+        showlegend=False,
+        height=400
+    )
+    return fig
+
+
+@memoize(cache=FIGURE_CACHE)
+def allocation_pie(names, values, title='Portfolio Allocation', names_label='Symbol', values_label='Value'):
+    """Pie chart of position values by symbol (or any other grouping)"""
+    return px.pie(values=list(values), names=list(names), title=title,
+                  labels={'names': names_label, 'values': values_label})
+
+
+@memoize(cache=FIGURE_CACHE)
+def return_distribution_figure(returns_pct, var_pct, confidence_level, title, xaxis_title,
+                               prebin=False, nbins=50):
+    """Histogram of simulated or historical returns with the VaR line
+
+    With prebin=True the returns are binned here and only the bin counts are sent as
+    a bar trace, instead of shipping every sample to the browser.
+    """
+    fig = go.Figure()
+    if prebin:
+        counts, edges = np.histogram(np.asarray(returns_pct, dtype=float), bins=nbins)
+        fig.add_trace(go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=counts,
+            width=np.diff(edges),
+            name='Return Distribution'
+        ))
+        fig.update_layout(bargap=0)
+    else:
+        fig.add_trace(go.Histogram(
+            x=returns_pct,
+            nbinsx=nbins,
+            name='Return Distribution'
+        ))
+
+    fig.add_vline(
+        x=var_pct,
+        line_dash="dash",
+        line_color="red",
+        annotation_text=f"VaR at {confidence_level}%"
+    )
+
+    fig.update_layout(
+        title=title,
+        xaxis_title=xaxis_title,
+        yaxis_title="Frequency",
+        showlegend=True,
+        height=400
+    )
+    return fig
+
+
+@memoize(cache=FIGURE_CACHE)
+def trade_levels_figure(stop, entry, target1, target2):
+    """Bar chart of stop, entry and two targets for the risk/reward tool"""
+    fig = go.Figure()
+
+    prices = [stop, entry, target1, target2]
+    colors = ['red', 'gray', 'lightgreen', 'green']
+
+    fig.add_trace(go.Bar(
+        x=['Stop Loss', 'Entry', 'Target 1', 'Target 2'],
+        y=prices,
+        marker_color=colors,
+        text=[f'${p:.2f}' for p in prices],
+        textposition='outside'
+    ))
+
+    fig.update_layout(
+        title="Trade Levels",
+        yaxis_title="Price ($)",
+        showlegend=False,
+        height=400
+    )
+    return fig
+
+
+@memoize(cache=FIGURE_CACHE)
+def margin_breakdown_figure(account_equity, used_margin, free_margin, margin_call_equity, stop_out_equity):
+    """Equity vs margin thresholds bar chart"""
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        x=['Account Equity', 'Used Margin', 'Free Margin', 'Margin Call Level', 'Stop Out Level'],
+        y=[account_equity, used_margin, free_margin, margin_call_equity, stop_out_equity],
+        marker_color=['blue', 'orange', 'green', 'yellow', 'red'],
+        text=[f'${account_equity:,.0f}', f'${used_margin:,.0f}', f'${free_margin:,.0f}',
+              f'${margin_call_equity:,.0f}', f'${stop_out_equity:,.0f}'],
+        textposition='outside'
+    ))
+
+    fig.update_layout(
+        title="Margin Breakdown",
+        yaxis_title="Amount ($)",
+        showlegend=False,
+        height=400
+    )
+    return fig
+
+
+@memoize(cache=FIGURE_CACHE)
+def cumulative_swap_figure(days, cumulative_swaps, daily_swap):
+    """Cumulative swap charges over the holding period"""
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=list(days),
+        y=list(cumulative_swaps),
+        mode='lines',
+        fill='tozeroy',
+        name='Cumulative Swap',
+        line=dict(color='red' if daily_swap < 0 else 'green', width=2)
+    ))
+
+    fig.update_layout(
+        title="Cumulative Swap Charges Over Time",
+        xaxis_title="Days Held",
+        yaxis_title="Cumulative Swap ($)",
+        showlegend=True,
+        height=400
+    )
+    return fig
+
+
+@memoize(cache=FIGURE_CACHE)
+def pnl_profile_figure(pip_value, total_cost, breakeven_pips):
+    """Net P&L across pip movements with breakeven markers"""
+    pip_range = list(range(-200, 201, 10))
+    pnl_values = [(p * pip_value) - total_cost for p in pip_range]
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=pip_range,
+        y=pnl_values,
+        mode='lines',
+        fill='tozeroy',
+        name='Net P&L',
+        line=dict(color='blue', width=2),
+        fillcolor='rgba(0,100,255,0.2)'
+    ))
+
+    fig.add_hline(y=0, line_dash="dash", line_color="black", annotation_text="Breakeven")
+    fig.add_vline(x=breakeven_pips, line_dash="dot", line_color="red", annotation_text=f"BE: {breakeven_pips:.1f} pips")
+
+    fig.update_layout(
+        title="P&L Profile Across Pip Movements",
+        xaxis_title="Pip Movement",
+        yaxis_title="Net P&L ($)",
+        showlegend=True,
+        height=400
+    )
+    return fig
+
+
+@memoize(cache=FIGURE_CACHE)
+def exposure_figure(total_long, total_short, net_exposure, exposure_limit):
+    """Long/short/net exposure against the broker limit"""
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        x=['Long Positions', 'Short Positions', 'Net Exposure', 'Exposure Limit'],
+        y=[total_long, total_short, abs(net_exposure), exposure_limit],
+        marker_color=['green', 'red', 'blue', 'orange'],
+        text=[f'{total_long:.2f}', f'{total_short:.2f}', f'{abs(net_exposure):.2f}', f'{exposure_limit:.2f}'],
+        textposition='outside'
+    ))
+
+    fig.update_layout(
+        title="Position Exposure Analysis",
+        yaxis_title="Lots",
+        showlegend=False,
+        height=400
+    )
+    return fig
+
+
+@memoize(cache=FIGURE_CACHE)
+def currency_exposure_figure(currencies, values, account_currency='USD'):
+    """Net exposure per currency leg, valued in account currency"""
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        x=list(currencies),
+        y=list(values),
+        marker_color=['green' if v > 0 else 'red' for v in values],
+        text=[f'{v:,.0f}' for v in values],
+        textposition='outside'
+    ))
+
+    fig.update_layout(
+        title="Net Currency Exposure",
+        xaxis_title="Currency",
+        yaxis_title=f"Net Value ({account_currency})",
+        showlegend=False,
+        height=400
+    )
+    return fig
+
+
+@memoize(cache=FIGURE_CACHE)
+def stop_out_figure(instruments, shocks_pct, broker_losses, account_currency='USD'):
+    """Broker loss after stop-outs against price shock, one line per shocked instrument"""
+    fig = go.Figure()
+
+    instruments = np.asarray(instruments)
+    shocks_pct = np.asarray(shocks_pct)
+    broker_losses = np.asarray(broker_losses)
+    for instrument in dict.fromkeys(instruments.tolist()):
+        rows = instruments == instrument
+        fig.add_trace(go.Scatter(
+            x=shocks_pct[rows],
+            y=broker_losses[rows],
+            mode='lines+markers',
+            name=str(instrument)
+        ))
+
+    fig.update_layout(
+        title="Broker Loss After Stop-Out by Price Shock",
+        xaxis_title="Price Shock (%)",
+        yaxis_title=f"Broker Loss ({account_currency})",
+        hovermode='x unified',
+        height=450
+    )
+    return fig
+
+
+@memoize(cache=FIGURE_CACHE)
+def client_pnl_figure(client_ids, pnls):
+    """Per-position client P&L bars"""
+    fig = go.Figure()
+
+    colors = ['green' if pnl > 0 else 'red' for pnl in pnls]
+
+    fig.add_trace(go.Bar(
+        x=list(client_ids),
+        y=list(pnls),
+        marker_color=colors,
+        text=[f'${pnl:,.0f}' for pnl in pnls],
+        textposition='outside'
+    ))
+
+    fig.update_layout(
+        title="Client P&L Overview",
+        xaxis_title="Client ID",
+        yaxis_title="P&L ($)",
+        showlegend=False,
+        height=400
+    )
+    return fig
+
+
+@memoize(cache=FIGURE_CACHE)
+def client_profile_figure(win_rates, avg_trade_sizes, total_volumes, client_ids, recommendations):
+    """Win rate vs trade size scatter coloured by booking recommendation"""
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=list(win_rates),
+        y=list(avg_trade_sizes),
+        mode='markers+text',
+        marker=dict(
+            size=[v / 5 for v in total_volumes],
+            color=[{'A-Book': 'blue', 'B-Book': 'green', 'Hybrid': 'orange'}[r] for r in recommendations],
+            showscale=False
+        ),
+        text=list(client_ids),
+        textposition='top center'
+    ))
+
+    fig.update_layout(
+        title="Client Risk Profile (Size = Volume)",
+        xaxis_title="Win Rate (%)",
+        yaxis_title="Avg Trade Size (lots)",
+        height=500
+    )
+
+    # Add risk zones
+    fig.add_hline(y=5, line_dash="dash", line_color="red", annotation_text="Large Size Threshold")
+    fig.add_vline(x=60, line_dash="dash", line_color="red", annotation_text="High Win Rate (Toxic)")
+    return fig
+
+
+@memoize(cache=FIGURE_CACHE)
+def booking_pie(strategies, counts):
+    """Distribution of booking recommendations"""
+    return px.pie(values=list(counts), names=list(strategies),
+                  title='Recommended Booking Distribution',
+                  labels={'names': 'Strategy', 'values': 'Count', 'color': 'Strategy'},
+                  color=list(strategies),
+                  color_discrete_map={'A-Book': 'lightblue', 'B-Book': 'lightgreen', 'Hybrid': 'lightyellow'})
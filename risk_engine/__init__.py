@@ -0,0 +1,249 @@
+"""
+Risk Engine - pure Python/NumPy calculators behind the Forex Risk Calculator Platform
+
+Importable without Streamlit or Plotly so the same formulas can run in batch jobs
+and services as well as in the Streamlit app.
+"""
+from risk_engine.trader import (
+    calculate_position_size,
+    calculate_var,
+    calculate_sharpe_ratio,
+    calculate_trade_setup,
+    calculate_position_sizes,
+    size_orders,
+    simulate_var,
+    analyze_risk_reward,
+)
+from risk_engine.broker import (
+    LOT_MULTIPLIER,
+    contract_size_for,
+    calculate_margin,
+    swap_days,
+    calculate_swap,
+    calculate_pip_value,
+    calculate_trade_costs,
+    calculate_net_exposure,
+    calculate_position_metrics,
+    is_toxic_flow,
+    recommend_booking,
+    BOOKING_RULES,
+    classify_booking,
+    analyze_booking,
+)
+from risk_engine.instruments import (
+    MARGIN_TIERS,
+    MARGIN_TIER_RATES,
+    INSTRUMENT_FIELDS,
+    InstrumentRegistry,
+    load_instruments,
+    INSTRUMENTS,
+)
+from risk_engine.fx import (
+    DEFAULT_QUOTES,
+    split_pair,
+    pair_currencies,
+    pip_size_for,
+    ConversionTable,
+    conversion_table,
+)
+from risk_engine.swaps import (
+    settlement_days_for,
+    triple_swap_weekday_for,
+    RolloverCalendar,
+    rollover_calendar,
+    calendar_for_period,
+    settle_swaps,
+)
+from risk_engine.revenue import (
+    iter_trade_chunks,
+    pip_values_per_lot,
+    project_revenue,
+)
+from risk_engine.exposure import (
+    signed_lots,
+    direction_is_long,
+    instrument_prices,
+    aggregate_lots,
+    currency_legs,
+    currency_exposure,
+    book_exposure,
+    ExposureBook,
+)
+from risk_engine.hedging import (
+    simplex,
+    solve_lp,
+    optimize_hedges,
+)
+from risk_engine.margin import (
+    DEFAULT_VOLUME_TIERS,
+    ACCOUNT_COLUMNS,
+    quote_rates,
+    base_value,
+    position_notional,
+    floating_pnl,
+    tiered_margin,
+    account_margin,
+)
+from risk_engine.stopout import (
+    DEFAULT_SHOCKS,
+    shock_scenarios,
+    simulate_stop_outs,
+)
+from risk_engine.monitor import (
+    POSITION_COLUMNS,
+    position_metrics,
+    monitor_positions,
+    TICK_COLUMNS,
+    iter_ticks,
+    LiveMonitor,
+)
+from risk_engine.toxicity import (
+    FILL_COLUMNS,
+    QUOTE_COLUMNS,
+    DEFAULT_MARKOUT_HORIZONS,
+    QuoteTape,
+    toxicity_features,
+)
+from risk_engine.routing import (
+    PROFILE_COLUMNS,
+    OrderRouter,
+    benchmark_router,
+)
+from risk_engine.montecarlo import (
+    DEFAULT_CONFIDENCE_LEVELS,
+    ReturnHistogram,
+    simulate_path_returns,
+    monte_carlo_var,
+)
+from risk_engine.historical import (
+    open_returns,
+    count_instruments,
+    iter_return_blocks,
+    portfolio_returns,
+    historical_var,
+)
+from risk_engine.portfolio import (
+    load_positions,
+    summarize_portfolio,
+    covariance_from_returns,
+    load_return_history,
+    CovarianceCache,
+    align_positions,
+    parametric_var,
+)
+from risk_engine.cache import (
+    canonical_key,
+    ResultCache,
+    memoize,
+    cache_stats,
+)
+from risk_engine.streaming import (
+    RollingSharpe,
+    QuantileSketch,
+    StreamingVaR,
+)
+
+__all__ = [
+    'calculate_position_size',
+    'calculate_var',
+    'calculate_sharpe_ratio',
+    'calculate_trade_setup',
+    'calculate_position_sizes',
+    'size_orders',
+    'simulate_var',
+    'analyze_risk_reward',
+    'LOT_MULTIPLIER',
+    'contract_size_for',
+    'calculate_margin',
+    'swap_days',
+    'calculate_swap',
+    'calculate_pip_value',
+    'calculate_trade_costs',
+    'calculate_net_exposure',
+    'calculate_position_metrics',
+    'is_toxic_flow',
+    'recommend_booking',
+    'BOOKING_RULES',
+    'classify_booking',
+    'analyze_booking',
+    'MARGIN_TIERS',
+    'MARGIN_TIER_RATES',
+    'INSTRUMENT_FIELDS',
+    'InstrumentRegistry',
+    'load_instruments',
+    'INSTRUMENTS',
+    'DEFAULT_QUOTES',
+    'split_pair',
+    'pair_currencies',
+    'pip_size_for',
+    'ConversionTable',
+    'conversion_table',
+    'settlement_days_for',
+    'triple_swap_weekday_for',
+    'RolloverCalendar',
+    'rollover_calendar',
+    'calendar_for_period',
+    'settle_swaps',
+    'iter_trade_chunks',
+    'pip_values_per_lot',
+    'project_revenue',
+    'signed_lots',
+    'direction_is_long',
+    'instrument_prices',
+    'aggregate_lots',
+    'currency_legs',
+    'currency_exposure',
+    'book_exposure',
+    'ExposureBook',
+    'simplex',
+    'solve_lp',
+    'optimize_hedges',
+    'DEFAULT_VOLUME_TIERS',
+    'ACCOUNT_COLUMNS',
+    'quote_rates',
+    'base_value',
+    'position_notional',
+    'floating_pnl',
+    'tiered_margin',
+    'account_margin',
+    'DEFAULT_SHOCKS',
+    'shock_scenarios',
+    'simulate_stop_outs',
+    'POSITION_COLUMNS',
+    'position_metrics',
+    'monitor_positions',
+    'TICK_COLUMNS',
+    'iter_ticks',
+    'LiveMonitor',
+    'FILL_COLUMNS',
+    'QUOTE_COLUMNS',
+    'DEFAULT_MARKOUT_HORIZONS',
+    'QuoteTape',
+    'toxicity_features',
+    'PROFILE_COLUMNS',
+    'OrderRouter',
+    'benchmark_router',
+    'DEFAULT_CONFIDENCE_LEVELS',
+    'ReturnHistogram',
+    'simulate_path_returns',
+    'monte_carlo_var',
+    'open_returns',
+    'count_instruments',
+    'iter_return_blocks',
+    'portfolio_returns',
+    'historical_var',
+    'load_positions',
+    'summarize_portfolio',
+    'covariance_from_returns',
+    'load_return_history',
+    'CovarianceCache',
+    'align_positions',
+    'parametric_var',
+    'canonical_key',
+    'ResultCache',
+    'memoize',
+    'cache_stats',
+    'RollingSharpe',
+    'QuantileSketch',
+    'StreamingVaR',
+]
@@ -0,0 +1,353 @@
+"""
+Broker-side calculations: margin, swap, pip value, net exposure and A-Book/B-Book routing
+"""
+import numpy as np
+
+from risk_engine.fx import pair_currencies, pip_size_for, conversion_table
+from risk_engine.instruments import INSTRUMENTS
+from risk_engine.margin import base_value, position_notional, floating_pnl, tiered_margin
+from risk_engine.swaps import calendar_for_period
+
+
+LOT_MULTIPLIER = {"Standard (100k)": 100000, "Mini (10k)": 10000, "Micro (1k)": 1000}
+
+
+def contract_size_for(symbol, lot_type="Standard (100k)"):
+    """Units per lot from the instrument registry, scaled by lot type for FX only
+
+    Metals, indices and energies trade their registry contract size whatever the lot
+    type; symbols outside the registry are treated as 100k FX pairs.
+    """
+    if symbol not in INSTRUMENTS:
+        return LOT_MULTIPLIER[lot_type]
+    i = INSTRUMENTS.id(symbol)
+    contract_size = float(INSTRUMENTS.contract_size[i])
+    if INSTRUMENTS.asset_class[i] == 'FX':
+        return contract_size * LOT_MULTIPLIER[lot_type] / LOT_MULTIPLIER["Standard (100k)"]
+    return contract_size
+
+
+def calculate_margin(account_equity, leverage, position_size, contract_size, current_price,
+                     margin_call_level=100, stop_out_level=50, currency_pair=None, account_currency='USD',
+                     quotes=None, volume_tiers=None):
+    """Calculate margin requirements, margin level and risk thresholds for one position
+
+    With `currency_pair` the position value is converted to the account currency
+    (a USD/JPY lot is 100,000 USD, not 100,000 x the JPY price); without it the value
+    is taken as lots x contract size x price. `volume_tiers` raises the margin rate
+    progressively with notional as in account_margin.
+    """
+    # Calculate position value in account currency
+    if currency_pair is None:
+        value_per_lot = contract_size * current_price
+    else:
+        instrument = np.array([INSTRUMENTS.id(currency_pair)])
+        value_per_lot = contract_size * float(base_value(instrument, current_price, INSTRUMENTS, account_currency, quotes)[0])
+    position_value = position_size * value_per_lot
+
+    # Calculate required margin
+    required_margin = float(tiered_margin(position_value, 1 / leverage, volume_tiers))
+
+    # Calculate free margin
+    used_margin = required_margin
+    free_margin = account_equity - used_margin
+
+    # Calculate margin level
+    margin_level = (account_equity / used_margin * 100) if used_margin > 0 else 0
+
+    # Calculate max position size
+    max_position_value = account_equity * leverage
+    max_lots = max_position_value / value_per_lot
+
+    # Calculate margin call and stop out thresholds
+    margin_call_equity = (margin_call_level / 100) * used_margin
+    stop_out_equity = (stop_out_level / 100) * used_margin
+
+    return {
+        'position_value': position_value,
+        'required_margin': required_margin,
+        'used_margin': used_margin,
+        'free_margin': free_margin,
+        'margin_level': margin_level,
+        'max_lots': max_lots,
+        'margin_call_equity': margin_call_equity,
+        'stop_out_equity': stop_out_equity
+    }
+
+
+def swap_days(days_held, open_date=None, settlement_days=2, holidays=(), triple_swap_weekday=None):
+    """Count charged swap days for a holding period from the rollover calendar"""
+    open_date = np.datetime64('today' if open_date is None else open_date, 'D')
+    calendar = calendar_for_period(open_date, days_held, holidays, settlement_days, triple_swap_weekday)
+    return int(calendar.swap_days(open_date, open_date + days_held))
+
+
+def calculate_swap(position_size, contract_size, base_swap_rate, broker_markup, days_held,
+                   open_date=None, settlement_days=2, holidays=(), triple_swap_weekday=None, pip_value=None):
+    """Calculate daily, total and annual swap charges plus broker markup revenue
+
+    Swap days come from the rollover calendar for a position opened on `open_date`
+    (default today): triple swaps fall where the spot value date skips a weekend and
+    holidays add their extra days. `cumulative_swap_days[i]` is the count after i + 1
+    days held.
+
+    `pip_value` is the position's pip value in account currency (see
+    calculate_pip_value); without it a USD-quoted FX pair in a USD account is assumed.
+    """
+    # Apply broker markup
+    swap_with_markup = base_swap_rate * (1 + broker_markup/100)
+
+    # Calculate pip value (simplified - assumes USD account)
+    # For most pairs, 1 pip = $10 per standard lot
+    if pip_value is None:
+        pip_value = 10 * (contract_size / 100000) * position_size
+
+    # Calculate daily swap charge
+    daily_swap = swap_with_markup * pip_value
+
+    # Calculate for holding period from the rollover calendar
+    open_date = np.datetime64('today' if open_date is None else open_date, 'D')
+    calendar = calendar_for_period(open_date, max(days_held, 365), holidays, settlement_days, triple_swap_weekday)
+    _, multiplier, cumulative_swap_days = calendar.schedule(open_date, days_held)
+    triple_swap_days = int((multiplier >= 3).sum())
+    total_swap_days = int(cumulative_swap_days[-1]) if days_held else 0
+
+    total_swap_charge = daily_swap * total_swap_days
+
+    # Annual projection over the next 365 calendar days
+    annual_swap = daily_swap * int(calendar.swap_days(open_date, open_date + 365))
+
+    # Broker revenue from markup
+    base_daily_swap = base_swap_rate * pip_value
+    broker_revenue_daily = daily_swap - base_daily_swap
+    broker_revenue_total = broker_revenue_daily * total_swap_days
+
+    return {
+        'swap_with_markup': swap_with_markup,
+        'pip_value': pip_value,
+        'daily_swap': daily_swap,
+        'triple_swap_days': triple_swap_days,
+        'total_swap_days': total_swap_days,
+        'cumulative_swap_days': cumulative_swap_days,
+        'total_swap_charge': total_swap_charge,
+        'annual_swap': annual_swap,
+        'broker_revenue_daily': broker_revenue_daily,
+        'broker_revenue_total': broker_revenue_total
+    }
+
+
+def calculate_pip_value(currency_pair, account_currency, position_size, contract_size, current_price,
+                        quotes=None):
+    """Calculate pip value in account currency for one position
+
+    Quote- and base-currency accounts convert with the pair's own current_price; any
+    other account currency goes through the conversion table for `quotes` (default:
+    the DEFAULT_QUOTES snapshot).
+    """
+    base, quote = pair_currencies(currency_pair)
+
+    # Pip value in quote currency = pip size * contract size * position size
+    pip_value = pip_size_for(currency_pair) * contract_size * position_size
+
+    # Convert to account currency: direct, inverse or cross rate
+    if account_currency == quote:
+        return pip_value
+    if account_currency == base:
+        return pip_value / current_price
+    return pip_value * conversion_table(quotes).rate(quote, account_currency)
+
+
+def calculate_trade_costs(pip_value, position_size, spread_pips, commission_per_lot,
+                          pip_movement=0, monthly_volume=0):
+    """Calculate spread/commission costs, P&L and broker revenue projection"""
+    # Calculate spread cost
+    spread_cost = spread_pips * pip_value
+
+    # Calculate total commission
+    total_commission = commission_per_lot * position_size
+
+    # Total trading cost
+    total_cost = spread_cost + total_commission
+
+    # P&L calculation
+    pnl = pip_movement * pip_value
+    net_pnl = pnl - total_cost
+
+    # Broker revenue projection
+    monthly_spread_revenue = spread_pips * pip_value * monthly_volume
+    monthly_commission_revenue = commission_per_lot * monthly_volume
+    monthly_total_revenue = monthly_spread_revenue + monthly_commission_revenue
+    annual_revenue = monthly_total_revenue * 12
+
+    # Breakeven calculation
+    breakeven_pips = total_cost / pip_value if pip_value > 0 else 0
+
+    return {
+        'spread_cost': spread_cost,
+        'total_commission': total_commission,
+        'total_cost': total_cost,
+        'pnl': pnl,
+        'net_pnl': net_pnl,
+        'monthly_spread_revenue': monthly_spread_revenue,
+        'monthly_commission_revenue': monthly_commission_revenue,
+        'monthly_total_revenue': monthly_total_revenue,
+        'annual_revenue': annual_revenue,
+        'breakeven_pips': breakeven_pips
+    }
+
+
+def calculate_net_exposure(signed_lots, exposure_limit, lp_spread, pip_value_per_lot):
+    """Calculate net exposure, hedge requirement and hedge cost from signed client lots"""
+    signed_lots = np.asarray(signed_lots, dtype=float)
+
+    # Calculate net exposure
+    total_long = signed_lots[signed_lots > 0].sum()
+    total_short = -signed_lots[signed_lots < 0].sum()
+    net_exposure = total_long - total_short
+
+    # Determine hedge requirement
+    if abs(net_exposure) > exposure_limit:
+        hedge_required = abs(net_exposure) - exposure_limit
+        hedge_direction = "Sell" if net_exposure > 0 else "Buy"
+    else:
+        hedge_required = 0
+        hedge_direction = "None"
+
+    # Calculate costs
+    hedge_cost = hedge_required * lp_spread * pip_value_per_lot
+    exposure_kept = min(abs(net_exposure), exposure_limit)
+
+    # Risk calculation (if market moves 100 pips)
+    risk_per_100_pips = exposure_kept * 100 * pip_value_per_lot
+
+    exposure_pct = (abs(net_exposure) / exposure_limit * 100) if exposure_limit > 0 else 0
+
+    return {
+        'total_long': total_long,
+        'total_short': total_short,
+        'net_exposure': net_exposure,
+        'hedge_required': hedge_required,
+        'hedge_direction': hedge_direction,
+        'hedge_cost': hedge_cost,
+        'exposure_kept': exposure_kept,
+        'risk_per_100_pips': risk_per_100_pips,
+        'exposure_pct': exposure_pct
+    }
+
+
+def calculate_position_metrics(pair, direction, lots, entry_price, current_price, equity):
+    """Calculate pip movement, P&L and margin level for one monitored client position"""
+    # Pip size, contract size and margin rate come from the instrument registry
+    instrument = np.array([INSTRUMENTS.id(pair)])
+    signed = np.array([-lots if direction == "Short" else lots], dtype=float)
+
+    # Calculate P&L in USD
+    pips, _, pnl = floating_pnl(instrument, signed, entry_price, current_price)
+    pip_movement = float(pips[0])
+    pnl = float(pnl[0])
+
+    # Calculate margin level on the USD notional at entry
+    margin_used = float(position_notional(instrument, signed, entry_price)[0] * INSTRUMENTS.margin_rate[instrument[0]])
+    margin_level = (equity / margin_used * 100) if margin_used > 0 else 0
+
+    return {
+        'pip_movement': pip_movement,
+        'pnl': pnl,
+        'margin_level': margin_level
+    }
+
+
+def is_toxic_flow(win_rate, avg_trade_size, avg_hold_time):
+    """Flag toxic flow from 30-day client aggregates (scalars or arrays)"""
+    return (win_rate > 60) | (avg_trade_size > 5) | (avg_hold_time < 2)
+
+
+def recommend_booking(toxic_flow, win_rate, avg_trade_size, abook_revenue, bbook_revenue, risk_tolerance):
+    """Recommend A-Book, B-Book or Hybrid routing for one client"""
+    if toxic_flow:
+        # Toxic flow should be A-Booked to avoid risk
+        recommendation = "A-Book"
+        reason = "Toxic flow - hedge with LP"
+    elif win_rate < 45:
+        # Losing clients can be B-Booked
+        if risk_tolerance in ["Moderate", "Aggressive"]:
+            recommendation = "B-Book"
+            reason = "Profitable client pattern"
+        else:
+            recommendation = "A-Book"
+            reason = "Conservative policy"
+    elif avg_trade_size > 5:
+        # Large positions should be hedged
+        recommendation = "A-Book"
+        reason = "Large position size risk"
+    else:
+        # Default based on profitability
+        if bbook_revenue > abook_revenue and not toxic_flow:
+            recommendation = "B-Book" if risk_tolerance != "Conservative" else "Hybrid"
+            reason = "More profitable to internalize"
+        else:
+            recommendation = "A-Book"
+            reason = "Better A-Book economics"
+
+    return recommendation, reason
+
+
+# Routing rules in recommend_booking order: (recommendation, reason) for each branch
+BOOKING_RULES = (
+    ("A-Book", "Toxic flow - hedge with LP"),
+    ("B-Book", "Profitable client pattern"),
+    ("A-Book", "Conservative policy"),
+    ("A-Book", "Large position size risk"),
+    ("B-Book", "More profitable to internalize"),
+    ("Hybrid", "More profitable to internalize"),
+    ("A-Book", "Better A-Book economics"),
+)
+
+
+def classify_booking(toxic_flow, win_rate, avg_trade_size, abook_revenue, bbook_revenue, risk_tolerance):
+    """Vectorized recommend_booking over client arrays; returns (recommendations, reasons)
+
+    The branches of recommend_booking become boolean masks evaluated in the same
+    order by np.select, so every row gets exactly the scalar rule's answer.
+    `risk_tolerance` is one policy for all clients or an array with one per client.
+    """
+    toxic_flow = np.asarray(toxic_flow, dtype=bool)
+    win_rate = np.asarray(win_rate, dtype=float)
+    avg_trade_size = np.asarray(avg_trade_size, dtype=float)
+    risk_tolerance = np.asarray(risk_tolerance, dtype=object)
+
+    losing = win_rate < 45
+    accepts_risk = (risk_tolerance == "Moderate") | (risk_tolerance == "Aggressive")
+    internalize = np.asarray(bbook_revenue, dtype=float) > np.asarray(abook_revenue, dtype=float)
+    conservative = risk_tolerance == "Conservative"
+
+    rule = np.select(
+        [toxic_flow, losing & accepts_risk, losing, avg_trade_size > 5, internalize & ~conservative, internalize],
+        np.arange(len(BOOKING_RULES) - 1),
+        default=len(BOOKING_RULES) - 1
+    )
+    recommendations = np.array([recommendation for recommendation, _ in BOOKING_RULES], dtype=object)
+    reasons = np.array([reason for _, reason in BOOKING_RULES], dtype=object)
+    return recommendations[rule], reasons[rule]
+
+
+def analyze_booking(df, lp_commission_cost, risk_tolerance):
+    """Add A-Book/B-Book revenue and routing recommendation columns to a client table
+
+    Toxic Flow is derived from Win Rate, Avg Trade Size and Avg Hold Time when the
+    table does not carry it.
+    """
+    df = df.copy()
+
+    # Calculate net broker revenue for each scenario
+    df['A-Book Revenue'] = df['Commission Revenue'] - (df['Total Volume'] * lp_commission_cost)
+    df['B-Book Revenue'] = df['Commission Revenue'] - df['Client P&L']  # Broker takes opposite side
+    if 'Toxic Flow' not in df.columns:
+        df['Toxic Flow'] = is_toxic_flow(df['Win Rate'], df['Avg Trade Size'], df['Avg Hold Time'])
+
+    # Determine recommendation
+    df['Recommendation'], df['Reason'] = classify_booking(
+        df['Toxic Flow'].to_numpy(), df['Win Rate'].to_numpy(), df['Avg Trade Size'].to_numpy(),
+        df['A-Book Revenue'].to_numpy(), df['B-Book Revenue'].to_numpy(), risk_tolerance
+    )
+    return df
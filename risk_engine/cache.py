@@ -0,0 +1,263 @@
+"""
+Memoization for calculators and figure builders
+
+Results are keyed on a canonical hash of the call's arguments after binding them to
+the function signature (so positional, keyword and defaulted calls share an entry)
+and normalizing values (ints and floats of equal value, NumPy scalars and arrays,
+pandas objects, containers). Each wrapped function gets a ResultCache with LRU and
+TTL eviction, a size cap (entries, optionally bytes), and hit/miss counters. Related
+functions can share one ResultCache, and so one budget, by passing it as `cache`.
+
+Wrappers are registered by function, so wrapping the same function again (e.g. on
+every Streamlit rerun) returns the existing wrapper and its warm cache. Callers get
+their own copy of any dicts, lists, tuples, arrays and pandas objects in a result;
+other objects (figures, calendars, conversion tables) are shared and must not be
+mutated.
+"""
+import functools
+import hashlib
+import inspect
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+_REGISTRY = {}
+_NAMED_CACHES = {}
+_REGISTRY_LOCK = threading.Lock()
+_signature = functools.lru_cache(maxsize=None)(inspect.signature)
+
+
+def _feed(digest, value):
+    """Write a type-tagged canonical encoding of value into the hash"""
+    if value is None or isinstance(value, (bool, np.bool_)):
+        digest.update(b'B' + repr(None if value is None else bool(value)).encode())
+    elif isinstance(value, (int, np.integer)):
+        digest.update(b'N' + str(int(value)).encode())
+    elif isinstance(value, (float, np.floating)):
+        # Integral floats share the int encoding so 1 and 1.0 give the same key
+        value = float(value)
+        digest.update(b'N' + (str(int(value)) if value.is_integer() else repr(value)).encode())
+    elif isinstance(value, str):
+        digest.update(b'S' + str(len(value)).encode() + b':' + value.encode())
+    elif isinstance(value, bytes):
+        digest.update(b'Y' + str(len(value)).encode() + b':' + value)
+    elif isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        digest.update(b'A' + array.dtype.str.encode() + repr(array.shape).encode())
+        if array.dtype == object:
+            for item in array.ravel():
+                _feed(digest, item)
+        else:
+            digest.update(array.tobytes())
+    elif type(value).__module__.startswith('pandas'):
+        import pandas as pd
+        if isinstance(value, pd.DataFrame):
+            digest.update(b'D')
+            _feed(digest, [str(column) for column in value.columns])
+            for dtype in value.dtypes:
+                _feed_dtype(digest, dtype)
+            digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        elif isinstance(value, (pd.Series, pd.Index, pd.api.extensions.ExtensionArray)):
+            # Categorical and other extension arrays hash like an unnamed Series
+            digest.update(b'P')
+            _feed_dtype(digest, value.dtype)
+            _feed(digest, getattr(value, 'name', None))
+            values = value if isinstance(value, (pd.Series, pd.Index)) else pd.Series(value, copy=False)
+            digest.update(pd.util.hash_pandas_object(values).to_numpy().tobytes())
+        elif isinstance(value, (pd.Timestamp, pd.Timedelta, pd.Period, pd.Interval, pd.DateOffset, type(pd.NaT))):
+            # Scalars whose repr is complete
+            digest.update(b'R' + type(value).__qualname__.encode() + repr(value).encode())
+        else:
+            raise TypeError(f"Cannot build a cache key from {type(value).__qualname__}")
+    elif isinstance(value, (list, tuple)):
+        digest.update(b'L' + str(len(value)).encode())
+        for item in value:
+            _feed(digest, item)
+    elif isinstance(value, dict):
+        digest.update(b'M' + str(len(value)).encode())
+        for key in sorted(value, key=repr):
+            _feed(digest, key)
+            _feed(digest, value[key])
+    elif isinstance(value, (set, frozenset)):
+        digest.update(b'T' + str(len(value)).encode())
+        for item in sorted(value, key=repr):
+            _feed(digest, item)
+    else:
+        digest.update(b'R' + type(value).__qualname__.encode() + repr(value).encode())
+
+
+def _feed_dtype(digest, dtype):
+    """Encode a dtype; categorical dtypes include their categories and order"""
+    digest.update(b'T' + str(dtype).encode())
+    if hasattr(dtype, 'categories'):
+        _feed(digest, dtype.categories.to_numpy())
+        _feed(digest, dtype.ordered)
+
+
+def canonical_key(*values):
+    """Canonical hex digest of any mix of scalars, containers, arrays and DataFrames"""
+    digest = hashlib.blake2b(digest_size=20)
+    for value in values:
+        _feed(digest, value)
+    return digest.hexdigest()
+
+
+def call_key(func, args, kwargs):
+    """Canonical key for func(*args, **kwargs), with arguments bound to the signature"""
+    bound = _signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    return canonical_key(f"{func.__module__}.{func.__qualname__}", dict(bound.arguments))
+
+
+class ResultCache:
+    """Thread-safe LRU cache with optional TTL, an entry cap and an optional byte cap
+
+    With `max_bytes` set, `sizeof(value)` (default: len) measures each entry once when
+    it is stored and the least recently used entries are evicted until the total
+    fits. A single value larger than `max_bytes` is not stored.
+    """
+
+    def __init__(self, max_entries=256, ttl=None, max_bytes=None, sizeof=len, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _pop(self, key=None):
+        if key is None:
+            _, (_, _, size) = self.entries.popitem(last=False)
+        else:
+            _, _, size = self.entries.pop(key)
+        self.total_bytes -= size
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, stored_at, _ = entry
+                if self.ttl is None or self.clock() - stored_at < self.ttl:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._pop(key)
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        with self.lock:
+            if key in self.entries:
+                self._pop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self.entries[key] = (value, self.clock(), size)
+            self.total_bytes += size
+            while len(self.entries) > self.max_entries or (
+                    self.max_bytes is not None and self.total_bytes > self.max_bytes):
+                self._pop()
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def info(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+
+_MISSING = object()
+
+
+def _detach(value):
+    """Copy of the mutable containers, arrays and pandas objects in a cached result"""
+    if isinstance(value, dict):
+        return {key: _detach(item) for key, item in value.items()}
+    if type(value) in (list, tuple):
+        return type(value)(_detach(item) for item in value)
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    if type(value).__module__.startswith('pandas') and hasattr(value, 'copy'):
+        return value.copy()
+    return value
+
+
+def memoize(func=None, max_entries=256, ttl=None, cache=None):
+    """Cache a pure function's results keyed on its normalized arguments
+
+    Usable as @memoize, @memoize(max_entries=..., ttl=...) or memoize(func). Passing
+    a ResultCache as `cache` stores results there instead of in a private cache
+    (keys include the function name, so several functions can share one). Every
+    call returns a fresh copy of the cached result (see _detach). The wrapper exposes
+    `cache`, `cache_info()` and `cache_clear()`.
+    """
+    if func is None:
+        return lambda f: memoize(f, max_entries=max_entries, ttl=ttl, cache=cache)
+
+    with _REGISTRY_LOCK:
+        if func in _REGISTRY:
+            return _REGISTRY[func]
+
+        if cache is None:
+            cache = ResultCache(max_entries=max_entries, ttl=ttl)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = call_key(func, args, kwargs)
+            result = cache.get(key, _MISSING)
+            if result is _MISSING:
+                result = func(*args, **kwargs)
+                cache.put(key, result)
+            return _detach(result)
+
+        wrapper.cache = cache
+        wrapper.cache_info = cache.info
+        wrapper.cache_clear = cache.clear
+        _REGISTRY[func] = wrapper
+        _REGISTRY[wrapper] = wrapper
+        return wrapper
+
+
+def register_cache(name, cache):
+    """Report a shared ResultCache in cache_stats() under `name`"""
+    with _REGISTRY_LOCK:
+        _NAMED_CACHES[name] = cache
+    return cache
+
+
+def cache_stats():
+    """Hit/miss counters per memoized function and per registered shared cache, keyed by name
+
+    Functions storing into a registered cache are counted once, under its name.
+    """
+    with _REGISTRY_LOCK:
+        wrappers = {id(wrapper): wrapper for wrapper in _REGISTRY.values()}.values()
+        named = dict(_NAMED_CACHES)
+    shared = {id(cache) for cache in named.values()}
+    stats = {f"{w.__module__}.{w.__qualname__}": w.cache_info() for w in wrappers if id(w.cache) not in shared}
+    stats.update({name: cache.info() for name, cache in named.items()})
+    return stats
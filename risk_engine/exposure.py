@@ -0,0 +1,310 @@
+"""
+Book-wide net exposure by instrument and by currency
+
+Client positions arrive as one columnar table (instrument, signed lots) covering
+every client and instrument. Instruments are resolved to registry ids once and all
+aggregation is np.bincount over those ids, so the whole book is a handful of array
+passes. Net instrument exposure is then split into its currency legs (a long EUR/USD
+lot is long EUR and short USD) and summed per currency, valued in the account
+currency through the conversion table.
+"""
+import numpy as np
+
+from risk_engine.fx import conversion_table
+from risk_engine.instruments import INSTRUMENTS
+
+
+def direction_is_long(direction):
+    """Boolean long flags from a Long/Short (Buy/Sell) Direction column
+
+    Missing, blank or unrecognised labels raise ValueError naming their rows.
+    """
+    direction = direction.astype('category')
+    labels = [str(label).strip().upper()[:1] for label in direction.cat.categories]
+    long_labels = np.array([label in ('L', 'B') for label in labels] + [False])
+    known = np.array([label in ('L', 'B', 'S') for label in labels] + [False])
+    # Missing values have code -1, which picks the trailing unknown entry
+    codes = direction.cat.codes.to_numpy()
+    bad = ~known[codes]
+    if bad.any():
+        rows = direction.index[bad]
+        raise ValueError(f"Direction must be Buy/Sell or Long/Short; bad rows: {', '.join(map(str, rows[:10]))}")
+    return long_labels[codes]
+
+
+def signed_lots(positions):
+    """Signed lots from a Signed Lots column, or from Lots and a Long/Short (Buy/Sell) Direction"""
+    if 'Signed Lots' in positions.columns:
+        return positions['Signed Lots'].to_numpy(dtype=float)
+    if 'Direction' not in positions.columns:
+        return positions['Lots'].to_numpy(dtype=float)
+    lots = np.abs(positions['Lots'].to_numpy(dtype=float))
+    return np.where(direction_is_long(positions['Direction']), lots, -lots)
+
+
+def instrument_prices(registry=INSTRUMENTS, prices=None, quotes=None):
+    """Price of every registry instrument indexed by id, NaN where unknown
+
+    Explicit `prices` ({symbol: price}) win; otherwise FX-style instruments are priced
+    from the conversion table for `quotes`.
+    """
+    table = conversion_table(quotes)
+    result = np.full(len(registry), np.nan)
+    for i, (base, quote) in enumerate(zip(registry.base, registry.quote)):
+        if base in table.index and quote in table.index:
+            result[i] = table.rate(base, quote)
+    for symbol, price in (prices or {}).items():
+        result[registry.id(symbol)] = price
+    return result
+
+
+def aggregate_lots(ids, lots, num_instruments):
+    """Long, short and net lots plus position counts per instrument id in bincount passes"""
+    long_lots = np.bincount(ids, weights=np.maximum(lots, 0), minlength=num_instruments)
+    short_lots = np.bincount(ids, weights=np.maximum(-lots, 0), minlength=num_instruments)
+    positions = np.bincount(ids, minlength=num_instruments)
+    return long_lots, short_lots, long_lots - short_lots, positions
+
+
+def currency_legs(net_lots, prices, registry=INSTRUMENTS, account_currency='USD', quotes=None):
+    """Base and quote leg amounts, and their account-currency values, per instrument id
+
+    Returns (base_amount, quote_amount, base_value, quote_value); a net long of one
+    standard EUR/USD lot at 1.10 is +100,000 EUR and -110,000 USD.
+    """
+    table = conversion_table(quotes)
+    quote_rate = np.array([
+        table.rate(quote, account_currency) if quote in table.index else np.nan for quote in registry.quote
+    ])
+    base_amount = net_lots * registry.contract_size
+    quote_amount = -base_amount * prices
+    quote_value = quote_amount * quote_rate
+    return base_amount, quote_amount, -quote_value, quote_value
+
+
+def currency_exposure(net_lots, prices, registry=INSTRUMENTS, account_currency='USD', quotes=None):
+    """Net exposure per currency (and per non-currency underlying) summed over instrument legs
+
+    Instruments without a price or conversion rate are left out; book_exposure lists
+    them as unpriced.
+    """
+    import pandas as pd
+
+    base_amount, quote_amount, base_value, quote_value = currency_legs(
+        net_lots, prices, registry, account_currency, quotes)
+    held = (net_lots != 0) & ~np.isnan(quote_value)
+    currencies = np.concatenate([registry.base[held], registry.quote[held]])
+    codes, labels = pd.factorize(currencies)
+    amounts = np.concatenate([base_amount[held], quote_amount[held]])
+    values = np.concatenate([base_value[held], quote_value[held]])
+
+    by_currency = pd.DataFrame({
+        'Currency': labels,
+        'Net Amount': np.bincount(codes, weights=amounts, minlength=len(labels)),
+        f'Net Value ({account_currency})': np.bincount(codes, weights=values, minlength=len(labels))
+    })
+    return by_currency.sort_values(f'Net Value ({account_currency})', key=np.abs, ascending=False,
+                                   ignore_index=True)
+
+
+def book_exposure(positions, exposure_limits=None, prices=None, quotes=None, account_currency='USD',
+                  registry=INSTRUMENTS):
+    """Net exposure per instrument and per currency for a whole book of client positions
+
+    `positions` has an Instrument column and Signed Lots (or Lots with an optional
+    Direction). `exposure_limits` is a lot limit for every instrument or a
+    {symbol: limit} dict; net exposure beyond it is reported as the hedge required.
+    """
+    import pandas as pd
+
+    ids = registry.ids(positions['Instrument'].to_numpy())
+    lots = signed_lots(positions)
+    long_lots, short_lots, net_lots, counts = aggregate_lots(ids, lots, len(registry))
+    instrument_price = instrument_prices(registry, prices, quotes)
+
+    if isinstance(exposure_limits, dict):
+        limits = np.full(len(registry), np.inf)
+        for symbol, limit in exposure_limits.items():
+            limits[registry.id(symbol)] = limit
+    else:
+        limits = np.full(len(registry), np.inf if exposure_limits is None else float(exposure_limits))
+    hedge_required = np.maximum(np.abs(net_lots) - limits, 0)
+
+    _, _, base_value, _ = currency_legs(net_lots, instrument_price, registry, account_currency, quotes)
+
+    held = counts > 0
+    by_instrument = pd.DataFrame({
+        'Instrument': registry.symbols[held],
+        'Positions': counts[held],
+        'Long Lots': long_lots[held],
+        'Short Lots': short_lots[held],
+        'Net Lots': net_lots[held],
+        f'Net Notional ({account_currency})': base_value[held],
+        'Hedge Required': hedge_required[held],
+        'Hedge Direction': np.where(hedge_required[held] > 0, np.where(net_lots[held] > 0, 'Sell', 'Buy'), 'None')
+    }).sort_values(f'Net Notional ({account_currency})', key=np.abs, ascending=False, ignore_index=True)
+
+    return {
+        'by_instrument': by_instrument,
+        'by_currency': currency_exposure(net_lots, instrument_price, registry, account_currency, quotes),
+        'net_lots': net_lots,
+        'num_positions': len(ids),
+        'gross_lots': float(long_lots.sum() + short_lots.sum()),
+        'gross_net_notional': float(np.nansum(np.abs(base_value))),
+        'instruments_over_limit': int((hedge_required > 0).sum()),
+        'unpriced_instruments': registry.symbols[held & np.isnan(base_value)].tolist()
+    }
+
+
+class ExposureBook:
+    """Running long/short/net exposure per instrument and currency, updated per trade event
+
+    Each open, partial fill or close touches one position and one instrument, so an
+    event costs O(1) regardless of book size. Leg amounts use the latest price per
+    instrument: the event's fill price when given, else the last fill price, else the
+    conversion-table price for `quotes` (or `prices`). An event in an instrument with
+    none of these is rejected. When an instrument's net exposure crosses its limit (in
+    either direction) an alert dict is appended to `alerts` and passed to `on_limit`.
+    """
+
+    def __init__(self, exposure_limits=None, registry=INSTRUMENTS, on_limit=None, max_alerts=1000,
+                 prices=None, quotes=None):
+        from collections import deque
+
+        count = len(registry)
+        self.registry = registry
+        self.on_limit = on_limit
+        self.alerts = deque(maxlen=max_alerts)
+        self.positions = {}
+        self.long_lots = np.zeros(count)
+        self.short_lots = np.zeros(count)
+        self.last_price = instrument_prices(registry, prices, quotes)
+
+        self.currencies = list(dict.fromkeys(list(registry.base) + list(registry.quote)))
+        currency_index = {currency: i for i, currency in enumerate(self.currencies)}
+        self.base_code = np.array([currency_index[c] for c in registry.base], dtype=np.int64)
+        self.quote_code = np.array([currency_index[c] for c in registry.quote], dtype=np.int64)
+        self.currency_amount = np.zeros(len(self.currencies))
+
+        self.limits = np.full(count, np.inf)
+        self.breached = np.zeros(count, dtype=bool)
+        self.set_limits(exposure_limits)
+
+    def set_limits(self, exposure_limits):
+        """Replace the lot limits (one for every instrument or a {symbol: limit} dict)
+
+        Instruments whose breach state flips under the new limits raise alerts as if
+        their exposure had crossed them.
+        """
+        limits = np.full(len(self.registry), np.inf)
+        if isinstance(exposure_limits, dict):
+            for symbol, limit in exposure_limits.items():
+                limits[self.registry.id(symbol)] = limit
+        elif exposure_limits is not None:
+            limits[:] = exposure_limits
+        self.limits = limits
+
+        net = np.abs(self.long_lots - self.short_lots)
+        for instrument in np.flatnonzero((net > limits) != self.breached):
+            self._check(instrument)
+
+    def _mark(self, instrument, price):
+        if price is not None:
+            self.last_price[instrument] = price
+        elif np.isnan(self.last_price[instrument]):
+            raise ValueError(f"No price for {self.registry.symbols[instrument]}: pass the fill price")
+
+    def _apply(self, instrument, old_lots, new_lots):
+        self.long_lots[instrument] += max(new_lots, 0) - max(old_lots, 0)
+        self.short_lots[instrument] += max(-new_lots, 0) - max(-old_lots, 0)
+
+        base_change = (new_lots - old_lots) * self.registry.contract_size[instrument]
+        self.currency_amount[self.base_code[instrument]] += base_change
+        self.currency_amount[self.quote_code[instrument]] -= base_change * self.last_price[instrument]
+        self._check(instrument)
+
+    def _check(self, instrument):
+        net = self.long_lots[instrument] - self.short_lots[instrument]
+        over = abs(net) > self.limits[instrument]
+        if over != self.breached[instrument]:
+            self.breached[instrument] = over
+            alert = {
+                'instrument': self.registry.symbols[instrument],
+                'net_lots': float(net),
+                'limit': float(self.limits[instrument]),
+                'breached': bool(over),
+                'hedge_required': float(max(abs(net) - self.limits[instrument], 0)),
+                'hedge_direction': ('Sell' if net > 0 else 'Buy') if over else 'None'
+            }
+            self.alerts.append(alert)
+            if self.on_limit is not None:
+                self.on_limit(alert)
+
+    def fill(self, position_id, symbol, signed_lots, price=None):
+        """Open a position or add a partial fill to it (signed lots: + long, - short)
+
+        A fill for an open position must be in that position's instrument.
+        """
+        instrument = self.registry.id(symbol)
+        open_instrument, old_lots = self.positions.get(position_id, (instrument, 0.0))
+        if open_instrument != instrument:
+            raise ValueError(f"Position {position_id} is in {self.registry.symbols[open_instrument]}, not {symbol}")
+        self._mark(instrument, price)
+        new_lots = old_lots + signed_lots
+        self.positions[position_id] = (instrument, new_lots)
+        self._apply(instrument, old_lots, new_lots)
+
+    open = fill
+
+    def close(self, position_id, lots=None, price=None):
+        """Close a position fully, or partially by `lots` (unsigned)"""
+        instrument, old_lots = self.positions[position_id]
+        self._mark(instrument, price)
+        if lots is None or lots >= abs(old_lots):
+            new_lots = 0.0
+            del self.positions[position_id]
+        else:
+            new_lots = old_lots - np.sign(old_lots) * lots
+            self.positions[position_id] = (instrument, new_lots)
+        self._apply(instrument, old_lots, new_lots)
+
+    def net(self, symbol):
+        """Net lots for one instrument"""
+        instrument = self.registry.id(symbol)
+        return float(self.long_lots[instrument] - self.short_lots[instrument])
+
+    def totals(self, symbol):
+        """Running long, short and net lots plus limit state for one instrument"""
+        instrument = self.registry.id(symbol)
+        return {
+            'total_long': float(self.long_lots[instrument]),
+            'total_short': float(self.short_lots[instrument]),
+            'net_exposure': float(self.long_lots[instrument] - self.short_lots[instrument]),
+            'limit': float(self.limits[instrument]),
+            'breached': bool(self.breached[instrument])
+        }
+
+    def snapshot(self):
+        """Instruments with open exposure as a table"""
+        import pandas as pd
+
+        held = (self.long_lots != 0) | (self.short_lots != 0)
+        net = self.long_lots - self.short_lots
+        return pd.DataFrame({
+            'Instrument': self.registry.symbols[held],
+            'Long Lots': self.long_lots[held],
+            'Short Lots': self.short_lots[held],
+            'Net Lots': net[held],
+            'Limit': self.limits[held],
+            'Over Limit': self.breached[held]
+        })
+
+    def currency_snapshot(self):
+        """Net amount per currency leg, in units of that currency"""
+        import pandas as pd
+
+        held = self.currency_amount != 0
+        return pd.DataFrame({
+            'Currency': np.array(self.currencies, dtype=object)[held],
+            'Net Amount': self.currency_amount[held]
+        })
@@ -0,0 +1,175 @@
+"""
+Currency conversion and pip values for any pair and account currency
+
+A ConversionTable turns a snapshot of quotes into a dense (currencies x currencies)
+matrix of conversion rates by triangulating every currency to a pivot (USD by
+default) through direct, inverse or cross quotes. Converting an amount or pricing a
+pip is then one array lookup, and updating a quote only recomputes the rows and
+columns of the currencies priced through it.
+"""
+from collections import deque
+
+import numpy as np
+
+from risk_engine.cache import memoize
+from risk_engine.instruments import INSTRUMENTS
+
+
+# Illustrative mid-rate snapshot used when no live quotes are supplied
+DEFAULT_QUOTES = {
+    'EUR/USD': 1.1000,
+    'GBP/USD': 1.2700,
+    'AUD/USD': 0.6600,
+    'NZD/USD': 0.6000,
+    'USD/JPY': 150.00,
+    'USD/CHF': 0.8800,
+    'USD/CAD': 1.3600,
+    'XAU/USD': 2300.00,
+    'XAG/USD': 27.00,
+}
+
+
+def split_pair(pair):
+    """('EUR', 'USD') from 'EUR/USD' or 'EURUSD'"""
+    pair = pair.strip().upper()
+    if '/' in pair:
+        base, quote = pair.split('/')
+    elif len(pair) == 6:
+        base, quote = pair[:3], pair[3:]
+    else:
+        raise ValueError(f"Cannot split currency pair {pair!r}")
+    return base, quote
+
+
+def pair_currencies(symbol):
+    """(base, quote) from the instrument registry, else parsed from the symbol"""
+    if symbol in INSTRUMENTS:
+        i = INSTRUMENTS.id(symbol)
+        return INSTRUMENTS.base[i], INSTRUMENTS.quote[i]
+    return split_pair(symbol)
+
+
+def pip_size_for(symbol):
+    """Pip size in quote currency from the instrument registry (JPY-quoted 0.01, else 0.0001)"""
+    if symbol in INSTRUMENTS:
+        return float(INSTRUMENTS.pip_size[INSTRUMENTS.id(symbol)])
+    return 0.01 if split_pair(symbol)[1] == 'JPY' else 0.0001
+
+
+class ConversionTable:
+    """Dense conversion-rate matrix over every currency reachable from the pivot
+
+    `matrix[i, j]` is the price of one unit of currency i in currency j. Each
+    currency is priced to the pivot through the shortest chain of quotes (direct or
+    inverse before crosses); `sources` records the quote and parent currency used.
+    """
+
+    def __init__(self, quotes=None, pivot='USD'):
+        self.pivot = pivot
+        self.quotes = {}
+        self.currencies = [pivot]
+        self.index = {pivot: 0}
+        self.to_pivot = np.ones(1)
+        self.sources = {}
+        self.children = {pivot: set()}
+        self.matrix = np.ones((1, 1))
+        for pair, price in (DEFAULT_QUOTES if quotes is None else quotes).items():
+            self.quotes[split_pair(pair)] = float(price)
+        self._attach(pivot)
+
+    def _neighbours(self, currency):
+        for (base, quote), price in self.quotes.items():
+            if base == currency:
+                yield quote, (base, quote), 1 / price
+            elif quote == currency:
+                yield base, (base, quote), price
+
+    def _add_currency(self, currency):
+        self.index[currency] = len(self.currencies)
+        self.currencies.append(currency)
+        self.to_pivot = np.append(self.to_pivot, np.nan)
+        self.children[currency] = set()
+
+    def _attach(self, root):
+        """Breadth-first pricing of every unpriced currency reachable from root"""
+        frontier = deque([root])
+        added = []
+        while frontier:
+            parent = frontier.popleft()
+            for currency, pair, rate_in_parent in self._neighbours(parent):
+                if currency in self.sources or currency == self.pivot:
+                    continue
+                if currency not in self.index:
+                    self._add_currency(currency)
+                self.sources[currency] = (pair, parent)
+                self.children[parent].add(currency)
+                self.to_pivot[self.index[currency]] = rate_in_parent * self.to_pivot[self.index[parent]]
+                added.append(currency)
+                frontier.append(currency)
+        if added or self.matrix.shape[0] != len(self.currencies):
+            self._rebuild()
+
+    def _rebuild(self):
+        self.matrix = self.to_pivot[:, None] / self.to_pivot[None, :]
+
+    def _reprice(self, currency):
+        """Recompute to_pivot for currency and everything priced through it"""
+        stack, touched = [currency], []
+        while stack:
+            current = stack.pop()
+            (base, quote), parent = self.sources[current]
+            price = self.quotes[(base, quote)]
+            rate_in_parent = 1 / price if base == parent else price
+            self.to_pivot[self.index[current]] = rate_in_parent * self.to_pivot[self.index[parent]]
+            touched.append(self.index[current])
+            stack.extend(self.children[current])
+        rows = np.array(touched)
+        self.matrix[rows, :] = self.to_pivot[rows, None] / self.to_pivot[None, :]
+        self.matrix[:, rows] = self.to_pivot[:, None] / self.to_pivot[None, rows]
+
+    def set_quote(self, pair, price):
+        """Update one quote, recomputing only the currencies priced through it"""
+        base, quote = split_pair(pair)
+        self.quotes[(base, quote)] = float(price)
+        for currency in (base, quote):
+            source = self.sources.get(currency)
+            if source is not None and source[0] == (base, quote):
+                self._reprice(currency)
+                return
+        if base in self.sources or base == self.pivot:
+            self._attach(base)
+        elif quote in self.sources or quote == self.pivot:
+            self._attach(quote)
+
+    def update(self, quotes):
+        """Apply a batch of quote updates"""
+        for pair, price in quotes.items():
+            self.set_quote(pair, price)
+
+    def rate(self, from_currency, to_currency):
+        """Price of one unit of from_currency in to_currency"""
+        try:
+            return float(self.matrix[self.index[from_currency], self.index[to_currency]])
+        except KeyError:
+            raise KeyError(f"No conversion path from {from_currency} to {to_currency}") from None
+
+    def convert(self, amount, from_currency, to_currency):
+        return amount * self.rate(from_currency, to_currency)
+
+    def pip_value(self, pair, position_size, contract_size, account_currency, pip_size=None):
+        """Pip value in account currency for one position"""
+        quote = pair_currencies(pair)[1]
+        pip_size = pip_size_for(pair) if pip_size is None else pip_size
+        return pip_size * contract_size * position_size * self.rate(quote, account_currency)
+
+    def pip_values(self, pairs, position_sizes, contract_sizes, account_currency):
+        """Vectorized pip values for arrays of pairs, lots and contract sizes"""
+        unique_pairs, codes = np.unique(np.asarray(pairs, dtype=str), return_inverse=True)
+        per_unit = np.array([self.pip_value(pair, 1.0, 1.0, account_currency) for pair in unique_pairs])
+        return per_unit[codes] * np.asarray(position_sizes, dtype=float) * np.asarray(contract_sizes, dtype=float)
+
+
+@memoize(max_entries=8)
+def conversion_table(quotes=None, pivot='USD'):
+    """Cached ConversionTable for a quote snapshot (shared - use ConversionTable for live updates)"""
+    return ConversionTable(quotes, pivot)
@@ -0,0 +1,230 @@
+"""
+Multi-pair hedge optimizer
+
+Chooses the cheapest set of LP hedge trades that brings every currency leg of the
+book within its limit. Every hedgeable pair moves value between its base and quote
+currency, so exposures that net across crosses (long EUR/JPY against short EUR/USD
+and USD/JPY) are hedged once instead of pair by pair. The problem is a small linear
+program - minimize spread cost subject to |exposure + A @ hedge| <= limit per
+currency - solved with SciPy's HiGHS when SciPy is installed, otherwise with the
+dense two-phase simplex below.
+"""
+import numpy as np
+
+from risk_engine.fx import conversion_table
+from risk_engine.instruments import INSTRUMENTS
+
+
+_TOLERANCE = 1e-9
+
+
+def _pivot(tableau, basis, row, column):
+    tableau[row] /= tableau[row, column]
+    others = np.arange(len(tableau)) != row
+    tableau[others] -= np.outer(tableau[others, column], tableau[row])
+    basis[row] = column
+
+
+def _run_simplex(tableau, basis, max_iterations=10000):
+    """Pivot until no reduced cost is negative
+
+    Uses the most negative reduced cost, falling back to Bland's rule (which cannot
+    cycle) after a run of degenerate pivots.
+    """
+    degenerate = 0
+    for _ in range(max_iterations):
+        reduced = tableau[-1, :-1]
+        entering = np.flatnonzero(reduced < -_TOLERANCE)
+        if not len(entering):
+            return
+        column = entering[0] if degenerate > 50 else np.argmin(reduced)
+        pivot_column = tableau[:-1, column]
+        eligible = pivot_column > _TOLERANCE
+        if not eligible.any():
+            raise ValueError("Hedge problem is unbounded")
+        ratios = np.full(len(pivot_column), np.inf)
+        ratios[eligible] = tableau[:-1, -1][eligible] / pivot_column[eligible]
+        ties = np.flatnonzero(ratios <= ratios.min() + _TOLERANCE)
+        degenerate = degenerate + 1 if ratios.min() <= _TOLERANCE else 0
+        _pivot(tableau, basis, ties[np.argmin(basis[ties])], column)
+    raise ValueError("Simplex did not converge")
+
+
+def _set_objective(tableau, basis, costs):
+    tableau[-1] = 0
+    tableau[-1, :len(costs)] = costs
+    for row, column in enumerate(basis):
+        if tableau[-1, column] != 0:
+            tableau[-1] -= tableau[-1, column] * tableau[row]
+
+
+def simplex(c, A_ub, b_ub):
+    """Minimize c @ x subject to A_ub @ x <= b_ub and x >= 0 (dense two-phase simplex)"""
+    c = np.asarray(c, dtype=float)
+    A_ub = np.asarray(A_ub, dtype=float)
+    b_ub = np.asarray(b_ub, dtype=float)
+    rows, variables = A_ub.shape
+
+    # Equality form with slacks; rows with negative right-hand side get an artificial
+    flip = b_ub < 0
+    artificial_rows = np.flatnonzero(flip)
+    width = variables + rows + len(artificial_rows)
+    tableau = np.zeros((rows + 1, width + 1))
+    tableau[:rows, :variables] = A_ub
+    tableau[:rows, variables:variables + rows] = np.eye(rows)
+    tableau[:rows, -1] = b_ub
+    tableau[artificial_rows] *= -1
+    tableau[artificial_rows, variables + rows + np.arange(len(artificial_rows))] = 1
+
+    basis = variables + np.arange(rows)
+    basis[artificial_rows] = variables + rows + np.arange(len(artificial_rows))
+
+    # Phase 1: minimize the sum of artificials
+    if len(artificial_rows):
+        phase_one = np.zeros(width)
+        phase_one[variables + rows:] = 1
+        _set_objective(tableau, basis, phase_one)
+        _run_simplex(tableau, basis)
+        if -tableau[-1, -1] > 1e-7 * max(1.0, np.abs(b_ub).max()):
+            raise ValueError("No hedge brings every currency within its limit")
+
+        # Drive remaining artificials out of the basis, dropping redundant rows
+        keep = np.ones(rows + 1, dtype=bool)
+        for row in np.flatnonzero(basis >= variables + rows):
+            candidates = np.flatnonzero(np.abs(tableau[row, :variables + rows]) > _TOLERANCE)
+            if len(candidates):
+                _pivot(tableau, basis, row, candidates[0])
+            else:
+                keep[row] = False
+        basis = basis[keep[:-1]]
+        tableau = np.delete(tableau[keep], np.s_[variables + rows:width], axis=1)
+
+    # Phase 2: minimize the real objective
+    _set_objective(tableau, basis, np.concatenate([c, np.zeros(rows)]))
+    _run_simplex(tableau, basis)
+
+    solution = np.zeros(variables + rows)
+    solution[basis] = tableau[:-1, -1]
+    return solution[:variables]
+
+
+def solve_lp(c, A_ub, b_ub):
+    """Minimize c @ x subject to A_ub @ x <= b_ub, x >= 0 with SciPy when available"""
+    try:
+        from scipy.optimize import linprog
+    except ImportError:
+        return simplex(c, A_ub, b_ub)
+
+    result = linprog(c, A_ub=A_ub, b_ub=b_ub, bounds=(0, None), method='highs')
+    if result.status == 2:
+        raise ValueError("No hedge brings every currency within its limit")
+    if result.status != 0:
+        raise ValueError(f"Hedge optimization failed: {result.message}")
+    return result.x
+
+
+def _as_mapping(values, keys, default):
+    if isinstance(values, dict):
+        return np.array([values.get(key, default) for key in keys], dtype=float)
+    return np.full(len(keys), default if values is None else float(values))
+
+
+def optimize_hedges(currency_exposure, limits, spreads=0.5, pairs=None, registry=INSTRUMENTS,
+                    quotes=None, account_currency='USD', lot_step=0.01):
+    """Cheapest hedge trades that bring every currency leg within its limit
+
+    `currency_exposure` is {currency: net value in account currency} or the
+    by_currency table from book_exposure. `limits` is a value limit for every
+    non-account currency or a {currency: limit} dict (the account currency is
+    unlimited unless listed). `spreads` is the LP spread in pips per pair, scalar or
+    dict. Candidate pairs default to every registry pair (FX and metals) priced by the
+    quotes.
+
+    Returns the hedge trades, their cost, before/after exposure per currency, the
+    cost of hedging each currency on its own against the account currency, and any
+    over-limit legs (e.g. index underlyings) that no candidate pair can hedge.
+    """
+    import pandas as pd
+
+    if hasattr(currency_exposure, 'columns'):
+        value_column = [column for column in currency_exposure.columns if column.startswith('Net Value')][0]
+        currency_exposure = dict(zip(currency_exposure['Currency'], currency_exposure[value_column]))
+
+    table = conversion_table(quotes)
+    if pairs is None:
+        pairs = [symbol for symbol in registry.symbols_for()
+                 if registry.base[registry.id(symbol)] in table.index
+                 and registry.quote[registry.id(symbol)] in table.index]
+    ids = np.array([registry.id(pair) for pair in pairs], dtype=np.int64)
+    bases, quotes_ccy = registry.base[ids], registry.quote[ids]
+
+    currencies = list(dict.fromkeys(list(currency_exposure) + list(bases) + list(quotes_ccy)))
+    position = {currency: i for i, currency in enumerate(currencies)}
+    exposure = np.array([currency_exposure.get(currency, 0.0) for currency in currencies], dtype=float)
+
+    if isinstance(limits, dict):
+        limit = np.array([limits.get(currency, np.inf) for currency in currencies], dtype=float)
+    else:
+        limit = np.array([np.inf if currency == account_currency else float(limits) for currency in currencies])
+
+    # Value moved per lot: +notional on the base leg, -notional on the quote leg
+    notional = np.array([registry.contract_size[i] * table.rate(base, account_currency)
+                         for i, base in zip(ids, bases)])
+    impact = np.zeros((len(currencies), len(pairs)))
+    impact[[position[c] for c in bases], np.arange(len(pairs))] = notional
+    impact[[position[c] for c in quotes_ccy], np.arange(len(pairs))] = -notional
+
+    pip_value = np.array([table.pip_value(pair, 1.0, registry.contract_size[i], account_currency)
+                          for pair, i in zip(pairs, ids)])
+    cost_per_lot = _as_mapping(spreads, pairs, 0.5) * pip_value
+
+    # Split hedges into buy and sell lots: |exposure + impact @ (buy - sell)| <= limit
+    hedgeable = (impact != 0).any(axis=1)
+    bounded = np.isfinite(limit) & hedgeable
+    A = impact[bounded]
+    A_ub = np.block([[A, -A], [-A, A]])
+    b_ub = np.concatenate([limit[bounded] - exposure[bounded], limit[bounded] + exposure[bounded]])
+    if len(b_ub):
+        solution = solve_lp(np.concatenate([cost_per_lot, cost_per_lot]), A_ub, b_ub)
+    else:
+        solution = np.zeros(2 * len(pairs))
+    hedge_lots = solution[:len(pairs)] - solution[len(pairs):]
+    if lot_step:
+        # Tradeable sizes; legs may then sit up to half a lot step's notional past a limit
+        hedge_lots = np.round(hedge_lots / lot_step) * lot_step
+    after = exposure + impact @ hedge_lots
+
+    traded = np.abs(hedge_lots) > 0
+    hedges = pd.DataFrame({
+        'Instrument': np.asarray(pairs, dtype=object)[traded],
+        'Direction': np.where(hedge_lots[traded] > 0, 'Buy', 'Sell'),
+        'Lots': np.abs(hedge_lots[traded]),
+        f'Notional ({account_currency})': np.abs(hedge_lots[traded]) * notional[traded],
+        f'Cost ({account_currency})': np.abs(hedge_lots[traded]) * cost_per_lot[traded]
+    })
+
+    # Benchmark: hedge each currency's excess on its own pair against the account currency
+    excess = np.maximum(np.abs(exposure) - limit, 0)
+    pairwise_cost = 0.0
+    for currency in np.asarray(currencies)[(excess > 0) & hedgeable]:
+        direct = [j for j, (b, q) in enumerate(zip(bases, quotes_ccy))
+                  if {b, q} == {currency, account_currency}]
+        if not direct:
+            pairwise_cost = np.nan
+            break
+        j = direct[0]
+        pairwise_cost += excess[position[currency]] / notional[j] * cost_per_lot[j]
+
+    return {
+        'hedges': hedges,
+        'total_cost': float(hedges[f'Cost ({account_currency})'].sum()),
+        'pairwise_cost': float(pairwise_cost),
+        'by_currency': pd.DataFrame({
+            'Currency': currencies,
+            'Before': exposure,
+            'After': after,
+            'Limit': limit
+        }),
+        'hedge_lots': dict(zip(pairs, hedge_lots)),
+        'unhedgeable': [c for c, over in zip(currencies, (excess > 0) & ~hedgeable) if over]
+    }
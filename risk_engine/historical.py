@@ -0,0 +1,166 @@
+"""
+Historical-simulation VaR over stored return matrices (dates x instruments)
+
+Return histories are streamed in row blocks from memory-mapped .npy files, Parquet
+files (via the optional pyarrow dependency), CSV files, uploaded file objects or
+in-memory arrays/DataFrames, so only one block of the history is resident at a time.
+Each block is reduced straight to portfolio returns with a single matrix product
+against the weight vectors.
+"""
+import io
+import os
+
+import numpy as np
+
+from risk_engine.montecarlo import DEFAULT_CONFIDENCE_LEVELS
+from risk_engine.trader import calculate_var
+
+
+def _as_matrix(returns, name):
+    if returns.ndim == 1:
+        return returns[:, None]
+    if returns.ndim != 2:
+        raise ValueError(f"Expected a 2-D (dates x instruments) array in {name}, got {returns.ndim}-D")
+    return returns
+
+
+def open_returns(path):
+    """Open a .npy return matrix as a read-only memory map (a 1-D file is one instrument)"""
+    return _as_matrix(np.load(path, mmap_mode='r'), path)
+
+
+def _npy_view(buffer):
+    """Read-only array over an in-memory .npy file (e.g. an upload) without copying the data"""
+    from numpy.lib import format as npy_format
+
+    buffer.seek(0)
+    read_header = {(1, 0): npy_format.read_array_header_1_0,
+                   (2, 0): npy_format.read_array_header_2_0}.get(npy_format.read_magic(buffer))
+    if read_header is None:
+        buffer.seek(0)
+        return _as_matrix(np.load(buffer), getattr(buffer, 'name', 'upload'))
+    shape, fortran_order, dtype = read_header(buffer)
+    if dtype.hasobject:
+        raise ValueError("Return files must hold numbers, not Python objects")
+    count = int(np.prod(shape))
+    data = np.frombuffer(buffer.getbuffer(), dtype=dtype, count=count, offset=buffer.tell())
+    returns = data.reshape(shape, order='F' if fortran_order else 'C')
+    return _as_matrix(returns, getattr(buffer, 'name', 'upload'))
+
+
+def _parquet_file(path):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError("Reading Parquet return files requires pyarrow (pip install pyarrow)") from exc
+    return pq.ParquetFile(path)
+
+
+def _numeric_columns(schema):
+    import pyarrow as pa
+    return [field.name for field in schema
+            if pa.types.is_floating(field.type) or pa.types.is_integer(field.type)]
+
+
+def iter_return_blocks(source, chunk_rows=256, columns=None):
+    """Yield (rows, instruments) float blocks from an array, DataFrame, or a .npy, .parquet or .csv file
+
+    Files are paths or file-like objects (uploads), told apart by name. For Parquet
+    and CSV files `columns` selects the instrument columns (default: every numeric
+    column); for DataFrames it selects columns by name.
+    """
+    is_file = hasattr(source, 'read')
+    if is_file or isinstance(source, (str, os.PathLike)):
+        path = str(getattr(source, 'name', '')) if is_file else os.fspath(source)
+        if is_file:
+            source.seek(0)
+        if path.endswith('.csv'):
+            import pandas as pd
+            # pandas closes binary handles it wraps; a detached text wrapper leaves the upload open
+            handle = source
+            if is_file and not hasattr(source, 'encoding'):
+                handle = io.TextIOWrapper(source, encoding='utf-8')
+            try:
+                for chunk in pd.read_csv(handle, chunksize=chunk_rows, usecols=columns):
+                    yield (chunk if columns is not None else chunk.select_dtypes('number')).to_numpy(dtype=float)
+            finally:
+                if handle is not source:
+                    handle.detach()
+            return
+        if path.endswith('.parquet') or path.endswith('.pq'):
+            parquet = _parquet_file(source)
+            columns = columns or _numeric_columns(parquet.schema_arrow)
+            for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+                yield np.column_stack([
+                    column.to_numpy(zero_copy_only=False).astype(float) for column in batch.columns
+                ])
+            return
+        if not is_file:
+            source = open_returns(path)
+        elif hasattr(source, 'getbuffer'):
+            source = _npy_view(source)
+        else:
+            source = _as_matrix(np.load(source), path)
+
+    if hasattr(source, 'to_numpy'):
+        source = (source[columns] if columns is not None else source).to_numpy(dtype=float)
+
+    for start in range(0, source.shape[0], chunk_rows):
+        yield np.asarray(source[start:start + chunk_rows], dtype=float)
+
+
+def count_instruments(source, columns=None):
+    """Number of instrument columns in a return source, reading at most its first row"""
+    width = next((block.shape[1] for block in iter_return_blocks(source, 1, columns)), 0)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return width
+
+
+def portfolio_returns(source, weights, chunk_rows=256, columns=None):
+    """Historical portfolio returns, shape (dates, portfolios)
+
+    `weights` is one weight vector (instruments,) or a matrix (portfolios, instruments).
+    Missing returns (NaN) are treated as zero.
+    """
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    blocks = []
+    for block in iter_return_blocks(source, chunk_rows, columns):
+        if block.shape[1] != weights.shape[1]:
+            raise ValueError(f"Weights cover {weights.shape[1]} instruments but returns have {block.shape[1]}")
+        blocks.append(np.nan_to_num(block) @ weights.T)
+    if not blocks:
+        return np.empty((0, weights.shape[0]))
+    return np.concatenate(blocks)
+
+
+def historical_var(source, weights, portfolio_values=1.0, confidence_levels=DEFAULT_CONFIDENCE_LEVELS,
+                   chunk_rows=256, columns=None):
+    """Historical-simulation VaR and Expected Shortfall for one or many weight vectors
+
+    VaR uses calculate_var's percentile convention on the realized portfolio returns;
+    ES is the mean return at or below that percentile. Results have shape
+    (levels, portfolios), matching monte_carlo_var.
+    """
+    returns = portfolio_returns(source, weights, chunk_rows, columns)
+    portfolio_values = np.broadcast_to(np.asarray(portfolio_values, dtype=float), (returns.shape[1],))
+
+    if returns.shape[0] == 0:
+        var_returns = np.zeros((len(confidence_levels), returns.shape[1]))
+        es_returns = var_returns.copy()
+    else:
+        var_returns = np.array([calculate_var(returns, c, axis=0) for c in confidence_levels])
+        es_returns = np.array([
+            np.where(returns <= var, returns, 0).sum(axis=0) / (returns <= var).sum(axis=0)
+            for var in var_returns
+        ])
+
+    return {
+        'confidence_levels': np.asarray(confidence_levels, dtype=float),
+        'num_observations': returns.shape[0],
+        'portfolio_returns': returns,
+        'var_return': var_returns,
+        'es_return': es_returns,
+        'var_amount': portfolio_values * np.abs(var_returns),
+        'es_amount': portfolio_values * np.abs(es_returns)
+    }
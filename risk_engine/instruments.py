@@ -0,0 +1,159 @@
+"""
+Instrument registry - one array-backed table of contract specifications
+
+Every instrument gets an integer id; its pip size, digits, contract size, margin
+tier, swap rates, settlement lag and trading session live in NumPy columns indexed
+by that id. Tools resolve symbols to ids once and gather specifications with array
+indexing instead of re-deriving them from the symbol string.
+"""
+import os
+
+import numpy as np
+
+
+ASSET_CLASSES = ('FX', 'Metal', 'Index', 'Energy')
+
+# Initial margin as a fraction of notional for each margin tier
+MARGIN_TIERS = ('FX Major', 'FX Cross', 'Metal', 'CFD')
+MARGIN_TIER_RATES = np.array([0.01, 0.02, 0.05, 0.10])
+
+# Columns of the registry table; session times are minutes after midnight New York time
+INSTRUMENT_FIELDS = (
+    'Symbol', 'Asset Class', 'Base', 'Quote', 'Pip Size', 'Digits', 'Contract Size',
+    'Margin Tier', 'Long Swap', 'Short Swap', 'Settlement Days', 'Triple Swap Weekday',
+    'Session Open', 'Session Close'
+)
+
+_FX_SESSION = (0, 1440)
+
+
+def _fx(symbol, tier, long_swap, short_swap, settlement_days=2):
+    base, quote = symbol.split('/')
+    pip_size, digits = (0.01, 3) if quote == 'JPY' else (0.0001, 5)
+    return (symbol, 'FX', base, quote, pip_size, digits, 100000, tier, long_swap, short_swap,
+            settlement_days, -1) + _FX_SESSION
+
+
+# Illustrative specifications; load_instruments() reads a full broker symbol table
+DEFAULT_INSTRUMENTS = [
+    _fx('EUR/USD', 0, -2.5, 0.8),
+    _fx('GBP/USD', 0, -1.8, 0.4),
+    _fx('USD/JPY', 0, 1.2, -2.6),
+    _fx('AUD/USD', 0, -0.9, 0.1),
+    _fx('USD/CHF', 0, 0.6, -1.9),
+    _fx('NZD/USD', 0, -0.7, 0.0),
+    _fx('USD/CAD', 0, -0.4, -0.3, settlement_days=1),
+    _fx('EUR/GBP', 1, -1.1, 0.2),
+    _fx('EUR/JPY', 1, 0.9, -2.4),
+    _fx('GBP/JPY', 1, 1.5, -3.1),
+    _fx('EUR/CHF', 1, -0.6, -0.2),
+    _fx('AUD/JPY', 1, 0.4, -1.3),
+    _fx('CHF/JPY', 1, 1.1, -2.8),
+    _fx('EUR/AUD', 1, -2.1, 0.6),
+    _fx('USD/TRY', 1, -95.0, 40.0, settlement_days=1),
+    ('XAU/USD', 'Metal', 'XAU', 'USD', 0.01, 2, 100, 2, -4.5, 1.2, 2, -1, 60, 1020),
+    ('XAG/USD', 'Metal', 'XAG', 'USD', 0.001, 3, 5000, 2, -0.8, 0.2, 2, -1, 60, 1020),
+    ('US30', 'Index', 'US30', 'USD', 1.0, 1, 1, 3, -3.2, 0.9, 0, 4, 60, 1020),
+    ('US500', 'Index', 'US500', 'USD', 0.1, 2, 1, 3, -0.4, 0.1, 0, 4, 60, 1020),
+    ('NAS100', 'Index', 'NAS100', 'USD', 0.1, 2, 1, 3, -1.6, 0.4, 0, 4, 60, 1020),
+    ('GER40', 'Index', 'GER40', 'EUR', 1.0, 1, 1, 3, -1.4, 0.2, 0, 4, 120, 960),
+    ('UK100', 'Index', 'UK100', 'GBP', 1.0, 1, 1, 3, -0.7, 0.1, 0, 4, 120, 960),
+    ('USOIL', 'Energy', 'USOIL', 'USD', 0.01, 2, 1000, 3, -1.0, 0.3, 0, 4, 60, 1020),
+]
+
+
+class InstrumentRegistry:
+    """Columnar instrument table indexed by integer instrument id
+
+    Columns are NumPy arrays (`pip_size`, `contract_size`, `margin_rate`, ...) so a
+    block of positions gathers its specifications with `registry.pip_size[ids]`.
+    """
+
+    def __init__(self, rows):
+        rows = [tuple(row) for row in rows]
+        columns = list(zip(*rows)) if rows else [()] * len(INSTRUMENT_FIELDS)
+        data = dict(zip(INSTRUMENT_FIELDS, columns))
+
+        self.symbols = np.array(data['Symbol'], dtype=object)
+        self.asset_class = np.array(data['Asset Class'], dtype=object)
+        self.base = np.array(data['Base'], dtype=object)
+        self.quote = np.array(data['Quote'], dtype=object)
+        self.pip_size = np.array(data['Pip Size'], dtype=float)
+        self.digits = np.array(data['Digits'], dtype=np.int8)
+        self.contract_size = np.array(data['Contract Size'], dtype=float)
+        self.margin_tier = np.array(data['Margin Tier'], dtype=np.int8)
+        self.margin_rate = MARGIN_TIER_RATES[self.margin_tier]
+        self.long_swap = np.array(data['Long Swap'], dtype=float)
+        self.short_swap = np.array(data['Short Swap'], dtype=float)
+        self.settlement_days = np.array(data['Settlement Days'], dtype=np.int8)
+        self.triple_swap_weekday = np.array(data['Triple Swap Weekday'], dtype=np.int8)
+        self.session_open = np.array(data['Session Open'], dtype=np.int16)
+        self.session_close = np.array(data['Session Close'], dtype=np.int16)
+
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        if len(self.index) != len(self.symbols):
+            raise ValueError("Instrument symbols must be unique")
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.index
+
+    def id(self, symbol):
+        """Integer id for one symbol"""
+        try:
+            return self.index[symbol]
+        except KeyError:
+            raise KeyError(f"Unknown instrument: {symbol}") from None
+
+    def ids(self, symbols):
+        """Integer ids for an array of symbols, resolving each distinct symbol once"""
+        import pandas as pd
+
+        inverse, unique = pd.factorize(np.asarray(symbols, dtype=object).ravel())
+        missing = [str(symbol) for symbol in unique if symbol not in self.index]
+        if missing:
+            raise KeyError(f"Unknown instruments: {', '.join(missing[:10])}")
+        return np.array([self.index[symbol] for symbol in unique], dtype=np.int64)[inverse]
+
+    def symbols_for(self, asset_class=None):
+        """Symbols in registry order, optionally for one asset class"""
+        if asset_class is None:
+            return self.symbols.tolist()
+        return self.symbols[self.asset_class == asset_class].tolist()
+
+    def spec(self, symbol):
+        """One instrument's specification as a dict keyed by registry column"""
+        i = self.id(symbol)
+        return dict(zip(INSTRUMENT_FIELDS, (
+            self.symbols[i], self.asset_class[i], self.base[i], self.quote[i], float(self.pip_size[i]),
+            int(self.digits[i]), float(self.contract_size[i]), int(self.margin_tier[i]), float(self.long_swap[i]),
+            float(self.short_swap[i]), int(self.settlement_days[i]), int(self.triple_swap_weekday[i]),
+            int(self.session_open[i]), int(self.session_close[i])
+        )))
+
+    def to_frame(self):
+        """Registry as a DataFrame with one row per instrument id"""
+        import pandas as pd
+        return pd.DataFrame([self.spec(symbol) for symbol in self.symbols])
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Build a registry from a DataFrame with the INSTRUMENT_FIELDS columns"""
+        missing = [field for field in INSTRUMENT_FIELDS if field not in frame.columns]
+        if missing:
+            raise ValueError(f"Instrument table needs {', '.join(missing)}")
+        return cls(frame[list(INSTRUMENT_FIELDS)].itertuples(index=False, name=None))
+
+
+def load_instruments(source, name=None):
+    """Read an instrument table (.csv or .parquet) into an InstrumentRegistry"""
+    import pandas as pd
+
+    name = name or getattr(source, 'name', None) or os.fspath(source)
+    frame = pd.read_parquet(source) if str(name).endswith('.parquet') else pd.read_csv(source)
+    return InstrumentRegistry.from_frame(frame)
+
+
+INSTRUMENTS = InstrumentRegistry(DEFAULT_INSTRUMENTS)
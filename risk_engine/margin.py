@@ -0,0 +1,179 @@
+"""
+Account-level margin engine
+
+One set of array primitives values every position in the account currency (base
+currency notional, or price times the quote-to-account rate) and turns notional
+into margin with per-instrument rates and optional volume tiers. account_margin
+applies them to a whole book: positions are grouped by (account, instrument) with
+np.bincount, hedged long/short volume is netted at `hedged_margin_ratio`, and
+equity, used/free margin and margin level come out per account in grouped passes.
+calculate_margin, calculate_position_metrics and the position monitor use the same
+primitives.
+"""
+import numpy as np
+
+from risk_engine.exposure import signed_lots
+from risk_engine.fx import conversion_table
+from risk_engine.instruments import INSTRUMENTS
+
+
+# Progressive volume tiers: (notional upper bound in account currency, margin rate multiplier)
+DEFAULT_VOLUME_TIERS = ((1000000, 1.0), (5000000, 2.0), (np.inf, 4.0))
+
+ACCOUNT_COLUMNS = ['Client ID', 'Balance']
+
+
+def quote_rates(registry=INSTRUMENTS, account_currency='USD', quotes=None):
+    """Quote-to-account rate per instrument id (NaN without a conversion path) and base-currency mask
+
+    Positions whose base currency is the account currency are valued with their own
+    price instead of the rate.
+    """
+    table = conversion_table(quotes)
+    quote_rate = np.array([
+        1.0 if quote == account_currency
+        else table.rate(quote, account_currency) if quote in table.index and account_currency in table.index
+        else np.nan
+        for quote in registry.quote
+    ])
+    return quote_rate, registry.base == account_currency
+
+
+def base_value(ids, price, registry=INSTRUMENTS, account_currency='USD', quotes=None):
+    """Account-currency value of one unit of each instrument's base at `price`"""
+    quote_rate, is_base = quote_rates(registry, account_currency, quotes)
+    return np.where(is_base[ids], 1.0, price * quote_rate[ids])
+
+
+def position_notional(ids, lots, price, registry=INSTRUMENTS, account_currency='USD', quotes=None):
+    """Absolute notional of each position in account currency
+
+    A USD/JPY lot in a USD account is 100,000 USD, not 100,000 x the JPY price.
+    """
+    return np.abs(lots) * registry.contract_size[ids] * base_value(ids, price, registry, account_currency, quotes)
+
+
+def floating_pnl(ids, lots, entry, current, registry=INSTRUMENTS, account_currency='USD', quotes=None):
+    """Pips, pip value per lot and unrealized P&L in account currency for signed lots"""
+    quote_rate, is_base = quote_rates(registry, account_currency, quotes)
+    pip_size = registry.pip_size[ids]
+    pips = (current - entry) / pip_size * np.sign(lots)
+    pip_value = pip_size * registry.contract_size[ids]
+    pip_value = np.where(is_base[ids], pip_value / current, pip_value * quote_rate[ids])
+    return pips, pip_value, pips * pip_value * np.abs(lots)
+
+
+def tiered_margin(notional, rate, volume_tiers=None):
+    """Margin for notional at `rate`, with progressively higher rates across volume tiers
+
+    With tiers ((1e6, 1.0), (5e6, 2.0), (inf, 4.0)) the first million is charged at
+    `rate`, the next four million at twice that and the rest at four times.
+    """
+    notional = np.asarray(notional, dtype=float)
+    if not volume_tiers:
+        return notional * rate
+    bounds = np.array([0.0] + [bound for bound, _ in volume_tiers])
+    multipliers = np.array([multiplier for _, multiplier in volume_tiers])
+    in_tier = np.clip(notional[..., None] - bounds[:-1], 0, np.diff(bounds))
+    return (in_tier * multipliers).sum(axis=-1) * rate
+
+
+def account_margin(positions, accounts=None, hedged_margin_ratio=0.5, volume_tiers=None, margin_call_level=100,
+                   stop_out_level=50, account_currency='USD', registry=INSTRUMENTS, quotes=None):
+    """Equity, used/free margin and margin level for every account in a book of positions
+
+    `positions` has Client ID, Instrument, Lots with Direction (or Signed Lots),
+    Entry and Current. `accounts` has Client ID and Balance, and optionally Leverage,
+    which floors every instrument's margin rate at 1 / leverage; without it the
+    positions must carry the account's Equity at their Current prices.
+
+    Within an account, opposite positions in one instrument are hedged: margin is
+    charged on |net| lots plus `hedged_margin_ratio` x both hedged legs (0 nets fully,
+    0.5 charges the larger leg, 1 charges gross). Margin is per-instrument rate x
+    notional at the current price, tiered by `volume_tiers` per account and
+    instrument.
+    """
+    import pandas as pd
+
+    ids = registry.ids(positions['Instrument'].to_numpy())
+    lots = signed_lots(positions)
+    entry = positions['Entry'].to_numpy(dtype=float)
+    current = positions['Current'].to_numpy(dtype=float)
+    client, clients = pd.factorize(positions['Client ID'].to_numpy())
+    num_accounts = len(clients)
+
+    # Floating P&L and balance per account
+    _, _, pnl = floating_pnl(ids, lots, entry, current, registry, account_currency, quotes)
+    account_pnl = np.bincount(client, weights=pnl, minlength=num_accounts)
+    leverage = np.full(num_accounts, np.inf)
+    if accounts is not None:
+        missing = [column for column in ACCOUNT_COLUMNS if column not in accounts.columns]
+        if missing:
+            raise ValueError(f"Accounts need {', '.join(missing)}")
+        account_rows = pd.Index(accounts['Client ID']).get_indexer(clients)
+        if (account_rows < 0).any():
+            unknown = [str(c) for c in np.asarray(clients)[account_rows < 0][:10]]
+            raise KeyError(f"No account for: {', '.join(unknown)}")
+        balance = accounts['Balance'].to_numpy(dtype=float)[account_rows]
+        if 'Leverage' in accounts.columns:
+            leverage = accounts['Leverage'].to_numpy(dtype=float)[account_rows]
+    elif 'Equity' in positions.columns:
+        _, first_rows = np.unique(client, return_index=True)
+        balance = positions['Equity'].to_numpy(dtype=float)[first_rows] - account_pnl
+    else:
+        raise ValueError("Pass an accounts table or an Equity column on the positions")
+    equity = balance + account_pnl
+
+    # Long/short lots per (account, instrument) group
+    group, group_keys = pd.factorize(client.astype(np.int64) * len(registry) + ids)
+    num_groups = len(group_keys)
+    group_account = group_keys // len(registry)
+    group_instrument = group_keys % len(registry)
+    long_lots = np.bincount(group, weights=np.maximum(lots, 0), minlength=num_groups)
+    short_lots = np.bincount(group, weights=np.maximum(-lots, 0), minlength=num_groups)
+    hedged_lots = np.minimum(long_lots, short_lots)
+    margin_lots = np.abs(long_lots - short_lots) + hedged_margin_ratio * 2 * hedged_lots
+
+    # Notional per margin lot at the lot-weighted current price of the group
+    gross_lots = long_lots + short_lots
+    weighted_price = np.bincount(group, weights=np.abs(lots) * current, minlength=num_groups)
+    price = np.divide(weighted_price, gross_lots, out=np.zeros(num_groups), where=gross_lots > 0)
+    notional = position_notional(group_instrument, margin_lots, price, registry, account_currency, quotes)
+    rate = np.maximum(registry.margin_rate[group_instrument], 1 / leverage[group_account])
+    group_margin = tiered_margin(notional, rate, volume_tiers)
+
+    used_margin = np.bincount(group_account, weights=group_margin, minlength=num_accounts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margin_level = np.where(used_margin > 0, equity / used_margin * 100, np.inf)
+
+    by_account = pd.DataFrame({
+        'Client ID': clients,
+        'Balance': balance,
+        'Floating P&L': account_pnl,
+        'Equity': equity,
+        'Used Margin': used_margin,
+        'Free Margin': equity - used_margin,
+        'Margin Level': margin_level,
+        'Margin Call': margin_level <= margin_call_level,
+        'Stop Out': margin_level <= stop_out_level
+    })
+    by_instrument = pd.DataFrame({
+        'Client ID': np.asarray(clients)[group_account],
+        'Instrument': registry.symbols[group_instrument],
+        'Long Lots': long_lots,
+        'Short Lots': short_lots,
+        'Hedged Lots': hedged_lots,
+        'Margin Lots': margin_lots,
+        f'Notional ({account_currency})': notional,
+        'Margin': group_margin
+    })
+
+    return {
+        'accounts': by_account,
+        'by_instrument': by_instrument,
+        'num_accounts': num_accounts,
+        'total_equity': float(equity.sum()),
+        'total_used_margin': float(used_margin.sum()),
+        'accounts_margin_call': int(by_account['Margin Call'].sum()),
+        'accounts_stop_out': int(by_account['Stop Out'].sum())
+    }
@@ -0,0 +1,259 @@
+"""
+Client position monitor over a columnar table of open positions
+
+Positions are one table (client, instrument, direction, lots, entry, current price,
+equity). Instruments resolve to registry ids once; pip size, contract size, margin
+rate and the quote-currency conversion are gathered by id, so pips, P&L and margin
+level for the whole book are a few array expressions. Alerts are a boolean filter
+over the result instead of a pass over the rows.
+"""
+import numpy as np
+
+from risk_engine.exposure import signed_lots
+from risk_engine.instruments import INSTRUMENTS
+from risk_engine.margin import quote_rates, position_notional, floating_pnl
+
+
+POSITION_COLUMNS = ['Client ID', 'Instrument', 'Lots', 'Entry', 'Current', 'Equity']
+
+
+def position_metrics(positions, account_currency='USD', registry=INSTRUMENTS, quotes=None):
+    """Add Pips, Pip Value, P&L, Margin Used and Margin Level columns to a positions table
+
+    `positions` has POSITION_COLUMNS plus a Long/Short Direction (or Signed Lots).
+    Row for row this matches calculate_position_metrics; both use the margin engine's
+    floating_pnl and position_notional primitives.
+    """
+    missing = [column for column in POSITION_COLUMNS if column not in positions.columns]
+    if missing:
+        raise ValueError(f"Positions need {', '.join(missing)}")
+
+    ids = registry.ids(positions['Instrument'].to_numpy())
+    lots = signed_lots(positions)
+    entry = positions['Entry'].to_numpy(dtype=float)
+    current = positions['Current'].to_numpy(dtype=float)
+    equity = positions['Equity'].to_numpy(dtype=float)
+
+    # Calculate pips, pip value per lot and P&L
+    pips, pip_value, pnl = floating_pnl(ids, lots, entry, current, registry, account_currency, quotes)
+
+    # Calculate margin level against the position's equity, on account-currency notional at entry
+    margin_used = position_notional(ids, lots, entry, registry, account_currency, quotes) * registry.margin_rate[ids]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margin_level = np.where(margin_used > 0, equity / margin_used * 100, 0.0)
+
+    result = positions.copy()
+    result['Pips'] = pips
+    result['Pip Value'] = pip_value
+    result['P&L'] = pnl
+    result['Margin Used'] = margin_used
+    result['Margin Level'] = margin_level
+    return result
+
+
+def monitor_positions(positions, margin_call_level=150.0, large_position_lots=5.0, account_currency='USD',
+                      registry=INSTRUMENTS, quotes=None):
+    """Position metrics, alert table and book summary for every open client position
+
+    A position is flagged when its margin level is below `margin_call_level` (%) or
+    its size exceeds `large_position_lots`; margin flags take precedence.
+    """
+    import pandas as pd
+
+    table = position_metrics(positions, account_currency, registry, quotes)
+    pnl = table['P&L'].to_numpy()
+    margin_level = table['Margin Level'].to_numpy()
+    lots = np.abs(signed_lots(table))
+
+    at_risk = margin_level < margin_call_level
+    large = lots > large_position_lots
+    flagged = at_risk | large
+    # Margin call risk first, lowest margin level first within each alert type
+    order = np.flatnonzero(flagged)[np.lexsort((margin_level[flagged], ~at_risk[flagged]))]
+    alerts = table.iloc[order].reset_index(drop=True)
+    alerts.insert(0, 'Alert', np.where(at_risk[order], 'Margin Call Risk', 'Large Position'))
+
+    client_codes, clients = pd.factorize(table['Client ID'].to_numpy())
+    by_client = pd.DataFrame({
+        'Client ID': clients,
+        'Positions': np.bincount(client_codes, minlength=len(clients)),
+        'P&L': np.bincount(client_codes, weights=pnl, minlength=len(clients))
+    }).sort_values('P&L', key=np.abs, ascending=False, ignore_index=True)
+
+    instrument_codes, instruments = pd.factorize(table['Instrument'].to_numpy())
+    by_instrument = pd.DataFrame({
+        'Instrument': instruments,
+        'Lots': np.bincount(instrument_codes, weights=lots, minlength=len(instruments))
+    }).sort_values('Lots', ascending=False, ignore_index=True)
+
+    return {
+        'positions': table,
+        'alerts': alerts,
+        'by_client': by_client,
+        'by_instrument': by_instrument,
+        'num_positions': len(table),
+        'total_pnl': float(pnl.sum()),
+        'winning_positions': int((pnl > 0).sum()),
+        'losing_positions': int((pnl < 0).sum()),
+        'positions_at_risk': int(at_risk.sum()),
+        'large_positions': int(large.sum())
+    }
+
+
+TICK_COLUMNS = ['Time', 'Instrument', 'Price']
+
+
+def iter_ticks(source, chunk_rows=1000000):
+    """Yield (time, instrument, price) ticks in file order from a DataFrame, .csv or .parquet path
+
+    Stands in for a live price feed; any iterable of the same tuples (e.g. lines read
+    from a socket) can be passed to LiveMonitor.replay instead.
+    """
+    from risk_engine.revenue import iter_trade_chunks
+
+    for chunk in iter_trade_chunks(source, chunk_rows, columns=TICK_COLUMNS):
+        yield from zip(chunk['Time'].to_numpy(), chunk['Instrument'].to_numpy(),
+                       chunk['Price'].to_numpy(dtype=float))
+
+
+def _group_rows(codes, num_groups):
+    """Rows sorted by group code and the boundaries of each group in that order"""
+    order = np.argsort(codes, kind='stable')
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=num_groups))])
+    return order, bounds
+
+
+class LiveMonitor:
+    """Client positions and accounts marked to market tick by tick
+
+    Positions are indexed by instrument once, so a price tick revalues only the
+    positions in that instrument and moves the equity and margin level of only the
+    clients holding them; the rest of the book is untouched. `tick` returns the
+    changed position rows (also passed to `on_update`) so a front end can redraw just
+    those rows and their clients.
+
+    Equity and margin level are per client: the Equity column is the client's equity
+    at the table's Current prices (first row per client), and margin level is that
+    equity over the margin of all the client's positions. Conversion of quote
+    currencies other than the account currency uses the `quotes` snapshot given at
+    construction.
+    """
+
+    def __init__(self, positions, account_currency='USD', registry=INSTRUMENTS, quotes=None, on_update=None):
+        import pandas as pd
+
+        table = position_metrics(positions, account_currency, registry, quotes)
+        self.registry = registry
+        self.on_update = on_update
+        self.ticks = 0
+
+        ids = registry.ids(table['Instrument'].to_numpy())
+        lots = signed_lots(table)
+        self.client_ids = table['Client ID'].to_numpy()
+        self.instruments = table['Instrument'].to_numpy()
+        self.sign = np.sign(lots)
+        self.lots = np.abs(lots)
+        self.entry = table['Entry'].to_numpy(dtype=float)
+        self.current = np.array(table['Current'], dtype=float)
+        self.pnl = np.array(table['P&L'], dtype=float)
+
+        # Pip value per lot in quote currency, converted per tick only for base-currency accounts
+        quote_rate, is_base = quote_rates(registry, account_currency, quotes)
+        self.pip_size = registry.pip_size[ids]
+        self.quote_pip_value = registry.pip_size[ids] * registry.contract_size[ids]
+        self.quote_rate = quote_rate[ids]
+        self.is_base = is_base[ids]
+
+        # Position rows grouped by instrument id: rows of instrument i are order[bounds[i]:bounds[i + 1]]
+        self.instrument_rows = _group_rows(ids, len(registry))
+
+        # Client accounts
+        self.client, self.clients = pd.factorize(self.client_ids)
+        _, first_rows = np.unique(self.client, return_index=True)
+        self.equity = table['Equity'].to_numpy(dtype=float)[first_rows]
+        self.margin_used = np.bincount(self.client, weights=table['Margin Used'].to_numpy(dtype=float),
+                                       minlength=len(self.clients))
+        self.margin_level = np.zeros(len(self.clients))
+        self._refresh_margin(np.arange(len(self.clients)))
+
+    def __len__(self):
+        return len(self.pnl)
+
+    def _refresh_margin(self, clients):
+        margin_used = self.margin_used[clients]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.margin_level[clients] = np.where(margin_used > 0, self.equity[clients] / margin_used * 100, 0.0)
+
+    def tick(self, symbol, price):
+        """Revalue the positions in one instrument at a new price; returns the changed position rows"""
+        instrument = self.registry.index.get(symbol)
+        if instrument is None:
+            return np.empty(0, dtype=np.int64)
+        order, bounds = self.instrument_rows
+        rows = order[bounds[instrument]:bounds[instrument + 1]]
+        if not len(rows):
+            return rows
+
+        # Calculate the new P&L and move each holder's equity by the change
+        self.current[rows] = price
+        pip_value = np.where(self.is_base[rows], self.quote_pip_value[rows] / price,
+                             self.quote_pip_value[rows] * self.quote_rate[rows])
+        pnl = (price - self.entry[rows]) / self.pip_size[rows] * self.sign[rows] * pip_value * self.lots[rows]
+        clients = self.client[rows]
+        np.add.at(self.equity, clients, pnl - self.pnl[rows])
+        self.pnl[rows] = pnl
+        self._refresh_margin(clients)
+
+        self.ticks += 1
+        if self.on_update is not None:
+            self.on_update(rows)
+        return rows
+
+    def replay(self, ticks, refresh_ticks=1000):
+        """Apply (time, instrument, price) ticks, yielding (time, changed rows) every `refresh_ticks`"""
+        changed = np.zeros(len(self), dtype=bool)
+        time = None
+        for count, (time, symbol, price) in enumerate(ticks, 1):
+            changed[self.tick(symbol, price)] = True
+            if count % refresh_ticks == 0:
+                yield time, np.flatnonzero(changed)
+                changed[:] = False
+        if changed.any():
+            yield time, np.flatnonzero(changed)
+
+    def rows(self, rows=None):
+        """Live Current and P&L for the given position rows (default: all) with their client's equity"""
+        import pandas as pd
+
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.int64)
+        clients = self.client[rows]
+        return pd.DataFrame({
+            'Position': rows,
+            'Client ID': self.client_ids[rows],
+            'Instrument': self.instruments[rows],
+            'Current': self.current[rows],
+            'P&L': self.pnl[rows],
+            'Equity': self.equity[clients],
+            'Margin Level': self.margin_level[clients]
+        })
+
+    def accounts(self, rows=None):
+        """Equity, margin used and margin level for the clients holding the given rows (default: all)"""
+        import pandas as pd
+
+        clients = np.arange(len(self.clients)) if rows is None else np.unique(self.client[rows])
+        return pd.DataFrame({
+            'Client ID': np.asarray(self.clients, dtype=object)[clients],
+            'Equity': self.equity[clients],
+            'Margin Used': self.margin_used[clients],
+            'Margin Level': self.margin_level[clients]
+        })
+
+    def summary(self, margin_call_level=150.0):
+        """Book totals at the latest prices"""
+        return {
+            'ticks': self.ticks,
+            'total_pnl': float(self.pnl.sum()),
+            'total_equity': float(self.equity.sum()),
+            'accounts_at_risk': int((self.margin_level < margin_call_level).sum())
+        }
@@ -0,0 +1,201 @@
+"""
+Portfolio loading, concentration and parametric (delta-normal) VaR
+
+Positions files are read straight into a columnar table and summarized with
+whole-column operations, so books of any size skip per-position Python objects.
+
+The covariance matrix of an instrument universe is estimated once per (universe,
+as-of date) and reused for every portfolio evaluated against it. Portfolio, marginal
+and component VaR are then matrix products over a (portfolios x instruments) block of
+position values, so thousands of portfolios cost one pass.
+"""
+import os
+from collections import OrderedDict
+from statistics import NormalDist
+
+import numpy as np
+
+
+POSITION_COLUMNS = ['Symbol', 'Shares', 'Price']
+
+
+def load_positions(source, name=None):
+    """Read a positions file (.csv or .parquet) into a columnar Symbol/Shares/Price/Value table
+
+    `source` is a path or file-like object; pass `name` for file-like objects without
+    one. Column names are matched case-insensitively, and a Value column may stand in
+    for Shares and Price.
+    """
+    import pandas as pd
+
+    name = name or getattr(source, 'name', None) or os.fspath(source)
+    if str(name).endswith('.parquet'):
+        positions = pd.read_parquet(source)
+    else:
+        positions = pd.read_csv(source)
+
+    positions = positions.rename(columns={
+        column: column.strip().title() for column in positions.columns if isinstance(column, str)
+    })
+    if 'Symbol' not in positions.columns:
+        raise ValueError("Positions file needs a Symbol column")
+
+    if 'Value' not in positions.columns:
+        missing = [column for column in POSITION_COLUMNS if column not in positions.columns]
+        if missing:
+            raise ValueError(f"Positions file needs a Value column or {', '.join(missing)}")
+        positions['Value'] = positions['Shares'].to_numpy(dtype=float) * positions['Price'].to_numpy(dtype=float)
+
+    columns = [column for column in POSITION_COLUMNS + ['Value'] if column in positions.columns]
+    positions = positions[columns].copy()
+    positions['Symbol'] = positions['Symbol'].astype(str).astype('category')
+    return positions
+
+
+def summarize_portfolio(positions, top_n=10):
+    """Totals, weights and concentration for a positions table in vectorized passes
+
+    Returns the positions with a Weight (%) column, a per-symbol rollup sorted by value,
+    and concentration measures on the per-symbol weights (largest, top-N, HHI).
+    """
+    values = positions['Value'].to_numpy(dtype=float)
+    total_value = values.sum()
+
+    positions = positions.copy()
+    positions['Weight (%)'] = (values / total_value * 100).round(2) if total_value else 0.0
+
+    by_symbol = (positions.groupby('Symbol', observed=True, sort=False)['Value'].sum()
+                 .sort_values(ascending=False).reset_index())
+    symbol_weights = by_symbol['Value'].to_numpy(dtype=float) / total_value if total_value else np.zeros(len(by_symbol))
+    by_symbol['Weight (%)'] = (symbol_weights * 100).round(2)
+
+    return {
+        'positions': positions,
+        'by_symbol': by_symbol,
+        'total_value': total_value,
+        'num_positions': len(positions),
+        'num_symbols': len(by_symbol),
+        'largest_weight': symbol_weights.max() * 100 if len(symbol_weights) else 0.0,
+        'top_n_weight': symbol_weights[:top_n].sum() * 100,
+        'hhi': float((symbol_weights ** 2).sum())
+    }
+
+
+def covariance_from_returns(returns):
+    """Sample covariance of a (dates x instruments) return matrix, skipping rows with gaps"""
+    returns = np.asarray(returns, dtype=float)
+    returns = returns[~np.isnan(returns).any(axis=1)]
+    return np.atleast_2d(np.cov(returns, rowvar=False))
+
+
+def load_return_history(source, instruments, name=None):
+    """Read just the given instrument columns of a .csv/.parquet return file, shape (dates, instruments)
+
+    The header is checked first, so instruments without a column raise KeyError before
+    any rows are parsed.
+    """
+    import pandas as pd
+
+    name = name or getattr(source, 'name', None) or os.fspath(source)
+    is_parquet = str(name).endswith('.parquet')
+    instruments = list(instruments)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    if is_parquet:
+        import pyarrow.parquet as pq
+        available = set(pq.read_schema(source).names)
+    else:
+        available = set(pd.read_csv(source, nrows=0).columns)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+    missing = [instrument for instrument in instruments if instrument not in available]
+    if missing:
+        raise KeyError(f"No return history for: {', '.join(map(str, missing))}")
+
+    if is_parquet:
+        returns = pd.read_parquet(source, columns=instruments)
+    else:
+        returns = pd.read_csv(source, usecols=instruments)
+    return returns[instruments].to_numpy(dtype=float)
+
+
+class CovarianceCache:
+    """LRU cache of covariance matrices keyed by instrument universe and as-of date"""
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, universe, as_of, returns=None, loader=None):
+        """Return (instruments, covariance) for a universe, estimating it on a miss
+
+        On a miss the covariance is estimated from `returns` or from `loader()`, either
+        of which must be a (dates x instruments) matrix in `universe` column order.
+        """
+        key = (tuple(universe), as_of)
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        self.misses += 1
+        if returns is None:
+            if loader is None:
+                raise KeyError(f"No cached covariance for {len(key[0])} instruments as of {as_of}")
+            returns = loader()
+
+        entry = (list(universe), covariance_from_returns(returns))
+        self.entries[key] = entry
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        self.entries.clear()
+
+
+def align_positions(symbols, values, universe):
+    """Scatter position values onto the universe order, shape (instruments,)
+
+    Repeated symbols are summed; symbols outside the universe raise KeyError.
+    """
+    index = {instrument: i for i, instrument in enumerate(universe)}
+    missing = [symbol for symbol in symbols if symbol not in index]
+    if missing:
+        raise KeyError(f"No return history for: {', '.join(map(str, missing))}")
+    positions = np.zeros(len(universe))
+    np.add.at(positions, [index[symbol] for symbol in symbols], np.asarray(values, dtype=float))
+    return positions
+
+
+def parametric_var(position_values, covariance, confidence_level=0.95, time_horizon=1):
+    """Delta-normal VaR with marginal and component breakdown
+
+    `position_values` is (instruments,) or (portfolios, instruments) in currency;
+    `covariance` is the daily return covariance of the same instruments. Component
+    VaR sums to portfolio VaR for every portfolio.
+    """
+    positions = np.atleast_2d(np.asarray(position_values, dtype=float))
+    covariance = np.asarray(covariance, dtype=float)
+    z = NormalDist().inv_cdf(confidence_level) * np.sqrt(time_horizon)
+
+    exposure = positions @ covariance                       # (portfolios, instruments)
+    variance = np.einsum('ij,ij->i', exposure, positions)
+    sigma = np.sqrt(np.maximum(variance, 0))
+
+    var_amount = z * sigma
+    marginal_var = z * np.divide(exposure, sigma[:, None], out=np.zeros_like(exposure), where=sigma[:, None] > 0)
+    component_var = marginal_var * positions
+    contribution = np.divide(component_var, var_amount[:, None], out=np.zeros_like(component_var),
+                             where=var_amount[:, None] > 0)
+
+    return {
+        'portfolio_sigma': sigma,
+        'var_amount': var_amount,
+        'marginal_var': marginal_var,
+        'component_var': component_var,
+        'contribution_pct': contribution * 100
+    }
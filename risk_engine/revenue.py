@@ -0,0 +1,129 @@
+"""
+Broker revenue projection from executed trade records
+
+A month of trades is streamed in chunks from CSV, Parquet or an in-memory table.
+Each chunk is priced with whole-column operations (pip values gathered by instrument
+id from the registry and conversion table) and reduced to partial sums per day,
+instrument and client group; the partials are combined at the end, so memory stays
+bounded by the chunk size and the number of groups rather than the tape length.
+"""
+import os
+
+import numpy as np
+
+from risk_engine.fx import conversion_table
+from risk_engine.instruments import INSTRUMENTS
+
+
+TRADE_COLUMNS = ['Time', 'Instrument', 'Lots']
+REVENUE_GROUPS = ['Day', 'Instrument', 'Client Group']
+REVENUE_COLUMNS = ['Trades', 'Lots', 'Spread Revenue', 'Commission Revenue']
+
+
+def iter_trade_chunks(source, chunk_rows=1000000, columns=None):
+    """Yield DataFrame chunks of trade records from a DataFrame, a .csv/.parquet path or a file
+
+    Files (paths or file-like objects such as uploads) are streamed, never read whole.
+    A file-like object is read as Parquet when its `name` ends in .parquet or .pq,
+    else as CSV.
+    """
+    import pandas as pd
+
+    is_file = hasattr(source, 'read')
+    if is_file or isinstance(source, (str, os.PathLike)):
+        name = str(getattr(source, 'name', '')) if is_file else os.fspath(source)
+        if name.endswith('.parquet') or name.endswith('.pq'):
+            from risk_engine.historical import _parquet_file
+            for batch in _parquet_file(source).iter_batches(batch_size=chunk_rows, columns=columns):
+                yield batch.to_pandas()
+        else:
+            yield from pd.read_csv(source, chunksize=chunk_rows, usecols=columns)
+        return
+
+    if not hasattr(source, 'iloc'):
+        source = pd.DataFrame(source)
+    for start in range(0, len(source), chunk_rows):
+        yield source.iloc[start:start + chunk_rows]
+
+
+def pip_values_per_lot(registry=INSTRUMENTS, account_currency='USD', quotes=None):
+    """Pip value of one lot of every registry instrument in account currency, indexed by id
+
+    Instruments whose quote currency has no conversion path get NaN.
+    """
+    table = conversion_table(quotes)
+    rates = np.full(len(registry), np.nan)
+    for i, quote in enumerate(registry.quote):
+        if quote in table.index and account_currency in table.index:
+            rates[i] = table.rate(quote, account_currency)
+    return registry.pip_size * registry.contract_size * rates
+
+
+def _chunk_revenue(chunk, registry, pip_value, spread_pips, commission_per_lot):
+    """Partial revenue sums for one chunk of trades"""
+    import pandas as pd
+
+    missing = [column for column in TRADE_COLUMNS if column not in chunk.columns]
+    if missing:
+        raise ValueError(f"Trade records need {', '.join(missing)}")
+
+    ids = registry.ids(chunk['Instrument'].to_numpy())
+    unpriced = np.isnan(pip_value[ids])
+    if unpriced.any():
+        symbols = np.unique(registry.symbols[ids[unpriced]].astype(str))
+        raise KeyError(f"No conversion rate for: {', '.join(symbols[:10])}")
+    lots = np.abs(chunk['Lots'].to_numpy(dtype=float))
+    spread = chunk['Spread (pips)'].to_numpy(dtype=float) if 'Spread (pips)' in chunk.columns else spread_pips
+    commission = (chunk['Commission per Lot'].to_numpy(dtype=float)
+                  if 'Commission per Lot' in chunk.columns else commission_per_lot)
+
+    priced = pd.DataFrame({
+        'Day': pd.to_datetime(chunk['Time'].to_numpy()).normalize(),
+        'Instrument': ids,
+        'Client Group': chunk['Client Group'].astype(str).to_numpy() if 'Client Group' in chunk.columns else 'All',
+        'Trades': 1,
+        'Lots': lots,
+        'Spread Revenue': spread * pip_value[ids] * lots,
+        'Commission Revenue': commission * lots
+    })
+    return priced.groupby(REVENUE_GROUPS, sort=False).sum()
+
+
+def project_revenue(source, spread_pips=0.0, commission_per_lot=0.0, registry=INSTRUMENTS,
+                    account_currency='USD', quotes=None, chunk_rows=1000000):
+    """Spread and commission revenue from executed trades by day, instrument and client group
+
+    `source` is a DataFrame, a .csv/.parquet path or a file-like object (streamed in
+    chunks, see iter_trade_chunks) with Time, Instrument and Lots columns, and optional Client Group, Spread (pips) and
+    Commission per Lot columns (the arguments are used where they are absent).
+    """
+    import pandas as pd
+
+    pip_value = pip_values_per_lot(registry, account_currency, quotes)
+    partials = [
+        _chunk_revenue(chunk, registry, pip_value, spread_pips, commission_per_lot)
+        for chunk in iter_trade_chunks(source, chunk_rows)
+    ]
+
+    if partials:
+        daily = pd.concat(partials).groupby(level=REVENUE_GROUPS, sort=True).sum().reset_index()
+    else:
+        daily = pd.DataFrame(columns=REVENUE_GROUPS + REVENUE_COLUMNS)
+    daily['Instrument'] = registry.symbols[daily['Instrument'].to_numpy(dtype=np.int64)]
+    daily['Total Revenue'] = daily['Spread Revenue'] + daily['Commission Revenue']
+
+    def rollup(column):
+        return (daily.groupby(column, sort=False)[REVENUE_COLUMNS + ['Total Revenue']].sum()
+                .sort_values('Total Revenue', ascending=False).reset_index())
+
+    return {
+        'daily': daily,
+        'by_instrument': rollup('Instrument'),
+        'by_client_group': rollup('Client Group'),
+        'by_day': daily.groupby('Day')[REVENUE_COLUMNS + ['Total Revenue']].sum().reset_index(),
+        'num_trades': int(daily['Trades'].sum()),
+        'total_lots': float(daily['Lots'].sum()),
+        'spread_revenue': float(daily['Spread Revenue'].sum()),
+        'commission_revenue': float(daily['Commission Revenue'].sum()),
+        'total_revenue': float(daily['Total Revenue'].sum())
+    }
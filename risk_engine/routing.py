@@ -0,0 +1,233 @@
+"""
+Per-order A-Book/B-Book routing from an in-memory client profile table
+
+Each client's running sums (trades, wins, volume, hold time, P&L, commission) live
+in NumPy columns indexed by a dict from client id to row, and the client's route is
+recomputed only when one of their trades closes. Routing an incoming order is then a
+dict lookup and an array read, which keeps the decision in the low microseconds and
+independent of the size of the client base.
+"""
+import time
+
+import numpy as np
+
+from risk_engine.broker import classify_booking, recommend_booking, is_toxic_flow
+
+
+PROFILE_COLUMNS = ['Client ID', 'Total Trades', 'Win Rate', 'Avg Trade Size', 'Total Volume', 'Client P&L',
+                   'Commission Revenue']
+
+
+class OrderRouter:
+    """Routes orders by client using precomputed, incrementally updated profiles
+
+    A client's route follows recommend_booking on their running profile; a freshly
+    loaded table routes exactly as analyze_booking would. Orders above
+    `max_bbook_lots` always go to the A-Book, and clients without a profile or without
+    trades get `default_route`. A client flagged toxic by tape analytics (a True Toxic
+    Flow column in the loaded table) stays toxic however their aggregates move.
+    """
+
+    def __init__(self, lp_commission_cost=5.0, risk_tolerance="Moderate", max_bbook_lots=np.inf,
+                 default_route="A-Book", capacity=1024):
+        self.lp_commission_cost = lp_commission_cost
+        self.risk_tolerance = risk_tolerance
+        self.max_bbook_lots = max_bbook_lots
+        self.default_route = default_route
+        self.index = {}
+        self.trades = np.zeros(capacity)
+        self.wins = np.zeros(capacity)
+        self.volume = np.zeros(capacity)
+        # Sum of order sizes behind Avg Trade Size, kept apart from Total Volume
+        self.sizes = np.zeros(capacity)
+        self.hold_hours = np.zeros(capacity)
+        self.hold_count = np.zeros(capacity)
+        self.pnl = np.zeros(capacity)
+        self.commission = np.zeros(capacity)
+        self.flagged = np.zeros(capacity, dtype=bool)
+        # Routes as a plain list: indexing it is faster than reading a NumPy element
+        self.routes = []
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, client_id):
+        return client_id in self.index
+
+    def _grow(self, size):
+        capacity = len(self.trades)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity)
+        for name in ('trades', 'wins', 'volume', 'sizes', 'hold_hours', 'hold_count', 'pnl', 'commission',
+                     'flagged'):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def _row(self, client_id):
+        row = self.index.get(client_id)
+        if row is None:
+            row = len(self.index)
+            self._grow(row + 1)
+            self.index[client_id] = row
+            self.routes.append(self.default_route)
+        return row
+
+    def _reroute(self, row):
+        trades = self.trades[row]
+        if not trades:
+            self.routes[row] = self.default_route
+            return
+        avg_hold = self.hold_hours[row] / self.hold_count[row] if self.hold_count[row] else np.nan
+        win_rate = self.wins[row] / trades * 100
+        avg_trade_size = self.sizes[row] / trades
+        toxic = self.flagged[row] or is_toxic_flow(win_rate, avg_trade_size, avg_hold)
+        abook_revenue = self.commission[row] - self.volume[row] * self.lp_commission_cost
+        bbook_revenue = self.commission[row] - self.pnl[row]
+        self.routes[row], _ = recommend_booking(toxic, win_rate, avg_trade_size, abook_revenue, bbook_revenue,
+                                                self.risk_tolerance)
+
+    def load(self, clients):
+        """Load client profiles from a booking table (PROFILE_COLUMNS, optional Avg Hold Time and Toxic Flow)"""
+        missing = [column for column in PROFILE_COLUMNS if column not in clients.columns]
+        if missing:
+            raise ValueError(f"Client profiles need {', '.join(missing)}")
+
+        rows = np.array([self._row(client_id) for client_id in clients['Client ID'].to_numpy()], dtype=np.int64)
+        trades = clients['Total Trades'].to_numpy(dtype=float)
+        self.trades[rows] = trades
+        self.wins[rows] = clients['Win Rate'].to_numpy(dtype=float) * trades / 100
+        self.volume[rows] = clients['Total Volume'].to_numpy(dtype=float)
+        self.sizes[rows] = clients['Avg Trade Size'].to_numpy(dtype=float) * trades
+        self.pnl[rows] = clients['Client P&L'].to_numpy(dtype=float)
+        self.commission[rows] = clients['Commission Revenue'].to_numpy(dtype=float)
+        if 'Avg Hold Time' in clients.columns:
+            hold = clients['Avg Hold Time'].to_numpy(dtype=float)
+            known = ~np.isnan(hold)
+            self.hold_hours[rows] = np.where(known, hold * trades, 0.0)
+            self.hold_count[rows] = np.where(known, trades, 0.0)
+
+        # Initial routes for the whole table in one vectorized pass, read from the table's
+        # own columns as analyze_booking does
+        win_rate = clients['Win Rate'].to_numpy(dtype=float)
+        avg_trade_size = clients['Avg Trade Size'].to_numpy(dtype=float)
+        if 'Toxic Flow' in clients.columns:
+            toxic = clients['Toxic Flow'].to_numpy(dtype=bool)
+            self.flagged[rows] = toxic
+        else:
+            avg_hold = (clients['Avg Hold Time'].to_numpy(dtype=float) if 'Avg Hold Time' in clients.columns
+                        else np.full(len(rows), np.nan))
+            toxic = is_toxic_flow(win_rate, avg_trade_size, avg_hold)
+        routes, _ = classify_booking(
+            toxic, win_rate, avg_trade_size,
+            self.commission[rows] - self.volume[rows] * self.lp_commission_cost,
+            self.commission[rows] - self.pnl[rows], self.risk_tolerance
+        )
+        routes[trades == 0] = self.default_route
+        for row, route in zip(rows.tolist(), routes.tolist()):
+            self.routes[row] = route
+        return self
+
+    def record_close(self, client_id, lots, pnl, hold_hours=None, commission=0.0):
+        """Fold one closed trade into the client's profile and recompute their route"""
+        row = self._row(client_id)
+        self.trades[row] += 1
+        self.wins[row] += pnl > 0
+        self.volume[row] += abs(lots)
+        self.sizes[row] += abs(lots)
+        self.pnl[row] += pnl
+        self.commission[row] += commission
+        if hold_hours is not None:
+            self.hold_hours[row] += hold_hours
+            self.hold_count[row] += 1
+        self._reroute(row)
+        return self.routes[row]
+
+    def route(self, client_id, lots=0.0):
+        """A-Book, B-Book or Hybrid for one incoming order"""
+        if lots > self.max_bbook_lots:
+            return "A-Book"
+        row = self.index.get(client_id)
+        return self.default_route if row is None else self.routes[row]
+
+    def profiles(self):
+        """Current profile and route of every client as a table"""
+        import pandas as pd
+
+        count = len(self.index)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return pd.DataFrame({
+                'Client ID': list(self.index),
+                'Total Trades': self.trades[:count],
+                'Win Rate': self.wins[:count] / self.trades[:count] * 100,
+                'Avg Trade Size': self.sizes[:count] / self.trades[:count],
+                'Avg Hold Time': self.hold_hours[:count] / self.hold_count[:count],
+                'Total Volume': self.volume[:count],
+                'Client P&L': self.pnl[:count],
+                'Commission Revenue': self.commission[:count],
+                'Route': self.routes
+            })
+
+
+def benchmark_router(router=None, num_clients=100000, num_orders=200000, close_share=0.1, seed=0):
+    """Per-call latency of OrderRouter.route and record_close in microseconds
+
+    Builds a random client base when no router is given, then replays a random
+    stream of orders with `close_share` of events being trade closes. Returns
+    p50/p99/p99.9/max latency per call type and the order throughput.
+    """
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    if router is None:
+        trades = rng.integers(1, 500, num_clients)
+        router = OrderRouter().load(pd.DataFrame({
+            'Client ID': np.arange(num_clients),
+            'Total Trades': trades,
+            'Win Rate': rng.uniform(20, 80, num_clients),
+            'Avg Trade Size': rng.uniform(0.1, 8, num_clients),
+            'Avg Hold Time': rng.exponential(24, num_clients),
+            'Total Volume': trades * rng.uniform(0.1, 8, num_clients),
+            'Client P&L': rng.normal(0, 2000, num_clients),
+            'Commission Revenue': trades * rng.uniform(1, 20, num_clients)
+        }))
+
+    clients = list(router.index)
+    picks = rng.integers(0, len(clients), num_orders).tolist()
+    lots = rng.uniform(0.01, 10, num_orders).tolist()
+    closes = (rng.random(num_orders) < close_share).tolist()
+    pnls = rng.normal(0, 100, num_orders).tolist()
+
+    route_ns, close_ns = [], []
+    clock = time.perf_counter_ns
+    for pick, size, close, pnl in zip(picks, lots, closes, pnls):
+        client = clients[pick]
+        if close:
+            start = clock()
+            router.record_close(client, size, pnl, hold_hours=1.0, commission=size * 7)
+            close_ns.append(clock() - start)
+        else:
+            start = clock()
+            router.route(client, size)
+            route_ns.append(clock() - start)
+
+    def percentiles(samples):
+        if not samples:
+            return {}
+        micros = np.asarray(samples) / 1000
+        return {
+            'calls': len(micros),
+            'p50_us': float(np.percentile(micros, 50)),
+            'p99_us': float(np.percentile(micros, 99)),
+            'p999_us': float(np.percentile(micros, 99.9)),
+            'max_us': float(micros.max())
+        }
+
+    return {
+        'clients': len(router),
+        'route': percentiles(route_ns),
+        'record_close': percentiles(close_ns),
+        'orders_per_second': float(len(route_ns) / (np.sum(route_ns) / 1e9)) if route_ns else 0.0
+    }
@@ -0,0 +1,150 @@
+"""
+Stop-out liquidation simulator over price-shock scenarios
+
+Each account's book is reduced to a signed notional and a margin figure per
+instrument (accounts x instruments). A price shock s moves an account's equity by
+notional x s (x entry / price / (1 + s) for instruments whose base is the account
+currency) and scales its margin by 1 + s, so every scenario for a block of accounts is two matrix
+products against the scenario matrix. Accounts are processed in chunks to cap the
+size of the (accounts x scenarios) block, and each block is reduced straight to
+per-scenario counts and losses.
+"""
+import numpy as np
+
+from risk_engine.exposure import signed_lots
+from risk_engine.instruments import INSTRUMENTS
+from risk_engine.margin import quote_rates, base_value, account_margin
+
+
+# One-instrument gaps from -10% to +10% in 0.5% steps (skipping moves under 1%)
+DEFAULT_SHOCKS = np.concatenate([np.arange(-10, -0.99, 0.5), np.arange(1, 10.01, 0.5)]) / 100
+
+
+def shock_scenarios(instruments, shocks=DEFAULT_SHOCKS):
+    """Scenario table moving one instrument at a time by each relative shock"""
+    import pandas as pd
+
+    instruments = list(instruments)
+    return pd.DataFrame({
+        'Instrument': np.repeat(np.asarray(instruments, dtype=object), len(shocks)),
+        'Shock': np.tile(np.asarray(shocks, dtype=float), len(instruments))
+    })
+
+
+def _scenario_matrices(scenarios, registry, is_base):
+    """(instruments x scenarios) equity and margin multipliers for a scenario table
+
+    `scenarios` is a shock_scenarios table, or a wide table with one column of
+    relative moves per instrument (joint moves, one row per scenario).
+    """
+    if 'Shock' in scenarios.columns and 'Instrument' in scenarios.columns:
+        moves = np.zeros((len(registry), len(scenarios)))
+        moves[registry.ids(scenarios['Instrument'].to_numpy()), np.arange(len(scenarios))] = \
+            scenarios['Shock'].to_numpy(dtype=float)
+    else:
+        moves = np.zeros((len(registry), len(scenarios)))
+        for symbol in scenarios.columns:
+            moves[registry.id(symbol)] = scenarios[symbol].to_numpy(dtype=float)
+
+    # Base-currency-is-account instruments gain units x s / (1 + s) and keep their notional
+    base = is_base[:, None]
+    equity_move = np.where(base, moves / (1 + moves), moves)
+    margin_scale = np.where(base, 1.0, 1 + moves)
+    return equity_move, margin_scale
+
+
+def simulate_stop_outs(positions, accounts=None, scenarios=None, hedged_margin_ratio=0.5, volume_tiers=None,
+                       margin_call_level=100, stop_out_level=50, chunk_accounts=10000, account_currency='USD',
+                       registry=INSTRUMENTS, quotes=None):
+    """Margin calls, stop-outs and broker loss for every account under every price shock
+
+    `positions` and `accounts` are as for account_margin. `scenarios` defaults to
+    shock_scenarios over every instrument held, each gapping by DEFAULT_SHOCKS.
+    Stopped-out accounts are liquidated at the shocked price; equity below zero is
+    the broker's loss under negative balance protection. Only the shocked prices
+    move: conversion rates stay at the `quotes` snapshot, and volume-tier bands are
+    those of the current notional.
+    """
+    import pandas as pd
+
+    margin = account_margin(positions, accounts, hedged_margin_ratio, volume_tiers, margin_call_level,
+                            stop_out_level, account_currency, registry, quotes)
+    by_account = margin['accounts']
+    equity = by_account['Equity'].to_numpy(dtype=float)
+    clients = pd.Index(by_account['Client ID'])
+    num_accounts, num_instruments = len(clients), len(registry)
+
+    # Signed notional and margin per (account, instrument), as flat account-major arrays
+    ids = registry.ids(positions['Instrument'].to_numpy())
+    client = clients.get_indexer(positions['Client ID'].to_numpy())
+    lots = signed_lots(positions)
+    entry = positions['Entry'].to_numpy(dtype=float)
+    current = positions['Current'].to_numpy(dtype=float)
+    _, is_base = quote_rates(registry, account_currency, quotes)
+    # P&L of base-is-account positions is units x (1 - entry / price), so it moves with entry / current
+    notional = (lots * registry.contract_size[ids] * base_value(ids, current, registry, account_currency, quotes)
+                * np.where(is_base[ids], entry / current, 1.0))
+    cell = client.astype(np.int64) * num_instruments + ids
+    groups = margin['by_instrument']
+    margin_cell = (clients.get_indexer(groups['Client ID'].to_numpy()).astype(np.int64) * num_instruments
+                   + registry.ids(groups['Instrument'].to_numpy()))
+    margin_by_cell = groups['Margin'].to_numpy(dtype=float)
+
+    # Sort cells once so each account chunk is a contiguous slice
+    order = np.argsort(cell, kind='stable')
+    cell, notional = cell[order], notional[order]
+    order = np.argsort(margin_cell, kind='stable')
+    margin_cell, margin_by_cell = margin_cell[order], margin_by_cell[order]
+
+    if scenarios is None:
+        scenarios = shock_scenarios(pd.unique(registry.symbols[ids]))
+    equity_move, margin_scale = _scenario_matrices(scenarios, registry, is_base)
+    num_scenarios = equity_move.shape[1]
+
+    margin_calls = np.zeros(num_scenarios, dtype=np.int64)
+    stop_outs = np.zeros(num_scenarios, dtype=np.int64)
+    negative = np.zeros(num_scenarios, dtype=np.int64)
+    equity_lost = np.zeros(num_scenarios)
+    broker_loss = np.zeros(num_scenarios)
+
+    for start in range(0, num_accounts, chunk_accounts):
+        stop = min(start + chunk_accounts, num_accounts)
+        size = (stop - start) * num_instruments
+        lo, hi = start * num_instruments, stop * num_instruments
+
+        first, last = np.searchsorted(cell, [lo, hi])
+        exposure = np.bincount(cell[first:last] - lo, weights=notional[first:last], minlength=size)
+        first, last = np.searchsorted(margin_cell, [lo, hi])
+        base_margin = np.bincount(margin_cell[first:last] - lo, weights=margin_by_cell[first:last], minlength=size)
+
+        # (accounts x scenarios) equity and margin after each shock
+        shocked_equity = equity[start:stop, None] + exposure.reshape(-1, num_instruments) @ equity_move
+        shocked_margin = base_margin.reshape(-1, num_instruments) @ margin_scale
+        with np.errstate(divide='ignore', invalid='ignore'):
+            level = np.where(shocked_margin > 0, shocked_equity / shocked_margin * 100, np.inf)
+
+        stopped = level <= stop_out_level
+        margin_calls += (level <= margin_call_level).sum(axis=0)
+        stop_outs += stopped.sum(axis=0)
+        negative += (shocked_equity < 0).sum(axis=0)
+        lost = np.maximum(equity[start:stop, None] - np.maximum(shocked_equity, 0), 0)
+        equity_lost += np.where(stopped, lost, 0).sum(axis=0)
+        broker_loss += np.maximum(-shocked_equity, 0).sum(axis=0)
+
+    results = scenarios.reset_index(drop=True).copy()
+    results['Margin Call'] = margin_calls
+    results['Stop Out'] = stop_outs
+    results['Negative Equity'] = negative
+    results['Client Equity Lost'] = equity_lost
+    results['Broker Loss'] = broker_loss
+
+    worst = int(np.argmax(broker_loss)) if num_scenarios else None
+    return {
+        'scenarios': results,
+        'num_accounts': num_accounts,
+        'num_scenarios': num_scenarios,
+        'accounts_margin_call_now': margin['accounts_margin_call'],
+        'accounts_stop_out_now': margin['accounts_stop_out'],
+        'max_broker_loss': float(broker_loss.max()) if num_scenarios else 0.0,
+        'worst_scenario': results.iloc[worst].to_dict() if worst is not None else None
+    }
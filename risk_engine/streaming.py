@@ -0,0 +1,192 @@
+"""
+Incremental estimators for tick-by-tick return feeds
+
+RollingSharpe keeps a Welford running mean/variance over a fixed window, so each
+update is O(1) instead of the two full passes calculate_sharpe_ratio makes.
+
+QuantileSketch is a log-bucketed quantile sketch (DDSketch-style): every bucket spans
+values within a factor gamma = (1 + a) / (1 - a) of each other, so any quantile it
+returns is within relative accuracy `a` of the true order statistic at that rank.
+Memory is one counter per occupied bucket, at most
+log(max_abs_return / min_value) / log(gamma) buckets per sign - about 1,050 per sign
+for a = 1% and returns between 1e-9 and 100%.
+"""
+import math
+
+import numpy as np
+
+
+class RollingSharpe:
+    """Annualized Sharpe ratio over the last `window` returns with O(1) updates
+
+    Matches calculate_sharpe_ratio on the same window (population std, 252 periods
+    per year). With window=None the estimate covers every return seen so far.
+    """
+
+    def __init__(self, window=252, risk_free_rate=0.02):
+        self.window = window
+        self.risk_free_rate = risk_free_rate
+        self.buffer = np.zeros(window) if window else None
+        self.count = 0
+        self.position = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, daily_return):
+        """Add one return (evicting the oldest once the window is full)"""
+        x = daily_return - (self.risk_free_rate / 252)
+
+        if self.window is None or self.count < self.window:
+            self.count += 1
+            delta = x - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (x - self.mean)
+        else:
+            old = self.buffer[self.position]
+            old_mean = self.mean
+            self.mean += (x - old) / self.count
+            self.m2 += (x - old) * (x - self.mean + old - old_mean)
+            self.m2 = max(self.m2, 0.0)
+
+        if self.window:
+            self.buffer[self.position] = x
+            self.position = (self.position + 1) % self.window
+
+        return self.value
+
+    def update_many(self, returns):
+        """Feed a batch of returns in order and return the latest Sharpe ratio"""
+        for daily_return in np.asarray(returns, dtype=float):
+            self.update(daily_return)
+        return self.value
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / self.count) if self.count else 0.0
+
+    @property
+    def value(self):
+        std = self.std
+        if self.count == 0 or std == 0:
+            return 0
+        return np.sqrt(252) * self.mean / std
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with relative-accuracy guarantee on returned values
+
+    Values with |x| <= min_value are counted as zero; NaNs are skipped.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-9):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+
+    @property
+    def num_buckets(self):
+        return len(self.positive) + len(self.negative)
+
+    def _key(self, magnitude):
+        return int(math.ceil(math.log(magnitude) / self.log_gamma))
+
+    def _bucket_value(self, key):
+        # Midpoint (in relative terms) of (gamma^(key-1), gamma^key]
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value):
+        """Add one observation (NaN is ignored, as in add_many)"""
+        if value != value:
+            return
+        if value > self.min_value:
+            key = self._key(value)
+            self.positive[key] = self.positive.get(key, 0) + 1
+        elif value < -self.min_value:
+            key = self._key(-value)
+            self.negative[key] = self.negative.get(key, 0) + 1
+        else:
+            self.zero_count += 1
+        self.count += 1
+
+    def add_many(self, values):
+        """Add an array of observations with vectorized bucketing"""
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+
+        for store, magnitudes in ((self.positive, values[values > self.min_value]),
+                                  (self.negative, -values[values < -self.min_value])):
+            if len(magnitudes) == 0:
+                continue
+            keys, counts = np.unique(np.ceil(np.log(magnitudes) / self.log_gamma).astype(np.int64),
+                                     return_counts=True)
+            for key, n in zip(keys.tolist(), counts.tolist()):
+                store[key] = store.get(key, 0) + n
+
+        self.zero_count += int((np.abs(values) <= self.min_value).sum())
+        self.count += len(values)
+
+    def merge(self, other):
+        """Fold another sketch with the same accuracy into this one"""
+        if other.gamma != self.gamma or other.min_value != self.min_value:
+            raise ValueError("Cannot merge sketches with different accuracy settings")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, n in other_store.items():
+                store[key] = store.get(key, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        """Approximate q-quantile (0 <= q <= 1) of every value seen so far"""
+        if self.count == 0:
+            return 0
+        rank = q * (self.count - 1)
+
+        # Most negative values first: larger magnitude keys come first
+        cumulative = 0
+        for key in sorted(self.negative, reverse=True):
+            cumulative += self.negative[key]
+            if cumulative > rank:
+                return -self._bucket_value(key)
+
+        cumulative += self.zero_count
+        if cumulative > rank:
+            return 0.0
+
+        for key in sorted(self.positive):
+            cumulative += self.positive[key]
+            if cumulative > rank:
+                return self._bucket_value(key)
+
+        return self._bucket_value(max(self.positive)) if self.positive else 0.0
+
+
+class StreamingVaR:
+    """Streaming Value at Risk over every return seen, using a QuantileSketch
+
+    Follows calculate_var's convention: the (1 - confidence) lower percentile of
+    returns, accurate to within `relative_accuracy` of the true value.
+    """
+
+    def __init__(self, confidence_level=0.95, relative_accuracy=0.01, min_value=1e-9):
+        self.confidence_level = confidence_level
+        self.sketch = QuantileSketch(relative_accuracy, min_value)
+
+    def update(self, daily_return):
+        self.sketch.add(daily_return)
+        return self.value
+
+    def update_many(self, returns):
+        self.sketch.add_many(returns)
+        return self.value
+
+    @property
+    def value(self):
+        return self.sketch.quantile(1 - self.confidence_level)
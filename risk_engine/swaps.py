@@ -0,0 +1,240 @@
+"""
+Rollover calendar and swap accruals
+
+A position held over the 5pm New York rollover on trade date d is charged for the
+calendar days between the spot value date of d and the spot value date of the next
+trade date. With T+2 settlement that is 3 days on Wednesday (value date jumps Friday
+-> Monday) and extra days around holidays; with T+1 (e.g. USD/CAD) the triple day is
+Thursday. Instruments that roll on a fixed weekday instead (CFDs, metals) can pass
+`triple_swap_weekday`.
+
+Calendars are precomputed once per year into day-indexed multiplier and cumulative
+arrays, so swap days for any number of holding periods are two array lookups.
+"""
+import numpy as np
+
+from risk_engine.cache import memoize
+from risk_engine.exposure import direction_is_long
+from risk_engine.instruments import INSTRUMENTS
+from risk_engine.revenue import pip_values_per_lot
+
+
+ROLLOVER_WEEKMASK = '1111100'
+
+def settlement_days_for(symbol):
+    """Spot settlement lag in business days from the instrument registry (default T+2)"""
+    if symbol in INSTRUMENTS:
+        return int(INSTRUMENTS.settlement_days[INSTRUMENTS.id(symbol)])
+    return 2
+
+
+def triple_swap_weekday_for(symbol):
+    """Fixed triple-swap weekday for CFD-style instruments, None when value dates decide"""
+    if symbol in INSTRUMENTS:
+        weekday = int(INSTRUMENTS.triple_swap_weekday[INSTRUMENTS.id(symbol)])
+        return weekday if weekday >= 0 else None
+    return None
+
+
+def _to_dates(values):
+    return np.asarray(values, dtype='datetime64[D]')
+
+
+class RolloverCalendar:
+    """Swap-day multipliers for every calendar day in [start, end)
+
+    `multiplier[i]` is the number of swap days charged for holding over the rollover
+    on day start + i (0 on weekends and holidays); `cumulative[i]` is the total
+    charged on days before start + i.
+    """
+
+    def __init__(self, start, end, holidays=(), settlement_days=2, triple_swap_weekday=None):
+        self.start = np.datetime64(start, 'D')
+        self.end = np.datetime64(end, 'D')
+        self.holidays = np.unique(_to_dates(list(holidays)))
+        self.settlement_days = settlement_days
+        self.triple_swap_weekday = triple_swap_weekday
+
+        self.dates = np.arange(self.start, self.end, dtype='datetime64[D]')
+        is_trade_day = np.is_busday(self.dates, weekmask=ROLLOVER_WEEKMASK, holidays=self.holidays)
+
+        if triple_swap_weekday is None:
+            # Days between this trade date's value date and the next trade date's value date
+            next_trade = np.busday_offset(self.dates, 1, roll='backward',
+                                          weekmask=ROLLOVER_WEEKMASK, holidays=self.holidays)
+            value_date = np.busday_offset(self.dates, settlement_days, roll='backward',
+                                          weekmask=ROLLOVER_WEEKMASK, holidays=self.holidays)
+            next_value_date = np.busday_offset(next_trade, settlement_days, roll='forward',
+                                               weekmask=ROLLOVER_WEEKMASK, holidays=self.holidays)
+            days = (next_value_date - value_date).astype(np.int64)
+        else:
+            weekday = (self.dates.astype(np.int64) - 4) % 7   # 1970-01-01 was a Thursday
+            days = np.where(weekday == triple_swap_weekday, 3, 1)
+
+        self.multiplier = np.where(is_trade_day, days, 0).astype(np.int64)
+        self.cumulative = np.concatenate([[0], np.cumsum(self.multiplier)])
+
+    def _index(self, dates):
+        offsets = (_to_dates(dates) - self.start).astype(np.int64)
+        if np.any((offsets < 0) | (offsets > len(self.dates))):
+            raise ValueError(f"Dates fall outside the calendar range {self.start} to {self.end}")
+        return offsets
+
+    def swap_days(self, open_dates, close_dates):
+        """Swap days charged for positions opened on open_dates and closed on close_dates
+
+        Rollovers on days d with open <= d < close are charged; works on arrays.
+        """
+        return self.cumulative[self._index(close_dates)] - self.cumulative[self._index(open_dates)]
+
+    def schedule(self, open_date, days_held):
+        """Dates, per-day multipliers and cumulative swap days for one holding period"""
+        first = self._index(open_date)
+        last = first + days_held
+        if last > len(self.dates):
+            raise ValueError(f"Holding period runs past the calendar end {self.end}")
+        multiplier = self.multiplier[first:last]
+        return self.dates[first:last], multiplier, np.cumsum(multiplier)
+
+    def accruals(self, open_date, days_held, daily_swap):
+        """Per-day and cumulative swap amounts for one holding period"""
+        dates, multiplier, cumulative = self.schedule(open_date, days_held)
+        return {
+            'dates': dates,
+            'swap_days': multiplier,
+            'daily_charge': multiplier * daily_swap,
+            'cumulative_charge': cumulative * daily_swap
+        }
+
+    @property
+    def triple_swap_days(self):
+        """Trade dates charged three or more swap days"""
+        return self.dates[self.multiplier >= 3]
+
+
+@memoize(max_entries=64)
+def rollover_calendar(year, holidays=(), settlement_days=2, triple_swap_weekday=None, years=1):
+    """Cached RolloverCalendar covering `years` calendar years from January 1 of `year`"""
+    return RolloverCalendar(
+        np.datetime64(f'{year}-01-01'), np.datetime64(f'{year + years}-01-01'),
+        holidays=tuple(holidays), settlement_days=settlement_days,
+        triple_swap_weekday=triple_swap_weekday
+    )
+
+
+def calendar_for_period(open_date, days, holidays=(), settlement_days=2, triple_swap_weekday=None):
+    """Cached calendar covering the whole years spanned by `days` calendar days from open_date"""
+    open_date = np.datetime64(open_date, 'D')
+    first_year = int(open_date.astype('datetime64[Y]').astype(np.int64)) + 1970
+    last_year = int((open_date + days).astype('datetime64[Y]').astype(np.int64)) + 1970
+    return rollover_calendar(first_year, tuple(holidays), settlement_days, triple_swap_weekday,
+                             years=last_year - first_year + 1)
+
+
+SWAP_RATE_COLUMNS = ['Long Swap', 'Short Swap', 'Markup (%)']
+
+
+def _is_long(positions):
+    """Boolean long/short flags from a Direction column, else from the sign of Lots"""
+    if 'Direction' in positions.columns:
+        return direction_is_long(positions['Direction'])
+    return positions['Lots'].to_numpy(dtype=float) >= 0
+
+
+def settle_swaps(positions, swap_rates, trade_date, holidays=(), default_contract_size=100000,
+                 account_currency='USD', registry=INSTRUMENTS, fx_quotes=None):
+    """Night's swap charges and broker markup revenue for a whole book in one pass
+
+    `positions` has Instrument and Lots columns, plus optional Direction (Long/Short,
+    Buy/Sell; otherwise the sign of Lots) and Contract Size. `swap_rates` is indexed
+    by instrument with Long Swap and Short Swap (pips), Markup (%) and an optional Pip
+    Value (account currency per pip per lot). Contract size and pip value per lot
+    come from the registry unless those columns override them; instruments outside
+    the registry use `default_contract_size` at $10 per pip per 100k. Swap days for
+    the night come from each instrument's rollover calendar.
+
+    Returns the positions with Swap Days, Swap Rate, Swap Charge and Broker Revenue
+    columns, a per-instrument summary and book totals.
+    """
+    import pandas as pd
+
+    missing = [column for column in SWAP_RATE_COLUMNS if column not in swap_rates.columns]
+    if missing:
+        raise ValueError(f"Swap rate table needs {', '.join(missing)}")
+
+    instruments = pd.Index(swap_rates.index.astype(str))
+    codes = instruments.get_indexer(positions['Instrument'].astype(str))
+    if (codes < 0).any():
+        unknown = pd.unique(positions['Instrument'].astype(str).to_numpy()[codes < 0])
+        raise KeyError(f"No swap rates for: {', '.join(unknown[:10])}")
+
+    # Per-instrument arrays, gathered onto positions by integer code
+    trade_date = np.datetime64(trade_date, 'D')
+    night_days = np.array([
+        calendar_for_period(trade_date, 1, holidays, settlement_days_for(instrument),
+                            triple_swap_weekday_for(instrument)).swap_days(trade_date, trade_date + 1)
+        for instrument in instruments
+    ], dtype=np.int64)
+    markup = 1 + swap_rates['Markup (%)'].to_numpy(dtype=float) / 100
+
+    # Registry contract size and pip value per lot, explicit columns overriding them
+    ids = np.array([registry.id(instrument) if instrument in registry else -1 for instrument in instruments],
+                   dtype=np.int64)
+    known = ids >= 0
+    lot_contract = np.where(known, registry.contract_size[ids], default_contract_size).astype(float)
+    pip_value_per_lot = np.where(known, pip_values_per_lot(registry, account_currency, fx_quotes)[ids],
+                                 10.0 * default_contract_size / 100000)
+    if 'Pip Value' in swap_rates.columns:
+        explicit = swap_rates['Pip Value'].to_numpy(dtype=float)
+        pip_value_per_lot = np.where(np.isnan(explicit), pip_value_per_lot, explicit)
+    unpriced = np.isnan(pip_value_per_lot[codes])
+    if unpriced.any():
+        symbols = pd.unique(instruments.to_numpy()[codes[unpriced]])
+        raise KeyError(f"No conversion rate for: {', '.join(symbols[:10])}")
+
+    is_long = _is_long(positions)
+    lots = np.abs(positions['Lots'].to_numpy(dtype=float))
+    contract_size = lot_contract[codes]
+    if 'Contract Size' in positions.columns:
+        explicit = positions['Contract Size'].to_numpy(dtype=float)
+        contract_size = np.where(np.isnan(explicit), contract_size, explicit)
+
+    base_rate = np.where(is_long, swap_rates['Long Swap'].to_numpy(dtype=float)[codes],
+                         swap_rates['Short Swap'].to_numpy(dtype=float)[codes])
+    swap_rate = base_rate * markup[codes]
+    pip_value = pip_value_per_lot[codes] * (contract_size / lot_contract[codes]) * lots
+    swap_days = night_days[codes]
+
+    base_charge = base_rate * pip_value * swap_days
+    swap_charge = swap_rate * pip_value * swap_days
+    broker_revenue = swap_charge - base_charge
+
+    settled = positions.copy()
+    settled['Swap Days'] = swap_days
+    settled['Swap Rate'] = swap_rate
+    settled['Swap Charge'] = swap_charge
+    settled['Broker Revenue'] = broker_revenue
+
+    # Per-instrument rollup with bincount over the instrument codes
+    count = len(instruments)
+    by_instrument = pd.DataFrame({
+        'Instrument': instruments,
+        'Positions': np.bincount(codes, minlength=count),
+        'Long Lots': np.bincount(codes, weights=np.where(is_long, lots, 0), minlength=count),
+        'Short Lots': np.bincount(codes, weights=np.where(is_long, 0, lots), minlength=count),
+        'Swap Days': night_days,
+        'Swap Charge': np.bincount(codes, weights=swap_charge, minlength=count),
+        'Broker Revenue': np.bincount(codes, weights=broker_revenue, minlength=count)
+    })
+    by_instrument = by_instrument[by_instrument['Positions'] > 0].reset_index(drop=True)
+
+    return {
+        'trade_date': trade_date,
+        'positions': settled,
+        'by_instrument': by_instrument,
+        'num_positions': len(settled),
+        'total_swap_charge': float(swap_charge.sum()),
+        'client_credits': float(swap_charge[swap_charge > 0].sum()),
+        'client_debits': float(swap_charge[swap_charge < 0].sum()),
+        'broker_revenue': float(broker_revenue.sum())
+    }
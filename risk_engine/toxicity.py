@@ -0,0 +1,213 @@
+"""
+Toxic-flow analytics from raw trade and quote tapes
+
+The quote tape is sorted once by (instrument id, time) so every instrument's quotes
+are one contiguous, time-ordered slice. Fills are then matched to the prevailing
+quote at fill time and at each markout horizon with np.searchsorted on those slices
+(an as-of join per instrument, not per trade). The trade tape is streamed in chunks
+and reduced to per-client partial sums, so a day of tens of millions of fills runs
+in bounded memory. The resulting client table carries the columns analyze_booking
+reads, with Toxic Flow derived from markouts and latency-arbitrage signatures.
+"""
+import numpy as np
+
+from risk_engine.broker import is_toxic_flow
+from risk_engine.exposure import signed_lots
+from risk_engine.instruments import INSTRUMENTS
+from risk_engine.revenue import iter_trade_chunks, pip_values_per_lot
+
+
+FILL_COLUMNS = ['Time', 'Client ID', 'Instrument', 'Direction', 'Lots', 'Price']
+QUOTE_COLUMNS = ['Time', 'Instrument', 'Bid', 'Ask']
+DEFAULT_MARKOUT_HORIZONS = (1, 5, 60)
+
+# Hold-time distribution buckets (upper bounds in seconds)
+HOLD_BUCKETS = (60, 300, 3600, 86400)
+HOLD_LABELS = ('Hold < 1m', 'Hold 1-5m', 'Hold 5-60m', 'Hold 1-24h', 'Hold > 24h')
+
+
+def _nanoseconds(times):
+    """Timestamps (datetime-like or strings) as int64 nanoseconds"""
+    import pandas as pd
+    return pd.to_datetime(np.asarray(times)).to_numpy().astype('datetime64[ns]').view(np.int64)
+
+
+class QuoteTape:
+    """Bid/ask quotes sorted by (instrument id, time) for as-of lookups
+
+    Quotes for instrument i are rows bounds[i]:bounds[i + 1], in time order.
+    """
+
+    def __init__(self, quotes, registry=INSTRUMENTS, chunk_rows=1000000):
+        # Files are streamed; only the numeric id, time, bid and ask columns are kept
+        chunks = [quotes] if hasattr(quotes, 'columns') else iter_trade_chunks(quotes, chunk_rows, QUOTE_COLUMNS)
+        empty = np.zeros(0, dtype=np.int64)
+        parts = {'ids': [empty], 'times': [empty], 'bid': [np.zeros(0)], 'ask': [np.zeros(0)]}
+        for chunk in chunks:
+            missing = [column for column in QUOTE_COLUMNS if column not in chunk.columns]
+            if missing:
+                raise ValueError(f"Quote tape needs {', '.join(missing)}")
+            parts['ids'].append(registry.ids(chunk['Instrument'].to_numpy()))
+            parts['times'].append(_nanoseconds(chunk['Time']))
+            parts['bid'].append(chunk['Bid'].to_numpy(dtype=float))
+            parts['ask'].append(chunk['Ask'].to_numpy(dtype=float))
+
+        ids, times = np.concatenate(parts['ids']), np.concatenate(parts['times'])
+        order = np.lexsort((times, ids))
+
+        self.registry = registry
+        self.times = times[order]
+        bid = np.concatenate(parts['bid'])[order]
+        ask = np.concatenate(parts['ask'])[order]
+        self.mid = (bid + ask) / 2
+        self.spread = ask - bid
+        self.bounds = np.concatenate([[0], np.cumsum(np.bincount(ids, minlength=len(registry)))])
+
+    def __len__(self):
+        return len(self.times)
+
+    def asof(self, ids, times):
+        """Row of the last quote at or before each time in each instrument, -1 where none"""
+        rows = np.full(len(ids), -1, dtype=np.int64)
+        order = np.argsort(ids, kind='stable')
+        groups, starts = np.unique(ids[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        for instrument, start, end in zip(groups, starts, ends):
+            lo, hi = self.bounds[instrument], self.bounds[instrument + 1]
+            if lo == hi:
+                continue
+            members = order[start:end]
+            position = np.searchsorted(self.times[lo:hi], times[members], side='right') - 1
+            rows[members] = np.where(position >= 0, lo + position, -1)
+        return rows
+
+
+def _chunk_features(chunk, quotes, registry, pip_value, horizons, commission_per_lot):
+    """Per-client partial sums of trade and markout features for one chunk of fills"""
+    import pandas as pd
+
+    missing = [column for column in FILL_COLUMNS if column not in chunk.columns]
+    if missing:
+        raise ValueError(f"Trade tape needs {', '.join(missing)}")
+
+    ids = registry.ids(chunk['Instrument'].to_numpy())
+    unpriced = np.isnan(pip_value[ids])
+    if unpriced.any():
+        symbols = np.unique(registry.symbols[ids[unpriced]].astype(str))
+        raise KeyError(f"No conversion rate for: {', '.join(symbols[:10])}")
+    times = _nanoseconds(chunk['Time'])
+
+    # Fills in (instrument, time) order so every as-of search walks its quote slice forwards
+    order = np.lexsort((times, ids))
+    ids, times = ids[order], times[order]
+    side = np.sign(signed_lots(chunk))[order]
+    lots = np.abs(chunk['Lots'].to_numpy(dtype=float))[order]
+    price = chunk['Price'].to_numpy(dtype=float)[order]
+    pip_size = registry.pip_size[ids]
+
+    features = {'Client ID': chunk['Client ID'].to_numpy()[order], 'Total Trades': 1, 'Total Volume': lots}
+
+    # Quoted spread at fill time
+    at_fill = quotes.asof(ids, times)
+    has_quote = at_fill >= 0
+    spread_pips = np.where(has_quote, quotes.spread[at_fill] / pip_size, np.nan)
+
+    # Markouts: client gain in pips against the mid at each horizon after the fill
+    markout_pips = {}
+    for horizon in horizons:
+        rows = quotes.asof(ids, times + int(horizon * 1e9))
+        pips = np.where(rows >= 0, (quotes.mid[rows] - price) * side / pip_size, np.nan)
+        markout_pips[horizon] = pips
+        valid = ~np.isnan(pips)
+        features[f'_markout_{horizon}_count'] = valid.astype(float)
+        features[f'_markout_{horizon}_pips'] = np.where(valid, pips, 0.0)
+        features[f'_markout_{horizon}_pnl'] = np.where(valid, pips * pip_value[ids] * lots, 0.0)
+
+    # Latency arbitrage: the mid moves past the full quoted spread in the client's favour
+    # within the shortest horizon
+    fastest = markout_pips[min(horizons)]
+    features['_arb_count'] = (fastest > spread_pips).astype(float)
+    features['_arb_eligible'] = (~np.isnan(fastest) & has_quote).astype(float)
+
+    # Realized outcome when the tape carries it, else the longest markout as a proxy
+    longest = markout_pips[max(horizons)]
+    if 'P&L' in chunk.columns:
+        pnl = chunk['P&L'].to_numpy(dtype=float)[order]
+    else:
+        pnl = np.where(np.isnan(longest), 0.0, longest * pip_value[ids] * lots)
+    features['Client P&L'] = pnl
+    features['_wins'] = (pnl > 0).astype(float)
+    features['Commission Revenue'] = (chunk['Commission'].to_numpy(dtype=float)[order]
+                                      if 'Commission' in chunk.columns else commission_per_lot * lots)
+
+    # Hold-time distribution when fills carry their close time
+    if 'Close Time' in chunk.columns:
+        hold = (_nanoseconds(chunk['Close Time'])[order] - times) / 1e9
+        closed = hold >= 0
+        bucket = np.searchsorted(HOLD_BUCKETS, hold, side='right')
+        features['_hold_seconds'] = np.where(closed, hold, 0.0)
+        features['_hold_count'] = closed.astype(float)
+        for i, label in enumerate(HOLD_LABELS):
+            features[label] = (closed & (bucket == i)).astype(float)
+
+    return pd.DataFrame(features).groupby('Client ID', sort=False).sum()
+
+
+def toxicity_features(trades, quotes, horizons=DEFAULT_MARKOUT_HORIZONS, commission_per_lot=0.0,
+                      toxic_markout_pips=0.5, latency_arb_share=0.2, registry=INSTRUMENTS,
+                      account_currency='USD', fx_quotes=None, chunk_rows=1000000):
+    """Per-client toxicity features and booking inputs from trade and quote tapes
+
+    `trades` (DataFrame, .csv/.parquet path or file) has FILL_COLUMNS and optionally
+    Close Time, P&L and Commission; `quotes` (DataFrame, path, file or QuoteTape) has
+    QUOTE_COLUMNS; files are streamed in `chunk_rows` chunks. Horizons are in
+    seconds. Without a P&L column, wins and Client P&L use the longest markout. A
+    client is Toxic Flow when the static aggregate rule fires, its average markout
+    at the longest horizon exceeds `toxic_markout_pips`, or more than
+    `latency_arb_share` of its fills show the latency-arbitrage signature.
+    """
+    import pandas as pd
+
+    horizons = tuple(sorted(horizons))
+    if not isinstance(quotes, QuoteTape):
+        quotes = QuoteTape(quotes, registry, chunk_rows)
+    pip_value = pip_values_per_lot(registry, account_currency, fx_quotes)
+
+    partials = [
+        _chunk_features(chunk, quotes, registry, pip_value, horizons, commission_per_lot)
+        for chunk in iter_trade_chunks(trades, chunk_rows)
+    ]
+    if not partials:
+        raise ValueError("Trade tape is empty")
+    totals = pd.concat(partials).groupby(level=0, sort=False).sum()
+
+    trades_count = totals['Total Trades'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        clients = pd.DataFrame({
+            'Client ID': totals.index.to_numpy(),
+            'Total Trades': totals['Total Trades'].to_numpy(),
+            'Total Volume': totals['Total Volume'].to_numpy(),
+            'Avg Trade Size': totals['Total Volume'].to_numpy() / trades_count,
+            'Win Rate': totals['_wins'].to_numpy() / trades_count * 100,
+            'Client P&L': totals['Client P&L'].to_numpy(),
+            'Commission Revenue': totals['Commission Revenue'].to_numpy()
+        })
+        if '_hold_count' in totals.columns:
+            hold_count = totals['_hold_count'].to_numpy()
+            clients['Avg Hold Time'] = totals['_hold_seconds'].to_numpy() / hold_count / 3600
+            for label in HOLD_LABELS:
+                clients[label] = totals[label].to_numpy() / hold_count
+        else:
+            clients['Avg Hold Time'] = np.nan
+        for horizon in horizons:
+            clients[f'Markout {horizon}s (pips)'] = (totals[f'_markout_{horizon}_pips'].to_numpy()
+                                                     / totals[f'_markout_{horizon}_count'].to_numpy())
+            clients[f'Markout {horizon}s P&L'] = totals[f'_markout_{horizon}_pnl'].to_numpy()
+        clients['Latency Arb Share'] = totals['_arb_count'].to_numpy() / totals['_arb_eligible'].to_numpy()
+
+    clients['Toxic Flow'] = (
+        is_toxic_flow(clients['Win Rate'], clients['Avg Trade Size'], clients['Avg Hold Time'])
+        | (clients[f'Markout {horizons[-1]}s (pips)'] > toxic_markout_pips)
+        | (clients['Latency Arb Share'] > latency_arb_share)
+    )
+    return clients
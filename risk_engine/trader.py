@@ -0,0 +1,145 @@
+"""
+Trader-side risk calculations: position sizing, VaR, Sharpe ratio and risk/reward
+"""
+import numpy as np
+
+
+def calculate_position_size(account_balance, risk_percentage, entry_price, stop_loss):
+    """Calculate position size based on risk parameters"""
+    risk_amount = account_balance * (risk_percentage / 100)
+    price_risk = abs(entry_price - stop_loss)
+    if price_risk == 0:
+        return 0
+    position_size = risk_amount / price_risk
+    return position_size
+
+
+def calculate_var(returns, confidence_level=0.95, axis=None):
+    """Calculate Value at Risk (pass axis=0 for one VaR per column)"""
+    if len(returns) == 0:
+        return 0
+    return np.percentile(returns, (1 - confidence_level) * 100, axis=axis)
+
+
+def calculate_sharpe_ratio(returns, risk_free_rate=0.02):
+    """Calculate Sharpe Ratio"""
+    if len(returns) == 0 or np.std(returns) == 0:
+        return 0
+    excess_returns = returns - (risk_free_rate / 252)
+    return np.sqrt(252) * np.mean(excess_returns) / np.std(excess_returns)
+
+
+def calculate_trade_setup(account_balance, risk_percentage, entry_price, stop_loss, target_price):
+    """Calculate position size, value, risk amount and R:R ratio for one trade setup"""
+    position_size = calculate_position_size(account_balance, risk_percentage, entry_price, stop_loss)
+    risk_amount = account_balance * (risk_percentage / 100)
+    position_value = position_size * entry_price
+
+    price_risk = abs(entry_price - stop_loss)
+    potential_profit = abs(target_price - entry_price)
+    risk_reward_ratio = potential_profit / price_risk if price_risk > 0 else 0
+
+    return {
+        'position_size': position_size,
+        'position_value': position_value,
+        'risk_amount': risk_amount,
+        'risk_reward_ratio': risk_reward_ratio
+    }
+
+
+def calculate_position_sizes(account_balance, risk_percentage, entry_price, stop_loss, target_price=None):
+    """Vectorized calculate_trade_setup over arrays of order tickets
+
+    Inputs broadcast against each other. Rows with zero price risk get a position
+    size and R:R ratio of 0 instead of being branched on.
+    """
+    risk_amount = np.asarray(account_balance, dtype=float) * (np.asarray(risk_percentage, dtype=float) / 100)
+    entry_price = np.asarray(entry_price, dtype=float)
+    price_risk = np.abs(entry_price - np.asarray(stop_loss, dtype=float))
+    has_risk = price_risk > 0
+
+    shape = np.broadcast(risk_amount, price_risk).shape
+    position_size = np.divide(risk_amount, price_risk, out=np.zeros(shape), where=has_risk)
+    position_value = position_size * entry_price
+
+    result = {
+        'position_size': position_size,
+        'position_value': position_value,
+        'risk_amount': np.broadcast_to(risk_amount, shape)
+    }
+
+    if target_price is not None:
+        potential_profit = np.abs(np.asarray(target_price, dtype=float) - entry_price)
+        shape = np.broadcast(potential_profit, price_risk).shape
+        result['risk_reward_ratio'] = np.divide(potential_profit, price_risk, out=np.zeros(shape), where=has_risk)
+
+    return result
+
+
+def size_orders(orders, balance_col='Account Balance', risk_col='Risk (%)', entry_col='Entry',
+                stop_col='Stop Loss', target_col='Target'):
+    """Size every order ticket in a DataFrame in one vectorized pass
+
+    Returns a copy of `orders` with Position Size, Position Value, Risk Amount and,
+    when `target_col` is present, R:R Ratio columns added.
+    """
+    has_target = target_col is not None and target_col in orders.columns
+    sizes = calculate_position_sizes(
+        orders[balance_col].to_numpy(),
+        orders[risk_col].to_numpy(),
+        orders[entry_col].to_numpy(),
+        orders[stop_col].to_numpy(),
+        orders[target_col].to_numpy() if has_target else None
+    )
+
+    result = orders.copy()
+    result['Position Size'] = sizes['position_size']
+    result['Position Value'] = sizes['position_value']
+    result['Risk Amount'] = sizes['risk_amount']
+    if has_target:
+        result['R:R Ratio'] = sizes['risk_reward_ratio']
+    return result
+
+
+def simulate_var(portfolio_value, daily_volatility, confidence_level=95, time_horizon=1,
+                 num_simulations=10000, seed=42):
+    """Estimate VaR from simulated normal daily returns scaled by sqrt(time horizon)"""
+    np.random.seed(seed)
+    daily_returns = np.random.normal(0, daily_volatility / 100, num_simulations)
+
+    var_percentage = calculate_var(daily_returns, confidence_level / 100)
+    var_amount = portfolio_value * abs(var_percentage) * np.sqrt(time_horizon)
+
+    return {
+        'daily_returns': daily_returns,
+        'var_percentage': var_percentage,
+        'var_amount': var_amount
+    }
+
+
+def analyze_risk_reward(entry, stop, target1, target2, win_rate, shares, commission):
+    """Calculate R:R ratios, max loss/gain and expected value for a two-target trade"""
+    risk = abs(entry - stop)
+    reward1 = abs(target1 - entry)
+    reward2 = abs(target2 - entry)
+
+    rr_ratio1 = reward1 / risk if risk > 0 else 0
+    rr_ratio2 = reward2 / risk if risk > 0 else 0
+
+    max_loss = (risk * shares) + (2 * commission)
+    max_gain1 = (reward1 * shares) - (2 * commission)
+    max_gain2 = (reward2 * shares) - (2 * commission)
+
+    expected_value = (win_rate/100 * max_gain1) - ((100-win_rate)/100 * max_loss)
+
+    return {
+        'risk': risk,
+        'reward1': reward1,
+        'reward2': reward2,
+        'rr_ratio1': rr_ratio1,
+        'rr_ratio2': rr_ratio2,
+        'max_loss': max_loss,
+        'max_gain1': max_gain1,
+        'max_gain2': max_gain2,
+        'expected_value': expected_value
+    }
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk_engine.broker import (
+    analyze_booking, calculate_pip_value, calculate_swap, classify_booking, contract_size_for, recommend_booking
+)
+
+
+@pytest.mark.parametrize('symbol, lot_type, expected', [
+    ('EUR/USD', 'Standard (100k)', 100000),
+    ('EUR/USD', 'Micro (1k)', 1000),
+    ('XAU/USD', 'Mini (10k)', 100),
+    ('US30', 'Standard (100k)', 1),
+    ('USOIL', 'Micro (1k)', 1000),
+])
+def test_contract_size_scales_by_lot_type_only_for_fx(symbol, lot_type, expected):
+    assert contract_size_for(symbol, lot_type) == expected
+
+
+@pytest.mark.parametrize('symbol, expected', [('EUR/USD', 10.0), ('XAU/USD', 1.0), ('US30', 1.0)])
+def test_swap_uses_the_instrument_pip_value(symbol, expected):
+    contract_size = contract_size_for(symbol)
+    pip_value = calculate_pip_value(symbol, 'USD', 1, contract_size, None)
+    swap = calculate_swap(1, contract_size, -2.0, 0, 10, open_date='2026-10-05', pip_value=pip_value)
+    assert swap['pip_value'] == pytest.approx(expected)
+    assert swap['daily_swap'] == pytest.approx(-2.0 * expected)
+
+
+def _random_clients(rng, count):
+    """Client aggregates straddling every rule threshold, with some NaNs"""
+    clients = {
+        'toxic_flow': rng.random(count) < 0.2,
+        'win_rate': rng.choice([30.0, 44.9, 45.0, 45.1, 60.0, 70.0, np.nan], count),
+        'avg_trade_size': rng.choice([0.5, 5.0, 5.01, 10.0, np.nan], count),
+        'abook_revenue': rng.normal(0, 100, count),
+        'bbook_revenue': rng.normal(0, 100, count),
+        'risk_tolerance': rng.choice(['Conservative', 'Moderate', 'Aggressive'], count).astype(object)
+    }
+    for name in ('abook_revenue', 'bbook_revenue'):
+        clients[name][rng.random(count) < 0.1] = np.nan
+    return clients
+
+
+def test_classify_booking_matches_the_scalar_rule():
+    clients = _random_clients(np.random.default_rng(21), 2000)
+    recommendations, reasons = classify_booking(**clients)
+    for i in range(2000):
+        row = {name: values[i] for name, values in clients.items()}
+        assert (recommendations[i], reasons[i]) == recommend_booking(**row)
+
+
+@pytest.mark.parametrize('risk_tolerance', ['Conservative', 'Moderate', 'Aggressive'])
+def test_analyze_booking_matches_the_scalar_rule_per_client(risk_tolerance):
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame({
+        'Win Rate': rng.uniform(20, 80, 500),
+        'Avg Trade Size': rng.uniform(0.1, 8, 500),
+        'Avg Hold Time': rng.uniform(0.5, 48, 500),
+        'Total Volume': rng.uniform(1, 500, 500),
+        'Commission Revenue': rng.uniform(0, 2000, 500),
+        'Client P&L': rng.normal(0, 3000, 500)
+    })
+    result = analyze_booking(df, 3.5, risk_tolerance)
+    for row in result.to_dict('records'):
+        expected = recommend_booking(row['Toxic Flow'], row['Win Rate'], row['Avg Trade Size'],
+                                     row['A-Book Revenue'], row['B-Book Revenue'], risk_tolerance)
+        assert (row['Recommendation'], row['Reason']) == expected
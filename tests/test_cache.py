@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk_engine.cache import ResultCache, cache_stats, call_key, canonical_key, memoize, register_cache
+
+
+def test_equal_numbers_share_a_key():
+    assert canonical_key(1) == canonical_key(1.0) == canonical_key(np.int64(1)) == canonical_key(np.float32(1))
+    assert canonical_key(0.1) != canonical_key(0.10000000000000002)
+    assert canonical_key(True) != canonical_key(1)
+
+
+def test_large_ints_are_keyed_exactly():
+    assert canonical_key(2 ** 53) != canonical_key(2 ** 53 + 1)
+    assert canonical_key(np.uint64(2 ** 63 + 1)) != canonical_key(np.uint64(2 ** 63))
+    assert canonical_key([10 ** 30]) != canonical_key([10 ** 30 + 1])
+
+
+def test_arrays_and_frames_are_keyed_by_content():
+    assert canonical_key(np.arange(3)) == canonical_key(np.arange(3))
+    assert canonical_key(np.arange(3)) != canonical_key(np.arange(3.0))
+    frame = pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']})
+    assert canonical_key(frame) == canonical_key(frame.copy())
+    assert canonical_key(frame) != canonical_key(frame.rename(columns={'b': 'c'}))
+
+
+def test_categoricals_are_keyed_by_every_value_and_category():
+    middle = ['x'] * 5000
+    left = pd.Categorical(middle + ['y'] + middle)
+    right = pd.Categorical(middle + ['x'] + middle, categories=['x', 'y'])
+    assert canonical_key(left) != canonical_key(right)
+    assert canonical_key(left) == canonical_key(left.copy())
+    # Same values, different category sets or order
+    assert canonical_key(pd.Categorical(['a'])) != canonical_key(pd.Categorical(['a'], categories=['a', 'b']))
+    assert canonical_key(pd.Categorical(['a'], ordered=True)) != canonical_key(pd.Categorical(['a']))
+    frame = pd.DataFrame({'c': pd.Categorical(['a'])})
+    assert canonical_key(frame) != canonical_key(frame.astype({'c': pd.CategoricalDtype(['a', 'b'])}))
+
+
+def test_other_pandas_objects_are_hashed_or_rejected():
+    assert canonical_key(pd.array([1, None, 3], dtype='Int64')) != canonical_key(pd.array([1, 2, 3], dtype='Int64'))
+    assert canonical_key(pd.Timestamp('2026-10-16')) != canonical_key(pd.Timestamp('2026-10-17'))
+    with pytest.raises(TypeError):
+        canonical_key(pd.DataFrame({'a': [1]}).groupby('a'))
+
+
+def test_call_key_binds_arguments_to_the_signature():
+    def f(a, b=2):
+        return a + b
+
+    assert call_key(f, (1,), {}) == call_key(f, (1, 2), {}) == call_key(f, (), {'a': 1, 'b': 2})
+    assert call_key(f, (1, 3), {}) != call_key(f, (1,), {})
+
+
+def test_result_cache_evicts_by_entries_bytes_and_ttl():
+    cache = ResultCache(max_entries=2)
+    for key in 'abc':
+        cache.put(key, key)
+    assert cache.get('a') is None and cache.get('c') == 'c'
+    assert cache.info()['evictions'] == 1
+
+    cache = ResultCache(max_bytes=10)
+    cache.put('a', 'x' * 6)
+    cache.put('b', 'y' * 6)
+    cache.put('c', 'z' * 20)
+    assert cache.get('a') is None and cache.get('b') == 'y' * 6 and cache.get('c') is None
+    assert cache.total_bytes == 6
+    cache.put('b', 'y' * 2)
+    assert cache.total_bytes == 2
+
+    now = [0.0]
+    cache = ResultCache(ttl=10, clock=lambda: now[0])
+    cache.put('a', 1)
+    now[0] = 9.0
+    assert cache.get('a') == 1
+    now[0] = 10.0
+    assert cache.get('a') is None
+    assert cache.info()['expirations'] == 1
+
+
+def test_memoize_counts_hits_and_reuses_the_wrapper():
+    calls = []
+
+    def square(x):
+        calls.append(x)
+        return x * x
+
+    cached = memoize(square, max_entries=4)
+    assert memoize(square) is cached
+    assert cached(3) == cached(3.0) == 9
+    assert calls == [3]
+    info = cached.cache_info()
+    assert info['hits'] == 1 and info['misses'] == 1
+
+
+def test_memoized_results_are_copies():
+    @memoize
+    def table(n):
+        return {'frame': pd.DataFrame({'x': np.arange(n)}), 'values': np.arange(n), 'rows': [n]}
+
+    first = table(3)
+    first['frame'].loc[0, 'x'] = 99
+    first['values'][0] = 99
+    first['rows'].append(4)
+    first['extra'] = True
+
+    second = table(3)
+    assert second['frame']['x'].tolist() == [0, 1, 2]
+    assert second['values'].tolist() == [0, 1, 2]
+    assert second['rows'] == [3]
+    assert 'extra' not in second
+    assert table.cache_info()['hits'] == 1
+
+
+@pytest.mark.parametrize('value', [np.nan, float('inf'), -0.5])
+def test_special_floats_are_stable(value):
+    assert canonical_key(value) == canonical_key(float(value))
+
+
+def test_memoized_functions_can_share_one_byte_budget():
+    shared = register_cache('tests.shared', ResultCache(max_bytes=100, sizeof=len))
+
+    @memoize(cache=shared)
+    def small(n):
+        return 'x' * n
+
+    @memoize(cache=shared)
+    def large(n):
+        return 'y' * n
+
+    small(10)
+    large(80)
+    assert shared.info()['entries'] == 2 and shared.total_bytes == 90
+    # small(10) is hit, so the 80-byte entry is the least recently used when large(50) lands
+    small(10)
+    large(50)
+    assert shared.info()['entries'] == 2 and shared.total_bytes == 60
+    assert small.cache is large.cache is shared
+
+    stats = cache_stats()
+    assert 'tests.shared' in stats
+    assert not any(name.endswith('.small') or name.endswith('.large') for name in stats)
+
+
+def test_figure_cache_is_bounded_by_figure_size():
+    from charts import FIGURE_CACHE, figure_bytes, return_distribution_figure, trade_setup_figure
+
+    big = return_distribution_figure(np.linspace(-3, 3, 20000), -1.6, 95, 'VaR', 'Return (%)')
+    small = trade_setup_figure(1.0, 1.1, 1.2)
+    assert figure_bytes(big) > 20000 * 8 > 10 * figure_bytes(small)
+    assert FIGURE_CACHE.max_bytes is not None and FIGURE_CACHE.total_bytes >= figure_bytes(big)
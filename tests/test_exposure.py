@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk_engine.exposure import ExposureBook, book_exposure, signed_lots
+
+
+def _positions():
+    return pd.DataFrame({
+        'Instrument': ['EUR/USD', 'EUR/USD', 'USD/JPY', 'XAU/USD', 'US30'],
+        'Lots': [5.0, 2.0, 3.0, 1.0, 4.0],
+        'Direction': ['Buy', 'Sell', 'Sell', 'Buy', 'Buy']
+    })
+
+
+def test_signed_lots_reads_every_direction_spelling():
+    positions = pd.DataFrame({'Lots': [1.0, 2.0, 3.0, 4.0], 'Direction': ['Buy', ' sell', 'LONG', 'Short']})
+    np.testing.assert_array_equal(signed_lots(positions), [1.0, -2.0, 3.0, -4.0])
+
+
+@pytest.mark.parametrize('bad', [None, np.nan, '', 'Hold'])
+def test_signed_lots_rejects_missing_or_unknown_directions(bad):
+    positions = pd.DataFrame({'Lots': [1.0, 2.0, 3.0], 'Direction': ['Buy', bad, 'Sell']})
+    with pytest.raises(ValueError, match='bad rows: 1'):
+        signed_lots(positions)
+
+
+def test_book_exposure_nets_per_instrument_and_flags_limits():
+    result = book_exposure(_positions(), exposure_limits=2.5)
+    by_instrument = result['by_instrument'].set_index('Instrument')
+    assert by_instrument.loc['EUR/USD', 'Net Lots'] == 3.0
+    assert by_instrument.loc['USD/JPY', 'Net Lots'] == -3.0
+    assert by_instrument.loc['EUR/USD', 'Hedge Direction'] == 'Sell'
+    assert by_instrument.loc['USD/JPY', 'Hedge Direction'] == 'Buy'
+    assert by_instrument.loc['EUR/USD', 'Hedge Required'] == pytest.approx(0.5)
+    assert result['gross_lots'] == 15.0
+    assert result['instruments_over_limit'] == 3
+    assert result['unpriced_instruments'] == ['US30']
+
+
+def test_book_exposure_currency_legs():
+    positions = pd.DataFrame({'Instrument': ['EUR/USD'], 'Signed Lots': [1.0]})
+    by_currency = book_exposure(positions)['by_currency'].set_index('Currency')
+    assert by_currency.loc['EUR', 'Net Amount'] == pytest.approx(100000)
+    assert by_currency.loc['USD', 'Net Amount'] == pytest.approx(-110000)
+
+
+def test_cross_legs_and_unpriced_instruments():
+    positions = pd.DataFrame({'Instrument': ['EUR/JPY', 'EUR/USD', 'US30'], 'Lots': [2.0, 1.0, 3.0],
+                              'Direction': ['Buy', 'Sell', 'Buy']})
+    result = book_exposure(positions)
+    eur_jpy = 1.10 / (1 / 150)
+    by_currency = result['by_currency'].set_index('Currency')
+    # 2 lots EUR/JPY: +200k EUR, -200k x 165 JPY; 1 lot EUR/USD short: -100k EUR, +110k USD
+    assert by_currency.loc['EUR', 'Net Amount'] == pytest.approx(100000)
+    assert by_currency.loc['JPY', 'Net Amount'] == pytest.approx(-200000 * eur_jpy)
+    assert by_currency.loc['JPY', 'Net Value (USD)'] == pytest.approx(-220000)
+    assert by_currency.loc['USD', 'Net Amount'] == pytest.approx(110000)
+    assert 'US30' not in by_currency.index
+    assert result['unpriced_instruments'] == ['US30']
+
+    by_instrument = result['by_instrument'].set_index('Instrument')
+    assert by_instrument.loc['EUR/JPY', 'Net Notional (USD)'] == pytest.approx(220000)
+    assert np.isnan(by_instrument.loc['US30', 'Net Notional (USD)'])
+    assert result['gross_net_notional'] == pytest.approx(330000)
+
+    priced = book_exposure(positions, prices={'US30': 39000.0})
+    assert priced['unpriced_instruments'] == []
+    by_currency = priced['by_currency'].set_index('Currency')
+    assert by_currency.loc['US30', 'Net Amount'] == pytest.approx(3)
+    assert by_currency.loc['USD', 'Net Amount'] == pytest.approx(110000 - 3 * 39000)
+
+
+def test_live_book_matches_batch_aggregation():
+    book = ExposureBook(prices={'US30': 39000.0})
+    positions = _positions()
+    signs = np.where(positions['Direction'] == 'Buy', 1.0, -1.0)
+    for i, (symbol, lots) in enumerate(zip(positions['Instrument'], positions['Lots'] * signs)):
+        book.fill(i, symbol, lots)
+    batch = book_exposure(positions)['net_lots']
+    np.testing.assert_allclose(book.long_lots - book.short_lots, batch)
+
+    book.close(0, lots=2.0)
+    book.close(3)
+    assert book.net('EUR/USD') == 1.0
+    assert book.net('XAU/USD') == 0.0
+    assert 3 not in book.positions
+
+
+def test_first_event_without_any_price_is_rejected_untouched():
+    book = ExposureBook()
+    with pytest.raises(ValueError):
+        book.fill('a', 'US30', 1.0)
+    assert book.positions == {}
+    assert book.net('US30') == 0.0
+
+    book.fill('a', 'US30', 1.0, price=39000.0)
+    book.fill('a', 'US30', 1.0)
+    assert np.isfinite(book.currency_amount).all()
+
+
+def test_fill_in_another_instrument_is_rejected_untouched():
+    book = ExposureBook()
+    book.fill('a', 'EUR/USD', 1.0)
+    with pytest.raises(ValueError, match='EUR/USD, not USD/JPY'):
+        book.fill('a', 'USD/JPY', 1.0, price=150.0)
+    assert book.positions == {'a': (book.registry.id('EUR/USD'), 1.0)}
+    assert book.net('EUR/USD') == 1.0
+    assert book.net('USD/JPY') == 0.0
+    with pytest.raises(KeyError):
+        book.fill('a', 'NOPE', 1.0)
+
+
+def test_seeded_prices_keep_currency_amounts_finite():
+    book = ExposureBook()
+    book.fill('a', 'EUR/USD', 1.0)
+    amounts = book.currency_snapshot().set_index('Currency')['Net Amount']
+    assert amounts['EUR'] == pytest.approx(100000)
+    assert amounts['USD'] == pytest.approx(-110000)
+
+
+def test_limit_crossings_alert_both_ways():
+    seen = []
+    book = ExposureBook(exposure_limits={'EUR/USD': 2.0}, on_limit=seen.append)
+    book.fill('a', 'EUR/USD', 1.5)
+    assert not seen
+    book.fill('b', 'EUR/USD', 1.0)
+    assert seen[-1]['breached'] and seen[-1]['hedge_direction'] == 'Sell'
+    assert seen[-1]['hedge_required'] == pytest.approx(0.5)
+    book.close('b')
+    assert not seen[-1]['breached']
+    assert len(book.alerts) == 2
+
+
+def test_set_limits_reevaluates_open_exposure():
+    book = ExposureBook(exposure_limits=10.0)
+    book.fill('a', 'EUR/USD', 5.0)
+    book.fill('b', 'USD/JPY', -1.0)
+    assert not book.breached.any()
+
+    book.set_limits(2.0)
+    assert book.totals('EUR/USD')['breached']
+    assert not book.totals('USD/JPY')['breached']
+    assert [alert['instrument'] for alert in book.alerts] == ['EUR/USD']
+
+    book.set_limits(None)
+    assert not book.breached.any()
+    assert book.totals('EUR/USD')['limit'] == np.inf
+    assert len(book.alerts) == 2
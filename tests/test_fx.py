@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from risk_engine.broker import calculate_pip_value
+from risk_engine.fx import ConversionTable, split_pair
+
+
+QUOTES = {'EUR/USD': 1.10, 'USD/JPY': 150.0, 'GBP/USD': 1.25, 'EUR/GBP': 0.88, 'AUD/NZD': 1.08, 'NZD/USD': 0.60}
+
+
+def test_split_pair_accepts_both_spellings():
+    assert split_pair('EUR/USD') == split_pair('eurusd') == ('EUR', 'USD')
+    with pytest.raises(ValueError):
+        split_pair('EURUSDX')
+
+
+def test_rates_triangulate_through_the_pivot():
+    table = ConversionTable(QUOTES)
+    assert table.rate('EUR', 'USD') == pytest.approx(1.10)
+    assert table.rate('USD', 'JPY') == pytest.approx(150.0)
+    assert table.rate('EUR', 'JPY') == pytest.approx(165.0)
+    assert table.rate('AUD', 'USD') == pytest.approx(1.08 * 0.60)
+    np.testing.assert_allclose(table.matrix * table.matrix.T, 1.0)
+    with pytest.raises(KeyError):
+        table.rate('EUR', 'CHF')
+
+
+def test_set_quote_matches_a_fresh_table():
+    table = ConversionTable(QUOTES)
+    table.set_quote('NZD/USD', 0.62)
+    table.set_quote('USD/JPY', 148.0)
+    table.set_quote('USD/CHF', 0.90)
+
+    fresh = ConversionTable({**QUOTES, 'NZD/USD': 0.62, 'USD/JPY': 148.0, 'USD/CHF': 0.90})
+    for a in fresh.currencies:
+        for b in fresh.currencies:
+            assert table.rate(a, b) == pytest.approx(fresh.rate(a, b), rel=1e-12)
+
+
+def test_pip_value_in_any_account_currency():
+    # EUR/USD: 10 USD per standard lot, converted with the pair's own price for EUR
+    assert calculate_pip_value('EUR/USD', 'USD', 1, 100000, 1.10) == pytest.approx(10.0)
+    assert calculate_pip_value('EUR/USD', 'EUR', 1, 100000, 1.10) == pytest.approx(10 / 1.10)
+    # USD/JPY pip is 1,000 JPY per lot
+    assert calculate_pip_value('USD/JPY', 'USD', 1, 100000, 150.0) == pytest.approx(1000 / 150.0)
+    # Cross account currency goes through the table
+    assert calculate_pip_value('EUR/USD', 'JPY', 2, 100000, 1.10, quotes=QUOTES) == pytest.approx(20 * 150.0)
+
+
+def test_vectorized_pip_values_match_scalar():
+    table = ConversionTable(QUOTES)
+    pairs = np.array(['EUR/USD', 'USD/JPY', 'EUR/GBP', 'EUR/USD'])
+    lots = np.array([1.0, 2.0, 0.5, 3.0])
+    values = table.pip_values(pairs, lots, np.full(4, 100000.0), 'GBP')
+    expected = [table.pip_value(pair, size, 100000, 'GBP') for pair, size in zip(pairs, lots)]
+    np.testing.assert_allclose(values, expected)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from risk_engine.hedging import optimize_hedges, simplex, solve_lp
+
+
+def test_simplex_matches_highs_on_random_feasible_programs():
+    # Without SciPy solve_lp is the simplex itself, so there is nothing to compare against
+    pytest.importorskip('scipy.optimize')
+    rng = np.random.default_rng(3)
+    for _ in range(20):
+        A_ub = rng.normal(size=(6, 4))
+        x0 = rng.uniform(0, 2, size=4)
+        b_ub = A_ub @ x0 + rng.uniform(0, 1, size=6)
+        # Bounded objective: every variable costs something and is capped
+        c = rng.uniform(-1, 1, size=4)
+        A_ub = np.vstack([A_ub, np.eye(4)])
+        b_ub = np.concatenate([b_ub, np.full(4, 5.0)])
+
+        ours = simplex(c, A_ub, b_ub)
+        highs = solve_lp(c, A_ub, b_ub)
+        assert c @ ours == pytest.approx(c @ highs, abs=1e-7)
+        assert (A_ub @ ours <= b_ub + 1e-7).all()
+        assert (ours >= -1e-9).all()
+
+
+def test_simplex_handles_negative_right_hand_sides():
+    # x + y >= 3 written as -x - y <= -3; cheapest is all in y
+    solution = simplex([2.0, 1.0], [[-1.0, -1.0]], [-3.0])
+    np.testing.assert_allclose(solution, [0.0, 3.0], atol=1e-9)
+
+
+def test_simplex_reports_infeasible_programs():
+    with pytest.raises(ValueError):
+        simplex([1.0], [[1.0], [-1.0]], [1.0, -2.0])
+
+
+def test_hedges_bring_every_currency_within_its_limit():
+    exposure = {'EUR': 800000.0, 'JPY': -500000.0, 'GBP': 200000.0, 'USD': -500000.0}
+    result = optimize_hedges(exposure, limits=100000.0, lot_step=0)
+    by_currency = result['by_currency'].set_index('Currency')
+    bounded = np.isfinite(by_currency['Limit'])
+    assert (by_currency['After'].abs()[bounded] <= by_currency['Limit'][bounded] + 1e-6).all()
+    assert result['total_cost'] <= result['pairwise_cost'] + 1e-9
+    assert result['unhedgeable'] == []
+
+
+def test_crosses_net_offsetting_legs_more_cheaply_than_pairwise():
+    # Long EUR against short JPY: one EUR/JPY trade instead of EUR/USD and USD/JPY
+    result = optimize_hedges({'EUR': 500000.0, 'JPY': -500000.0}, limits=0.0, lot_step=0)
+    assert result['total_cost'] < result['pairwise_cost']
+    assert result['hedge_lots']['EUR/JPY'] < 0
+
+
+def test_within_limit_book_needs_no_hedges():
+    result = optimize_hedges({'EUR': 50000.0, 'USD': -50000.0}, limits=100000.0)
+    assert result['hedges'].empty
+    assert result['total_cost'] == 0.0
@@ -0,0 +1,110 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk_engine.historical import count_instruments, historical_var, iter_return_blocks, open_returns
+from risk_engine.trader import calculate_var
+
+WEIGHTS = np.array([[0.5, 0.3, 0.2], [1.0, -1.0, 0.0]])
+
+
+def _returns(num_rows=1000):
+    return np.random.default_rng(6).normal(0, 0.01, size=(num_rows, 3))
+
+
+def _upload(data, name):
+    buffer = io.BytesIO(data)
+    buffer.name = name
+    return buffer
+
+
+def _sources(returns, tmp_path):
+    """The same history as an array, DataFrame, files on disk and uploaded buffers"""
+    frame = pd.DataFrame(returns, columns=['EUR/USD', 'USD/JPY', 'XAU/USD'])
+    npy_path = tmp_path / 'returns.npy'
+    np.save(npy_path, returns)
+    sources = {'array': returns, 'frame': frame, 'npy': str(npy_path),
+               'npy upload': _upload(npy_path.read_bytes(), 'returns.npy'),
+               'csv upload': _upload(frame.to_csv(index=False).encode(), 'returns.csv')}
+    if _has_pyarrow():
+        parquet_path = tmp_path / 'returns.parquet'
+        frame.to_parquet(parquet_path)
+        sources['parquet'] = str(parquet_path)
+        sources['parquet upload'] = _upload(parquet_path.read_bytes(), 'returns.parquet')
+    return sources
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 7, 256, 1000, 5000])
+def test_every_source_agrees_with_the_in_memory_result(tmp_path, chunk_rows):
+    returns = _returns()
+    expected = historical_var(returns, WEIGHTS, 1e6, chunk_rows=len(returns))
+    for name, source in _sources(returns, tmp_path).items():
+        result = historical_var(source, WEIGHTS, 1e6, chunk_rows=chunk_rows)
+        np.testing.assert_allclose(result['portfolio_returns'], expected['portfolio_returns'], rtol=1e-12, atol=1e-15,
+                                   err_msg=name)
+        np.testing.assert_allclose(result['var_amount'], expected['var_amount'], rtol=1e-12, err_msg=name)
+        np.testing.assert_allclose(result['es_amount'], expected['es_amount'], rtol=1e-12, err_msg=name)
+
+
+def test_var_matches_calculate_var_on_the_full_history():
+    returns = _returns()
+    result = historical_var(returns, WEIGHTS[0], 250000.0, chunk_rows=64)
+    portfolio = returns @ WEIGHTS[0]
+    for level, var in zip(result['confidence_levels'], result['var_return'][:, 0]):
+        assert var == pytest.approx(calculate_var(portfolio, level))
+        tail = portfolio[portfolio <= var]
+        assert result['es_return'][list(result['confidence_levels']).index(level), 0] == pytest.approx(tail.mean())
+    np.testing.assert_allclose(result['var_amount'][:, 0], 250000.0 * np.abs(result['var_return'][:, 0]))
+
+
+def test_uploaded_npy_is_viewed_without_copying():
+    buffer = _upload(b'', 'returns.npy')
+    np.save(buffer, _returns(10))
+    block = next(iter_return_blocks(buffer, chunk_rows=10))
+    np.testing.assert_array_equal(block, _returns(10))
+    assert count_instruments(buffer) == 3
+    assert buffer.tell() == 0
+
+
+def test_uploads_stay_readable_across_reruns():
+    returns = _returns(20)
+    upload = _upload(pd.DataFrame(returns).to_csv(index=False).encode(), 'returns.csv')
+    first = historical_var(upload, WEIGHTS, chunk_rows=8)
+    assert not upload.closed
+    assert count_instruments(upload) == 3
+    np.testing.assert_array_equal(historical_var(upload, WEIGHTS)['var_return'], first['var_return'])
+
+
+def test_one_dimensional_files_are_a_single_instrument(tmp_path):
+    path = tmp_path / 'single.npy'
+    np.save(path, _returns(50)[:, 0])
+    assert open_returns(str(path)).shape == (50, 1)
+    result = historical_var(str(path), [2.0])
+    np.testing.assert_allclose(result['portfolio_returns'][:, 0], 2 * _returns(50)[:, 0])
+
+
+def test_empty_history_gives_zero_var():
+    result = historical_var(np.empty((0, 3)), WEIGHTS)
+    assert result['num_observations'] == 0
+    np.testing.assert_array_equal(result['var_amount'], 0.0)
+    assert result['var_return'].shape == (len(result['confidence_levels']), 2)
+    assert count_instruments(np.empty((0, 3))) == 0
+
+
+def test_weights_must_cover_every_instrument(tmp_path):
+    with pytest.raises(ValueError):
+        historical_var(_returns(10), [0.5, 0.5])
+    path = tmp_path / 'cube.npy'
+    np.save(path, np.zeros((2, 2, 2)))
+    with pytest.raises(ValueError):
+        historical_var(str(path), [1.0, 1.0])
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk_engine.fx import conversion_table
+from risk_engine.instruments import INSTRUMENTS
+from risk_engine.margin import account_margin, position_notional, tiered_margin
+
+SYMBOLS = ['EUR/USD', 'USD/JPY', 'GBP/USD', 'EUR/JPY', 'XAU/USD']
+
+
+def _book(rng, num_positions=300, num_accounts=12):
+    instruments = rng.choice(SYMBOLS, num_positions)
+    table = conversion_table()
+    mid = np.array([table.rate(*symbol.split('/')) for symbol in instruments])
+    entry = mid * (1 + rng.normal(0, 0.003, num_positions))
+    positions = pd.DataFrame({
+        'Client ID': rng.choice([f'A{i}' for i in range(num_accounts)], num_positions),
+        'Instrument': instruments,
+        'Direction': rng.choice(['Buy', 'Sell'], num_positions),
+        'Lots': rng.uniform(0.1, 5, num_positions).round(2),
+        'Entry': entry,
+        'Current': mid
+    })
+    accounts = pd.DataFrame({
+        'Client ID': [f'A{i}' for i in range(num_accounts)],
+        'Balance': rng.uniform(5000, 200000, num_accounts),
+        'Leverage': rng.choice([30.0, 100.0, 500.0], num_accounts)
+    })
+    return positions, accounts
+
+
+def _brute_force(positions, accounts, hedged_margin_ratio, volume_tiers=None):
+    """Account margin one account and one instrument at a time with scalar formulas"""
+    table = conversion_table()
+    results = {}
+    for client, rows in positions.groupby('Client ID', sort=False):
+        account = accounts.set_index('Client ID').loc[client]
+        pnl, margin = 0.0, 0.0
+        for symbol, legs in rows.groupby('Instrument'):
+            i = INSTRUMENTS.id(symbol)
+            base, quote = INSTRUMENTS.base[i], INSTRUMENTS.quote[i]
+            contract = INSTRUMENTS.contract_size[i]
+            sign = np.where(legs['Direction'] == 'Buy', 1.0, -1.0)
+            for lots, s, entry, current in zip(legs['Lots'], sign, legs['Entry'], legs['Current']):
+                quote_pnl = (current - entry) * s * lots * contract
+                pnl += quote_pnl / current if base == 'USD' else quote_pnl * table.rate(quote, 'USD')
+
+            long_lots = legs['Lots'][sign > 0].sum()
+            short_lots = legs['Lots'][sign < 0].sum()
+            hedged = min(long_lots, short_lots)
+            margin_lots = abs(long_lots - short_lots) + hedged_margin_ratio * 2 * hedged
+            price = (legs['Lots'] * legs['Current']).sum() / legs['Lots'].sum()
+            per_unit = 1.0 if base == 'USD' else price * table.rate(quote, 'USD')
+            notional = margin_lots * contract * per_unit
+            rate = max(INSTRUMENTS.margin_rate[i], 1 / account['Leverage'])
+            margin += float(tiered_margin(notional, rate, volume_tiers))
+        equity = account['Balance'] + pnl
+        results[client] = (equity, margin)
+    return results
+
+
+@pytest.mark.parametrize('hedged_margin_ratio', [0.0, 0.5, 1.0])
+@pytest.mark.parametrize('volume_tiers', [None, ((1000000, 1.0), (5000000, 2.0), (np.inf, 4.0))])
+def test_account_margin_matches_brute_force(hedged_margin_ratio, volume_tiers):
+    positions, accounts = _book(np.random.default_rng(24))
+    result = account_margin(positions, accounts, hedged_margin_ratio, volume_tiers)
+    expected = _brute_force(positions, accounts, hedged_margin_ratio, volume_tiers)
+    by_account = result['accounts'].set_index('Client ID')
+    for client, (equity, margin) in expected.items():
+        assert by_account.loc[client, 'Equity'] == pytest.approx(equity, rel=1e-9)
+        assert by_account.loc[client, 'Used Margin'] == pytest.approx(margin, rel=1e-9)
+        assert by_account.loc[client, 'Margin Level'] == pytest.approx(equity / margin * 100, rel=1e-9)
+
+
+def test_hedging_ratio_charges_net_then_larger_leg_then_gross():
+    positions = pd.DataFrame({'Client ID': ['A', 'A'], 'Instrument': ['EUR/USD', 'EUR/USD'],
+                              'Direction': ['Buy', 'Sell'], 'Lots': [3.0, 1.0],
+                              'Entry': [1.10, 1.10], 'Current': [1.10, 1.10]})
+    accounts = pd.DataFrame({'Client ID': ['A'], 'Balance': [100000.0]})
+    margin_lots = [account_margin(positions, accounts, ratio)['by_instrument']['Margin Lots'].iloc[0]
+                   for ratio in (0.0, 0.5, 1.0)]
+    assert margin_lots == pytest.approx([2.0, 3.0, 4.0])
+
+
+def test_tiers_charge_each_band_at_its_own_rate():
+    tiers = ((1000000, 1.0), (5000000, 2.0), (np.inf, 4.0))
+    margins = tiered_margin([500000, 1000000, 3000000, 7000000], 0.01, tiers)
+    np.testing.assert_allclose(margins, [5000, 10000, 50000, 10000 + 80000 + 80000])
+    assert tiered_margin(7000000, 0.01) == pytest.approx(70000)
+
+
+def test_usd_base_notional_is_not_scaled_by_price():
+    ids = np.array([INSTRUMENTS.id('USD/JPY'), INSTRUMENTS.id('EUR/USD')])
+    notional = position_notional(ids, np.array([1.0, -2.0]), np.array([150.0, 1.10]))
+    np.testing.assert_allclose(notional, [100000, 220000])
+
+
+def test_leverage_floors_the_margin_rate():
+    positions = pd.DataFrame({'Client ID': ['A'], 'Instrument': ['EUR/USD'], 'Direction': ['Buy'], 'Lots': [1.0],
+                              'Entry': [1.10], 'Current': [1.10]})
+    low = account_margin(positions, pd.DataFrame({'Client ID': ['A'], 'Balance': [1e5], 'Leverage': [10.0]}))
+    high = account_margin(positions, pd.DataFrame({'Client ID': ['A'], 'Balance': [1e5], 'Leverage': [1000.0]}))
+    assert low['total_used_margin'] == pytest.approx(110000 / 10)
+    assert high['total_used_margin'] == pytest.approx(110000 * INSTRUMENTS.margin_rate[INSTRUMENTS.id('EUR/USD')])
+
+
+def test_missing_accounts_raise():
+    positions, accounts = _book(np.random.default_rng(1), 20, 3)
+    with pytest.raises(KeyError):
+        account_margin(positions, accounts.iloc[1:])
+    with pytest.raises(ValueError):
+        account_margin(positions)
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk_engine.broker import calculate_position_metrics
+from risk_engine.monitor import monitor_positions
+
+
+def _positions():
+    return pd.DataFrame({
+        'Client ID': ['C1', 'C2', 'C3', 'C4'],
+        'Instrument': ['USD/JPY', 'XAU/USD', 'EUR/USD', 'EUR/JPY'],
+        'Direction': ['Long', 'Short', 'Long', 'Short'],
+        'Lots': [2.0, 1.0, 8.0, 6.0],
+        'Entry': [150.0, 2000.0, 1.10, 165.0],
+        'Current': [151.0, 1990.0, 1.09, 165.0],
+        'Equity': [2000.0, 50000.0, 100000.0, 10000.0]
+    })
+
+
+def test_jpy_and_metal_pip_values():
+    table = monitor_positions(_positions())['positions']
+    # JPY pip on a USD-base pair is converted at the current price; gold is 0.01 x 100 oz
+    np.testing.assert_allclose(table['Pip Value'], [1000 / 151, 1.0, 10.0, 1000 / 150])
+    np.testing.assert_allclose(table['Pips'], [100, 1000, -100, 0])
+    np.testing.assert_allclose(table['P&L'], [100 * 1000 / 151 * 2, 1000, -8000, 0])
+    np.testing.assert_allclose(table['Margin Used'], [2000, 10000, 8800, 13200])
+
+
+def test_metrics_match_the_single_position_calculator():
+    positions = _positions()
+    table = monitor_positions(positions)['positions']
+    for row, metrics in zip(positions.to_dict('records'), table.to_dict('records')):
+        expected = calculate_position_metrics(row['Instrument'], row['Direction'], row['Lots'], row['Entry'],
+                                              row['Current'], row['Equity'])
+        assert metrics['Pips'] == pytest.approx(expected['pip_movement'])
+        assert metrics['P&L'] == pytest.approx(expected['pnl'])
+        assert metrics['Margin Level'] == pytest.approx(expected['margin_level'])
+
+
+def test_alerts_put_margin_calls_first_then_large_positions():
+    result = monitor_positions(_positions(), margin_call_level=150.0, large_position_lots=5.0)
+    alerts = result['alerts']
+    # EUR/JPY is both large and under-margined: the margin call wins
+    assert alerts['Instrument'].tolist() == ['EUR/JPY', 'USD/JPY', 'EUR/USD']
+    assert alerts['Alert'].tolist() == ['Margin Call Risk', 'Margin Call Risk', 'Large Position']
+    assert alerts['Margin Level'].iloc[0] == pytest.approx(10000 / 13200 * 100)
+    assert result['positions_at_risk'] == 2
+    assert result['large_positions'] == 2
+    assert (result['winning_positions'], result['losing_positions']) == (2, 1)
+    assert result['total_pnl'] == pytest.approx(200000 / 151 + 1000 - 8000)
+
+    # Thresholds are strict: USD/JPY sits exactly at 100% and EUR/USD at 8 lots
+    at_threshold = monitor_positions(_positions(), margin_call_level=100.0, large_position_lots=8.0)
+    assert at_threshold['alerts']['Instrument'].tolist() == ['EUR/JPY']
+    quiet = monitor_positions(_positions(), margin_call_level=50.0, large_position_lots=8.0)
+    assert quiet['alerts'].empty
+
+
+def test_missing_columns_raise():
+    with pytest.raises(ValueError, match='Equity'):
+        monitor_positions(_positions().drop(columns='Equity'))
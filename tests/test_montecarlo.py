@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from risk_engine.montecarlo import ReturnHistogram, chunk_sizes, monte_carlo_var
+from risk_engine.trader import calculate_var
+
+
+def test_chunk_sizes_cover_all_paths():
+    assert chunk_sizes(250, 100) == [100, 100, 50]
+    assert chunk_sizes(200, 100) == [100, 100]
+
+
+def test_var_within_one_bin_of_raw_percentile():
+    num_paths, num_bins, num_sigmas = 50000, 4000, 8.0
+    result = monte_carlo_var(1000.0, 2.0, time_horizon=5, num_paths=num_paths, chunk_size=num_paths,
+                             seed=7, num_bins=num_bins, num_sigmas=num_sigmas, sample_size=num_paths)
+    returns = result['sample'][:, 0]
+    bin_width = 2 * num_sigmas * 0.02 * np.sqrt(5) / num_bins
+
+    for level, var_return, es_return in zip(result['confidence_levels'], result['var_return'][:, 0],
+                                            result['es_return'][:, 0]):
+        exact_var = calculate_var(returns, level)
+        assert abs(var_return - exact_var) <= bin_width
+        assert abs(es_return - returns[returns <= exact_var].mean()) <= bin_width
+
+
+def test_one_day_var_matches_analytic_normal_quantile():
+    result = monte_carlo_var([1000.0, 5000.0], [1.0, 3.0], confidence_levels=(0.95, 0.99),
+                             num_paths=400000, seed=1)
+    z = np.array([[1.6448536], [2.3263479]])
+    np.testing.assert_allclose(result['var_return'], -z * [0.01, 0.03], rtol=0.01)
+    np.testing.assert_allclose(result['var_amount'], z * [10.0, 150.0], rtol=0.01)
+
+
+def test_runs_are_reproducible_from_the_seed():
+    first = monte_carlo_var(1000.0, 2.0, num_paths=30000, chunk_size=7000, seed=3)
+    second = monte_carlo_var(1000.0, 2.0, num_paths=30000, chunk_size=7000, seed=3)
+    np.testing.assert_array_equal(first['histogram'].counts, second['histogram'].counts)
+    assert first['num_paths'] == 30000
+
+
+def test_histogram_merge_requires_identical_edges():
+    histogram = ReturnHistogram([-0.1], [0.1], num_bins=10)
+    with pytest.raises(ValueError):
+        histogram.merge(ReturnHistogram([-0.2], [0.1], num_bins=10))
+
+
+@pytest.mark.parametrize('workers', [2, 3])
+def test_process_pool_is_bit_identical_to_one_worker(workers):
+    kwargs = dict(portfolio_values=[1000.0, 2500.0], daily_volatility=[1.5, 2.5], time_horizon=3,
+                  num_paths=40000, chunk_size=5000, seed=11, sample_size=100)
+    serial = monte_carlo_var(**kwargs)
+    pooled = monte_carlo_var(workers=workers, **kwargs)
+    np.testing.assert_array_equal(pooled['histogram'].counts, serial['histogram'].counts)
+    np.testing.assert_array_equal(pooled['var_return'], serial['var_return'])
+    np.testing.assert_array_equal(pooled['es_return'], serial['es_return'])
+    np.testing.assert_array_equal(pooled['sample'], serial['sample'])
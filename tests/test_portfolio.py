@@ -0,0 +1,126 @@
+import io
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk_engine.portfolio import (
+    CovarianceCache, align_positions, covariance_from_returns, load_positions, load_return_history, parametric_var,
+    summarize_portfolio
+)
+
+BOOK = [('AAPL', 120.0, 189.5), ('MSFT', 40.0, 412.25), ('TSLA', 15.0, 251.1), ('SPY', 10.0, 520.0),
+        ('CASH', 2500.0, 1.0)]
+
+
+def _upload(frame, name='positions.csv'):
+    buffer = io.BytesIO(frame.to_csv(index=False).encode())
+    buffer.name = name
+    return buffer
+
+
+def test_summary_matches_row_by_row_arithmetic():
+    positions = load_positions(_upload(pd.DataFrame(BOOK, columns=['symbol', ' Shares', 'PRICE'])))
+    summary = summarize_portfolio(positions)
+
+    values = [shares * price for _, shares, price in BOOK]
+    total = sum(values)
+    weights = [round(value / total * 100, 2) for value in values]
+    assert summary['total_value'] == pytest.approx(total)
+    assert summary['num_positions'] == summary['num_symbols'] == len(BOOK)
+    assert summary['positions']['Value'].tolist() == pytest.approx(values)
+    assert summary['positions']['Weight (%)'].tolist() == pytest.approx(weights)
+    assert summary['largest_weight'] == pytest.approx(max(values) / total * 100)
+    assert summary['top_n_weight'] == pytest.approx(100)
+    assert summary['hhi'] == pytest.approx(sum((value / total) ** 2 for value in values))
+    assert summary['by_symbol']['Symbol'].iloc[0] == max(BOOK, key=lambda row: row[1] * row[2])[0]
+
+
+def test_repeated_symbols_roll_up_and_value_can_replace_shares_and_price():
+    positions = load_positions(_upload(pd.DataFrame({'Symbol': ['AAPL', 'MSFT', 'AAPL'],
+                                                     'Value': [300.0, 500.0, 200.0]})))
+    summary = summarize_portfolio(positions, top_n=1)
+    by_symbol = summary['by_symbol'].set_index('Symbol')
+    assert by_symbol.loc['AAPL', 'Value'] == 500.0
+    assert summary['num_positions'] == 3 and summary['num_symbols'] == 2
+    assert summary['largest_weight'] == pytest.approx(50)
+    assert summary['top_n_weight'] == pytest.approx(50)
+
+    with pytest.raises(ValueError, match='Price'):
+        load_positions(_upload(pd.DataFrame({'Symbol': ['AAPL'], 'Shares': [1.0]})))
+
+
+def test_empty_portfolio_has_zero_weights():
+    summary = summarize_portfolio(pd.DataFrame({'Symbol': ['A'], 'Value': [0.0]}))
+    assert summary['total_value'] == 0
+    assert summary['largest_weight'] == 0 and summary['hhi'] == 0
+
+
+@pytest.mark.parametrize('confidence_level', [0.90, 0.95, 0.99])
+@pytest.mark.parametrize('correlation', [-0.6, 0.0, 0.8])
+def test_parametric_var_matches_the_two_asset_closed_form(confidence_level, correlation):
+    a, b = 600000.0, -250000.0
+    s1, s2 = 0.012, 0.02
+    covariance = [[s1 ** 2, correlation * s1 * s2], [correlation * s1 * s2, s2 ** 2]]
+    sigma = np.sqrt((a * s1) ** 2 + (b * s2) ** 2 + 2 * a * b * correlation * s1 * s2)
+    z = NormalDist().inv_cdf(confidence_level)
+
+    risk = parametric_var([a, b], covariance, confidence_level, time_horizon=10)
+    assert risk['portfolio_sigma'][0] == pytest.approx(sigma)
+    assert risk['var_amount'][0] == pytest.approx(z * sigma * np.sqrt(10))
+    # d sigma / d a = (a s1^2 + b rho s1 s2) / sigma
+    marginal = z * np.sqrt(10) * np.array([a * s1 ** 2 + b * correlation * s1 * s2,
+                                           b * s2 ** 2 + a * correlation * s1 * s2]) / sigma
+    np.testing.assert_allclose(risk['marginal_var'][0], marginal)
+    assert risk['component_var'][0].sum() == pytest.approx(risk['var_amount'][0])
+    assert risk['contribution_pct'][0].sum() == pytest.approx(100)
+
+
+def test_parametric_var_evaluates_many_portfolios_at_once():
+    covariance = covariance_from_returns(np.random.default_rng(7).normal(0, 0.01, (500, 3)))
+    portfolios = np.random.default_rng(8).normal(0, 1e5, (20, 3))
+    batch = parametric_var(portfolios, covariance)
+    for i, positions in enumerate(portfolios):
+        assert batch['var_amount'][i] == pytest.approx(parametric_var(positions, covariance)['var_amount'][0])
+    assert parametric_var(np.zeros(3), covariance)['contribution_pct'].sum() == 0
+
+
+def test_covariance_cache_loads_once_per_universe_and_date():
+    calls = []
+    returns = np.random.default_rng(2).normal(0, 0.01, (100, 2))
+
+    def loader():
+        calls.append(1)
+        return returns
+
+    cache = CovarianceCache(max_entries=2)
+    universe, covariance = cache.get(['EUR', 'JPY'], '2026-10-16', loader=loader)
+    np.testing.assert_allclose(covariance, np.cov(returns, rowvar=False))
+    assert cache.get(['EUR', 'JPY'], '2026-10-16', loader=loader)[1] is covariance
+    assert (cache.hits, cache.misses, len(calls)) == (1, 1, 1)
+
+    cache.get(['EUR', 'JPY'], '2026-10-17', loader=loader)
+    cache.get(['EUR'], '2026-10-17', returns=returns[:, :1])
+    assert len(cache.entries) == 2
+    assert (('EUR', 'JPY'), '2026-10-16') not in cache.entries
+    with pytest.raises(KeyError):
+        cache.get(['EUR', 'JPY'], '2026-10-16')
+
+
+def test_return_history_reads_only_the_requested_columns():
+    frame = pd.DataFrame({'Date': ['d1', 'd2', 'd3'], 'AAPL': [0.01, np.nan, -0.02],
+                          'MSFT': [0.0, 0.01, 0.02], 'TSLA': [0.05, -0.05, 0.0]})
+    upload = io.BytesIO(frame.to_csv(index=False).encode())
+    upload.name = 'returns.csv'
+    np.testing.assert_array_equal(load_return_history(upload, ['TSLA', 'AAPL']), frame[['TSLA', 'AAPL']].to_numpy())
+    with pytest.raises(KeyError, match='NVDA'):
+        load_return_history(upload, ['AAPL', 'NVDA'])
+    # gappy rows are dropped before estimating
+    assert covariance_from_returns(frame[['AAPL', 'MSFT']].to_numpy()).shape == (2, 2)
+
+
+def test_align_positions_sums_repeats_and_rejects_unknown_symbols():
+    np.testing.assert_array_equal(align_positions(['B', 'A', 'B'], [1.0, 2.0, 3.0], ['A', 'B', 'C']), [2.0, 4.0, 0.0])
+    with pytest.raises(KeyError):
+        align_positions(['D'], [1.0], ['A', 'B'])
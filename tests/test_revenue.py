@@ -0,0 +1,51 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk_engine.revenue import iter_trade_chunks, project_revenue
+
+
+def _trades(n=2500, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Time': pd.Timestamp('2026-10-01') + pd.to_timedelta(rng.integers(0, 5 * 86400, n), unit='s'),
+        'Instrument': rng.choice(['EUR/USD', 'USD/JPY', 'XAU/USD'], n),
+        'Lots': rng.uniform(-5, 5, n),
+        'Client Group': rng.choice(['Retail', 'Pro'], n)
+    })
+
+
+class _Upload(io.BytesIO):
+    """File-like upload carrying a file name, like Streamlit's UploadedFile"""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def test_file_uploads_are_streamed_in_chunks():
+    trades = _trades()
+    csv = _Upload(trades.to_csv(index=False).encode(), 'trades.csv')
+    sizes = [len(chunk) for chunk in iter_trade_chunks(csv, chunk_rows=1000)]
+    assert sizes == [1000, 1000, 500]
+
+    buffer = io.BytesIO()
+    trades.to_parquet(buffer)
+    parquet = _Upload(buffer.getvalue(), 'trades.parquet')
+    chunks = list(iter_trade_chunks(parquet, chunk_rows=1000))
+    assert sum(len(chunk) for chunk in chunks) == len(trades)
+    assert max(len(chunk) for chunk in chunks) <= 1000
+
+
+def test_projection_is_independent_of_source_and_chunking():
+    trades = _trades()
+    whole = project_revenue(trades, spread_pips=1.2, commission_per_lot=7.0)
+    streamed = project_revenue(_Upload(trades.to_csv(index=False).encode(), 'trades.csv'),
+                               spread_pips=1.2, commission_per_lot=7.0, chunk_rows=700)
+
+    assert streamed['num_trades'] == whole['num_trades'] == len(trades)
+    assert streamed['total_revenue'] == pytest.approx(whole['total_revenue'])
+    pd.testing.assert_frame_equal(streamed['by_instrument'], whole['by_instrument'], check_exact=False)
+    assert whole['commission_revenue'] == pytest.approx(7.0 * trades['Lots'].abs().sum())
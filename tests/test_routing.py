@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk_engine.broker import analyze_booking, recommend_booking
+from risk_engine.routing import OrderRouter, benchmark_router
+
+
+def _clients(rng, count=2000):
+    """Random booking table whose Avg Trade Size is not Total Volume / Total Trades"""
+    trades = rng.integers(1, 500, count)
+    return pd.DataFrame({
+        'Client ID': [f'C{i:05d}' for i in range(count)],
+        'Total Trades': trades,
+        'Win Rate': rng.uniform(20, 80, count),
+        'Avg Trade Size': rng.uniform(0.1, 8, count),
+        'Avg Hold Time': rng.exponential(24, count),
+        'Total Volume': trades * rng.uniform(0.1, 8, count),
+        'Client P&L': rng.normal(0, 2000, count),
+        'Commission Revenue': trades * rng.uniform(1, 20, count)
+    })
+
+
+@pytest.mark.parametrize('risk_tolerance', ['Conservative', 'Moderate', 'Aggressive'])
+def test_loaded_routes_match_analyze_booking(risk_tolerance):
+    clients = _clients(np.random.default_rng(23))
+    router = OrderRouter(lp_commission_cost=5.0, risk_tolerance=risk_tolerance).load(clients)
+    expected = analyze_booking(clients, 5.0, risk_tolerance)
+    routes = [router.route(client_id) for client_id in clients['Client ID']]
+    assert routes == expected['Recommendation'].tolist()
+
+
+def test_tape_toxic_flags_are_used_as_given():
+    clients = _clients(np.random.default_rng(5))
+    clients['Toxic Flow'] = np.random.default_rng(6).random(len(clients)) < 0.3
+    router = OrderRouter().load(clients)
+    expected = analyze_booking(clients, 5.0, "Moderate")
+    assert [router.route(c) for c in clients['Client ID']] == expected['Recommendation'].tolist()
+
+
+def test_clients_without_trades_get_the_default_route():
+    clients = _clients(np.random.default_rng(1), 4)
+    clients.loc[[1, 3], ['Total Trades', 'Win Rate', 'Avg Trade Size', 'Total Volume']] = 0
+    router = OrderRouter(default_route="Hybrid").load(clients)
+    assert router.route('C00001') == router.route('C00003') == "Hybrid"
+    assert router.route('unknown') == "Hybrid"
+
+
+def test_record_close_follows_the_scalar_rule():
+    router = OrderRouter(lp_commission_cost=5.0, risk_tolerance="Moderate")
+    assert router.route('new') == "A-Book"
+    rng = np.random.default_rng(9)
+    for _ in range(50):
+        lots, pnl = rng.uniform(0.1, 3), rng.normal(-20, 100)
+        route = router.record_close('new', lots, pnl, hold_hours=5.0, commission=lots * 7)
+
+    profile = router.profiles().iloc[0]
+    expected, _ = recommend_booking(False, profile['Win Rate'], profile['Avg Trade Size'],
+                                    profile['Commission Revenue'] - profile['Total Volume'] * 5.0,
+                                    profile['Commission Revenue'] - profile['Client P&L'], "Moderate")
+    assert route == router.route('new') == expected
+    assert profile['Avg Trade Size'] == pytest.approx(profile['Total Volume'] / 50)
+
+
+def test_closes_extend_the_loaded_average_trade_size():
+    clients = pd.DataFrame({'Client ID': ['A'], 'Total Trades': [10], 'Win Rate': [50.0], 'Avg Trade Size': [2.0],
+                            'Total Volume': [5.0], 'Client P&L': [0.0], 'Commission Revenue': [100.0]})
+    router = OrderRouter().load(clients)
+    router.record_close('A', 4.0, 10.0)
+    profile = router.profiles().iloc[0]
+    assert profile['Avg Trade Size'] == pytest.approx(24.0 / 11)
+    assert profile['Total Volume'] == pytest.approx(9.0)
+
+
+def test_large_orders_always_go_to_the_a_book():
+    clients = _clients(np.random.default_rng(2), 50)
+    router = OrderRouter(max_bbook_lots=2.0).load(clients)
+    assert all(router.route(c, lots=3.0) == "A-Book" for c in clients['Client ID'])
+
+
+def test_profiles_grow_past_capacity():
+    router = OrderRouter(capacity=4).load(_clients(np.random.default_rng(4), 10))
+    assert len(router) == 10
+    assert len(router.profiles()) == 10
+
+
+def test_benchmark_reports_latencies():
+    result = benchmark_router(num_clients=1000, num_orders=2000)
+    assert result['clients'] == 1000
+    assert result['route']['calls'] + result['record_close']['calls'] == 2000
+    assert result['route']['p50_us'] > 0
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk_engine.fx import conversion_table
+from risk_engine.margin import account_margin
+from risk_engine.stopout import DEFAULT_SHOCKS, shock_scenarios, simulate_stop_outs
+
+SYMBOLS = ['EUR/USD', 'USD/JPY', 'GBP/USD', 'EUR/JPY', 'XAU/USD']
+
+
+def _book(rng, num_positions=120, num_accounts=30):
+    instruments = rng.choice(SYMBOLS, num_positions)
+    table = conversion_table()
+    mid = np.array([table.rate(*symbol.split('/')) for symbol in instruments])
+    positions = pd.DataFrame({
+        'Client ID': rng.choice([f'A{i}' for i in range(num_accounts)], num_positions),
+        'Instrument': instruments,
+        'Direction': rng.choice(['Buy', 'Sell'], num_positions),
+        'Lots': rng.uniform(0.5, 5, num_positions).round(2),
+        'Entry': mid * (1 + rng.normal(0, 0.002, num_positions)),
+        'Current': mid
+    })
+    # Thin balances so the shocks push accounts through margin call, stop out and below zero
+    accounts = pd.DataFrame({
+        'Client ID': [f'A{i}' for i in range(num_accounts)],
+        'Balance': rng.uniform(2000, 40000, num_accounts),
+        'Leverage': 100.0
+    })
+    return positions, accounts
+
+
+def _reprice(positions, accounts, moves, hedged_margin_ratio):
+    """Rerun account_margin with Current moved by each instrument's relative shock"""
+    shocked = positions.copy()
+    shocked['Current'] = shocked['Current'] * (1 + shocked['Instrument'].map(moves).fillna(0.0))
+    result = account_margin(shocked, accounts, hedged_margin_ratio, margin_call_level=100, stop_out_level=50)
+    by_account = result['accounts']
+    equity = by_account['Equity'].to_numpy()
+    before = account_margin(positions, accounts, hedged_margin_ratio)['accounts'].set_index('Client ID')
+    before = before.loc[by_account['Client ID'], 'Equity'].to_numpy()
+    stopped = by_account['Stop Out'].to_numpy()
+    return {
+        'Margin Call': int(by_account['Margin Call'].sum()),
+        'Stop Out': int(stopped.sum()),
+        'Negative Equity': int((equity < 0).sum()),
+        'Client Equity Lost': float(np.where(stopped, np.maximum(before - np.maximum(equity, 0), 0), 0).sum()),
+        'Broker Loss': float(np.maximum(-equity, 0).sum())
+    }
+
+
+@pytest.mark.parametrize('hedged_margin_ratio', [0.0, 0.5, 1.0])
+def test_single_instrument_shocks_match_repricing(hedged_margin_ratio):
+    positions, accounts = _book(np.random.default_rng(25))
+    result = simulate_stop_outs(positions, accounts, hedged_margin_ratio=hedged_margin_ratio, chunk_accounts=7)
+    scenarios = result['scenarios']
+    assert len(scenarios) == len(set(positions['Instrument'])) * len(DEFAULT_SHOCKS)
+    assert scenarios['Stop Out'].max() > 0 and scenarios['Broker Loss'].max() > 0
+
+    for row in scenarios.to_dict('records'):
+        expected = _reprice(positions, accounts, {row['Instrument']: row['Shock']}, hedged_margin_ratio)
+        for column in ('Margin Call', 'Stop Out', 'Negative Equity'):
+            assert row[column] == expected[column], (row['Instrument'], row['Shock'], column)
+        for column in ('Client Equity Lost', 'Broker Loss'):
+            assert row[column] == pytest.approx(expected[column], rel=1e-9, abs=1e-6)
+
+
+def test_joint_moves_match_repricing():
+    rng = np.random.default_rng(8)
+    positions, accounts = _book(rng)
+    scenarios = pd.DataFrame({symbol: rng.normal(0, 0.04, 25) for symbol in SYMBOLS})
+    result = simulate_stop_outs(positions, accounts, scenarios)['scenarios']
+    for i, row in result.iterrows():
+        expected = _reprice(positions, accounts, scenarios.loc[i].to_dict(), 0.5)
+        assert row['Stop Out'] == expected['Stop Out']
+        assert row['Broker Loss'] == pytest.approx(expected['Broker Loss'], rel=1e-9, abs=1e-6)
+
+
+def test_chunking_does_not_change_results():
+    positions, accounts = _book(np.random.default_rng(3))
+    whole = simulate_stop_outs(positions, accounts)['scenarios']
+    chunked = simulate_stop_outs(positions, accounts, chunk_accounts=4)['scenarios']
+    pd.testing.assert_frame_equal(whole, chunked, check_exact=False, rtol=1e-12)
+
+
+def test_worst_scenario_is_the_largest_broker_loss():
+    positions, accounts = _book(np.random.default_rng(4))
+    result = simulate_stop_outs(positions, accounts)
+    assert result['worst_scenario']['Broker Loss'] == result['max_broker_loss']
+    assert result['max_broker_loss'] == result['scenarios']['Broker Loss'].max()
+
+
+def test_shock_scenarios_cover_every_instrument_and_shock():
+    scenarios = shock_scenarios(['EUR/USD', 'US30'], [-0.05, 0.05])
+    assert scenarios.values.tolist() == [['EUR/USD', -0.05], ['EUR/USD', 0.05], ['US30', -0.05], ['US30', 0.05]]
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from risk_engine.streaming import QuantileSketch, RollingSharpe, StreamingVaR
+from risk_engine.trader import calculate_sharpe_ratio, calculate_var
+
+
+def test_rolling_sharpe_matches_batch_sharpe_on_the_window():
+    returns = np.random.default_rng(0).normal(0.0005, 0.01, 1000)
+    rolling = RollingSharpe(window=252)
+    for i, daily_return in enumerate(returns):
+        value = rolling.update(daily_return)
+        if i >= 251 and i % 97 == 0:
+            assert value == pytest.approx(calculate_sharpe_ratio(returns[i - 251:i + 1]), rel=1e-9)
+
+
+def test_sketch_quantiles_within_relative_accuracy():
+    returns = np.random.default_rng(1).standard_t(4, 20000) * 0.01
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    sketch.add_many(returns)
+    ordered = np.sort(returns)
+    for q in (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99):
+        exact = ordered[int(q * (len(returns) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * abs(exact) + 1e-12
+
+
+def test_streaming_var_tracks_calculate_var():
+    returns = np.random.default_rng(2).normal(0, 0.02, 50000)
+    var = StreamingVaR(confidence_level=0.95, relative_accuracy=0.005)
+    var.update_many(returns)
+    assert var.value == pytest.approx(calculate_var(returns, 0.95), rel=0.01)
+
+
+def test_add_and_add_many_agree_and_skip_nan():
+    values = [0.01, -0.02, np.nan, 0.0, 1e-12, 0.03, np.nan, -0.005]
+    one_by_one, batched = QuantileSketch(), QuantileSketch()
+    for value in values:
+        one_by_one.add(value)
+    batched.add_many(values)
+
+    for sketch in (one_by_one, batched):
+        assert sketch.count == 6
+        assert sketch.zero_count == 2
+    assert one_by_one.positive == batched.positive
+    assert one_by_one.negative == batched.negative
+
+
+def test_merged_sketch_equals_single_sketch():
+    returns = np.random.default_rng(3).normal(0, 0.01, 5000)
+    whole, left, right = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    whole.add_many(returns)
+    left.add_many(returns[:2000])
+    right.add_many(returns[2000:])
+    left.merge(right)
+    assert left.positive == whole.positive and left.negative == whole.negative
+    assert left.quantile(0.05) == whole.quantile(0.05)
+
+    with pytest.raises(ValueError):
+        left.merge(QuantileSketch(relative_accuracy=0.02))
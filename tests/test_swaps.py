@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk_engine.broker import calculate_pip_value, calculate_swap, contract_size_for
+from risk_engine.fx import DEFAULT_QUOTES
+from risk_engine.instruments import INSTRUMENTS
+from risk_engine.swaps import (
+    RolloverCalendar, calendar_for_period, settle_swaps, settlement_days_for, triple_swap_weekday_for
+)
+
+# Monday 12 October 2026
+MONDAY = '2026-10-12'
+
+
+def _week(**kwargs):
+    calendar = RolloverCalendar('2026-10-01', '2026-11-01', **kwargs)
+    _, multiplier, cumulative = calendar.schedule(MONDAY, 7)
+    return multiplier.tolist(), int(cumulative[-1])
+
+
+@pytest.mark.parametrize('symbol, week', [
+    ('EUR/USD', [1, 1, 3, 1, 1, 0, 0]),   # T+2: Wednesday's value date skips the weekend
+    ('USD/CAD', [1, 1, 1, 3, 1, 0, 0]),   # T+1: Thursday
+    ('US30', [1, 1, 1, 1, 3, 0, 0]),      # fixed Friday triple for CFDs
+])
+def test_triple_swap_weekday_follows_the_settlement_convention(symbol, week):
+    multiplier, total = _week(settlement_days=settlement_days_for(symbol),
+                              triple_swap_weekday=triple_swap_weekday_for(symbol))
+    assert multiplier == week
+    assert total == 7
+
+
+@pytest.mark.parametrize('holidays, settlement_days, week', [
+    # Friday holiday: Tuesday's value date (Thursday) now rolls to Monday
+    (['2026-10-16'], 2, [1, 4, 1, 1, 0, 0, 0]),
+    # Thursday holiday under T+1: no rollover that day and Tuesday picks up an extra day
+    (['2026-10-15'], 1, [1, 2, 3, 0, 1, 0, 0]),
+])
+def test_holidays_move_the_multiplier_within_the_week(holidays, settlement_days, week):
+    multiplier, total = _week(holidays=holidays, settlement_days=settlement_days)
+    assert multiplier == week
+    assert total == 7
+
+
+def test_any_seven_days_charge_seven_swap_days():
+    calendar = calendar_for_period('2026-01-01', 365)
+    opens = np.arange(np.datetime64('2026-01-01'), np.datetime64('2026-12-20'))
+    np.testing.assert_array_equal(calendar.swap_days(opens, opens + 7), 7)
+    assert calendar.swap_days('2026-01-05', '2026-01-05') == 0
+
+
+def test_calculate_swap_counts_triple_days_and_accrues_daily():
+    swap = calculate_swap(1, 100000, -2.0, 0, 14, open_date=MONDAY, pip_value=10.0)
+    assert swap['triple_swap_days'] == 2
+    assert swap['total_swap_days'] == 14
+    assert swap['cumulative_swap_days'][:3].tolist() == [1, 2, 5]
+    assert swap['total_swap_charge'] == pytest.approx(-20.0 * 14)
+
+
+def test_calendar_rejects_dates_outside_its_range():
+    calendar = RolloverCalendar('2026-10-01', '2026-11-01')
+    with pytest.raises(ValueError):
+        calendar.swap_days('2026-09-30', '2026-10-05')
+    with pytest.raises(ValueError):
+        calendar.schedule('2026-10-28', 7)
+
+
+def _swap_rates(markup=10.0):
+    return pd.DataFrame({'Long Swap': INSTRUMENTS.long_swap, 'Short Swap': INSTRUMENTS.short_swap,
+                         'Markup (%)': markup}, index=INSTRUMENTS.symbols)
+
+
+@pytest.mark.parametrize('trade_date', ['2026-10-12', '2026-10-14', '2026-10-15', '2026-10-16'])
+def test_settlement_matches_calculate_swap_per_position(trade_date):
+    book = pd.DataFrame({
+        'Instrument': ['EUR/USD', 'USD/JPY', 'GBP/JPY', 'USD/CAD', 'XAU/USD', 'XAG/USD', 'US30', 'GER40', 'USOIL'],
+        'Lots': [1.0, 2.5, 0.3, 1.0, 1.0, 4.0, 1.0, 2.0, 0.5],
+        'Direction': ['Buy', 'Sell', 'Buy', 'Sell', 'Buy', 'Sell', 'Buy', 'Sell', 'Buy']
+    })
+    rates = _swap_rates()
+    settled = settle_swaps(book, rates, trade_date)['positions']
+
+    for row in settled.to_dict('records'):
+        symbol, lots = row['Instrument'], row['Lots']
+        contract_size = contract_size_for(symbol)
+        base_rate = rates.loc[symbol, 'Long Swap' if row['Direction'] == 'Buy' else 'Short Swap']
+        expected = calculate_swap(lots, contract_size, base_rate, 10.0, 1, open_date=trade_date,
+                                  settlement_days=settlement_days_for(symbol),
+                                  triple_swap_weekday=triple_swap_weekday_for(symbol),
+                                  pip_value=calculate_pip_value(symbol, 'USD', lots, contract_size,
+                                                                DEFAULT_QUOTES.get(symbol)))
+        assert row['Swap Days'] == expected['total_swap_days'], symbol
+        assert row['Swap Charge'] == pytest.approx(expected['total_swap_charge']), symbol
+        assert row['Broker Revenue'] == pytest.approx(expected['broker_revenue_total']), symbol
+
+
+def test_explicit_columns_override_the_registry():
+    book = pd.DataFrame({'Instrument': ['XAU/USD', 'XAU/USD'], 'Lots': [1.0, 1.0], 'Contract Size': [np.nan, 10.0]})
+    rates = _swap_rates(0.0).loc[['XAU/USD']]
+    wednesday = settle_swaps(book, rates, '2026-10-14')['positions']['Swap Charge'].to_numpy()
+    # 1 pip per lot of 100 oz; 10 oz is a tenth of that
+    np.testing.assert_allclose(wednesday, INSTRUMENTS.long_swap[INSTRUMENTS.id('XAU/USD')] * 3 * np.array([1.0, 0.1]))
+
+    rates['Pip Value'] = 5.0
+    charges = settle_swaps(book, rates, '2026-10-14')['positions']['Swap Charge'].to_numpy()
+    np.testing.assert_allclose(charges, wednesday * 5)
+
+
+def test_instruments_outside_the_registry_use_the_defaults():
+    rates = pd.DataFrame({'Long Swap': [-1.0], 'Short Swap': [0.5], 'Markup (%)': [0.0]}, index=['ZZZ/USD'])
+    book = pd.DataFrame({'Instrument': ['ZZZ/USD'], 'Lots': [2.0]})
+    assert settle_swaps(book, rates, '2026-10-13')['total_swap_charge'] == pytest.approx(-20.0)
+
+
+def test_unknown_instruments_raise():
+    book = pd.DataFrame({'Instrument': ['EUR/USD', 'NOPE'], 'Lots': [1.0, 1.0]})
+    with pytest.raises(KeyError):
+        settle_swaps(book, _swap_rates(), '2026-10-14')
+
+
+def test_missing_direction_is_rejected():
+    book = pd.DataFrame({'Instrument': ['EUR/USD', 'EUR/USD'], 'Lots': [1.0, 1.0], 'Direction': ['Sell', None]})
+    with pytest.raises(ValueError, match='bad rows: 1'):
+        settle_swaps(book, _swap_rates(), '2026-10-14')
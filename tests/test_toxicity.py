@@ -0,0 +1,96 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk_engine.toxicity import QuoteTape, toxicity_features
+
+
+class _Upload(io.BytesIO):
+    """In-memory file with a name, like a Streamlit upload"""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def _tapes(rng, num_quotes=3000, num_fills=400):
+    start = pd.Timestamp('2026-10-05 08:00')
+    quote_times = start + pd.to_timedelta(np.sort(rng.uniform(0, 3600, num_quotes)), unit='s')
+    instruments = rng.choice(['EUR/USD', 'USD/JPY'], num_quotes)
+    mid = np.where(instruments == 'EUR/USD', 1.10, 150.0) * (1 + rng.normal(0, 1e-4, num_quotes))
+    half_spread = np.where(instruments == 'EUR/USD', 0.00005, 0.005)
+    quotes = pd.DataFrame({'Time': quote_times, 'Instrument': instruments,
+                           'Bid': mid - half_spread, 'Ask': mid + half_spread})
+
+    fill_times = start + pd.to_timedelta(rng.uniform(60, 3500, num_fills), unit='s')
+    fill_instruments = rng.choice(['EUR/USD', 'USD/JPY'], num_fills)
+    trades = pd.DataFrame({
+        'Time': fill_times,
+        'Client ID': rng.choice(['C1', 'C2', 'C3'], num_fills),
+        'Instrument': fill_instruments,
+        'Direction': rng.choice(['Buy', 'Sell'], num_fills),
+        'Lots': rng.uniform(0.1, 3, num_fills).round(2),
+        'Price': np.where(fill_instruments == 'EUR/USD', 1.10, 150.0),
+        'Close Time': fill_times + pd.to_timedelta(rng.uniform(10, 7200, num_fills), unit='s')
+    })
+    return trades, quotes
+
+
+def _csv(frame, name):
+    return _Upload(frame.to_csv(index=False).encode(), name)
+
+
+def test_quote_tape_from_chunks_matches_the_whole_frame():
+    _, quotes = _tapes(np.random.default_rng(1))
+    whole = QuoteTape(quotes)
+    streamed = QuoteTape(_csv(quotes, 'quotes.csv'), chunk_rows=700)
+    np.testing.assert_array_equal(streamed.times, whole.times)
+    np.testing.assert_allclose(streamed.mid, whole.mid)
+    np.testing.assert_allclose(streamed.spread, whole.spread)
+    np.testing.assert_array_equal(streamed.bounds, whole.bounds)
+    assert (np.diff(whole.times[whole.bounds[0]:whole.bounds[1]]) >= 0).all()
+
+
+def test_asof_finds_the_prevailing_quote():
+    quotes = pd.DataFrame({'Time': pd.to_datetime(['2026-10-05 08:00:00', '2026-10-05 08:00:10']),
+                           'Instrument': ['EUR/USD', 'EUR/USD'], 'Bid': [1.0999, 1.1009], 'Ask': [1.1001, 1.1011]})
+    tape = QuoteTape(quotes)
+    times = pd.to_datetime(['2026-10-05 07:59:59', '2026-10-05 08:00:05', '2026-10-05 08:00:10'])
+    ids = np.zeros(3, dtype=np.int64)
+    rows = tape.asof(ids, times.to_numpy().astype('datetime64[ns]').view(np.int64))
+    np.testing.assert_array_equal(rows, [-1, 0, 1])
+
+
+def test_streamed_uploads_match_dataframes():
+    trades, quotes = _tapes(np.random.default_rng(2))
+    expected = toxicity_features(trades, quotes, commission_per_lot=7.0)
+    streamed = toxicity_features(_csv(trades, 'trades.csv'), _csv(quotes, 'quotes.csv'),
+                                 commission_per_lot=7.0, chunk_rows=150)
+    expected = expected.set_index('Client ID').sort_index()
+    streamed = streamed.set_index('Client ID').sort_index()
+    pd.testing.assert_frame_equal(streamed, expected, check_exact=False, rtol=1e-9)
+
+
+def test_latency_arbitrage_is_flagged_toxic():
+    rng = np.random.default_rng(3)
+    trades, quotes = _tapes(rng)
+    # C9 always buys right before the mid jumps well past the spread
+    times = pd.Timestamp('2026-10-05 08:30') + pd.to_timedelta(np.arange(20) * 60, unit='s')
+    jumps = pd.DataFrame({'Time': times + pd.Timedelta('500ms'), 'Instrument': 'EUR/USD',
+                          'Bid': 1.1030, 'Ask': 1.1031})
+    before = pd.DataFrame({'Time': times - pd.Timedelta('1s'), 'Instrument': 'EUR/USD',
+                           'Bid': 1.09995, 'Ask': 1.10005})
+    arb = pd.DataFrame({'Time': times, 'Client ID': 'C9', 'Instrument': 'EUR/USD', 'Direction': 'Buy',
+                        'Lots': 1.0, 'Price': 1.10005, 'Close Time': times + pd.Timedelta('4h')})
+    quotes = quotes[quotes['Instrument'] != 'EUR/USD']
+    clients = toxicity_features(pd.concat([trades, arb]), pd.concat([quotes, before, jumps]))
+    row = clients.set_index('Client ID').loc['C9']
+    assert row['Latency Arb Share'] == pytest.approx(1.0)
+    assert row['Toxic Flow']
+
+
+def test_missing_quote_columns_raise():
+    with pytest.raises(ValueError):
+        QuoteTape(pd.DataFrame({'Time': [], 'Instrument': [], 'Bid': []}))
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk_engine.trader import calculate_position_sizes, calculate_trade_setup, size_orders
+
+
+def _tickets(rng, count=500):
+    entry = rng.uniform(1, 500, count)
+    stop = entry * (1 + rng.normal(0, 0.03, count))
+    stop[::25] = entry[::25]   # some tickets with zero price risk
+    return pd.DataFrame({
+        'Account Balance': rng.uniform(1000, 1e6, count),
+        'Risk (%)': rng.uniform(0.1, 5, count),
+        'Entry': entry,
+        'Stop Loss': stop,
+        'Target': entry * (1 + rng.normal(0, 0.06, count))
+    })
+
+
+def test_vectorized_sizes_match_the_scalar_formula():
+    tickets = _tickets(np.random.default_rng(2))
+    sizes = calculate_position_sizes(tickets['Account Balance'], tickets['Risk (%)'], tickets['Entry'],
+                                     tickets['Stop Loss'], tickets['Target'])
+    for i, row in enumerate(tickets.itertuples(index=False)):
+        expected = calculate_trade_setup(*row)
+        for key in ('position_size', 'position_value', 'risk_amount', 'risk_reward_ratio'):
+            assert sizes[key][i] == pytest.approx(expected[key], rel=1e-12), (i, key)
+    assert (sizes['position_size'][::25] == 0).all()
+
+
+def test_scalars_broadcast_against_ticket_arrays():
+    sizes = calculate_position_sizes(10000, 2, np.array([100.0, 50.0, 20.0]), np.array([95.0, 50.0, 21.0]))
+    np.testing.assert_allclose(sizes['position_size'], [40.0, 0.0, 200.0])
+    np.testing.assert_allclose(sizes['risk_amount'], 200.0)
+    assert 'risk_reward_ratio' not in sizes
+
+
+def test_size_orders_adds_columns_without_touching_the_input():
+    tickets = _tickets(np.random.default_rng(3), 20)
+    sized = size_orders(tickets)
+    assert list(sized.columns[-4:]) == ['Position Size', 'Position Value', 'Risk Amount', 'R:R Ratio']
+    assert 'Position Size' not in tickets.columns
+    assert 'R:R Ratio' not in size_orders(tickets.drop(columns='Target')).columns